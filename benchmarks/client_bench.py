@@ -0,0 +1,127 @@
+import os
+import sys
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CLIENT_DIR = os.path.join(REPO_DIR, "client")
+
+sys.path.insert(0, CLIENT_DIR)
+sys.path.insert(0, REPO_DIR)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # the banner would come before the results on stdout
+
+import pygame
+
+from settings import settings
+from shared import fleet
+
+import board
+import renderer
+import setup_gui
+import ship
+import ship_coord
+
+from fleets import fleet_cells, shots
+from timing import Results
+
+SIZES = [10, 100, 1000]
+SHOT_COUNTS = [100, 1000]
+ADD_SHIP_CALLS = 1000
+DRAW_SHOT_COUNTS = [1000, 100000]
+DRAW_FRAMES = 100
+
+
+def make_ships(cells: list) -> list:
+    return [ship.Ship([ship_coord.ShipCoordinate(x, y) for x, y in ship_cells], name) for name, ship_cells in cells]
+
+
+def bench_add_ship(results: Results, surface: pygame.Surface, size: int):
+    cells = fleet_cells(size)
+    positions = shots(size, ADD_SHIP_CALLS, cells)
+
+    def setup():
+        gui = setup_gui.SetupGui(size, surface)
+        gui.ships = make_ships(cells)
+
+        # What _place_ship() would leave, so every call checks its cells against the placed ships
+        gui.occupied = fleet.cells_mask(size, [cell for _, ship_cells in cells for cell in ship_cells])
+        return gui
+
+    def add_ships(gui):
+        for x, y in positions:
+            gui._add_ship(x, y, 5, "Aircraft Carrier")
+
+    results.measure(f"SetupGui._add_ship[size={size},ships={len(cells)}]", setup, add_ships, ADD_SHIP_CALLS)
+
+
+def bench_board_dict(results: Results, size: int, shot_count: int):
+    cells = fleet_cells(size)
+    targets = shots(size, shot_count, cells)
+    params = f"[size={size},shots={shot_count}]"
+
+    def setup():
+        b = board.Board(make_ships(cells), size)
+
+        for x, y in targets:
+            b.fire_at(x, y)
+
+        return b
+
+    results.measure(f"Board.fire_at{params}", lambda: board.Board(make_ships(cells), size),
+                    lambda b: [b.fire_at(x, y) for x, y in targets], shot_count)
+    results.measure(f"Board.to_dict{params}", setup, lambda b: b.to_dict(), 1)
+
+    board_dict = setup().to_dict()
+    results.measure(f"Board.from_dict{params}", lambda: None, lambda _: board.Board.from_dict(board_dict), 1)
+
+
+def bench_board_draw(results: Results, surface: pygame.Surface, size: int, shot_count: int):
+    """
+    Draws a board in a viewport at its starting zoom, which only covers the cells in view
+    """
+
+    cells = fleet_cells(size)
+    ships = make_ships(cells)
+    targets = shots(size, shot_count, cells)
+    width = settings["gui"]["gui_width"]
+
+    def setup():
+        b = board.Board(ships, size)
+
+        for x, y in targets:
+            b.fire_at(x, y)
+
+        return b, renderer.Viewport(size, (0, 0, width, width + 1))
+
+    def draw(state):
+        b, view = state
+
+        for _ in range(DRAW_FRAMES):
+            with view.clip(surface):
+                for shp in b.ships:
+                    shp.draw(surface, view)
+
+                b.draw(surface, view)
+
+    results.measure(f"Board.draw[size={size},shots={shot_count}]", setup, draw, DRAW_FRAMES)
+
+
+def main():
+    pygame.init()
+    surface = pygame.display.set_mode((settings["gui"]["gui_width"], settings["gui"]["gui_height"]))
+    results = Results()
+
+    for size in SIZES:
+        bench_add_ship(results, surface, size)
+
+        for shot_count in SHOT_COUNTS:
+            bench_board_dict(results, size, shot_count)
+
+        for shot_count in DRAW_SHOT_COUNTS:
+            bench_board_draw(results, surface, size, shot_count)
+
+    results.dump()
+
+
+if __name__ == "__main__":
+    main()
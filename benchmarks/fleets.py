@@ -0,0 +1,30 @@
+import random
+
+
+def fleet_cells(board_size: int, seed: int = 0) -> list:
+    """
+    :return: A fleet that scales with the board, as [name, [(x, y), ...]] pairs. Ships are 2 to 5 long and
+             every ship is on its own even row, so they never overlap.
+    """
+
+    rng = random.Random(seed)
+    ships = []
+
+    for i in range(min(board_size // 2, 500)):
+        length = 2 + i % 4
+        x = rng.randrange(board_size - length + 1)
+        ships.append([f"ship {i}", [(x + j, i * 2) for j in range(length)]])
+
+    return ships
+
+
+def shots(board_size: int, count: int, ships: list, seed: int = 1) -> list:
+    """
+    :return: Shots where every other one is aimed at a ship cell, so both hits and misses are measured
+    """
+
+    rng = random.Random(seed)
+    cells = [cell for _, ship_cells in ships for cell in ship_cells]
+
+    return [rng.choice(cells) if i % 2 else (rng.randrange(board_size), rng.randrange(board_size))
+            for i in range(count)]
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SUITES = ["server_bench.py", "client_bench.py", "startup_bench.py"]
+
+
+def run_suite(script: str) -> dict:
+    """
+    Runs a suite in its own process, since the client and server have modules with the same names.
+
+    :return: The results of every case, or an empty dict if the suite could not run or its output isn't results
+    """
+
+    process = subprocess.run([sys.executable, os.path.join(BENCHMARK_DIR, script)],
+                             stdout=subprocess.PIPE, text=True)
+
+    if process.returncode != 0:
+        print(f"{script} failed with exit code {process.returncode}, skipping it", file=sys.stderr)
+        return {}
+
+    try:
+        return json.loads(process.stdout)
+
+    except ValueError as e:
+        print(f"{script} printed something that isn't JSON results, skipping it: {e}", file=sys.stderr)
+        return {}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    :param threshold: How many times slower than the baseline a case can be before it counts as a regression
+    :return: The names of the cases that regressed
+    """
+
+    regressions = []
+
+    print(f"\n{'case':<60} {'baseline':>12} {'now':>12} {'change':>8}")
+
+    for name, case in results.items():
+        if name not in baseline:
+            continue
+
+        ratio = case["seconds_per_op"] / baseline[name]["seconds_per_op"]
+        flag = "  REGRESSION" if ratio > threshold else ""
+
+        print(f"{name:<60} {baseline[name]['seconds_per_op'] * 1e9:>10.0f}ns "
+              f"{case['seconds_per_op'] * 1e9:>10.0f}ns {ratio - 1:>+8.0%}{flag}")
+
+        if ratio > threshold:
+            regressions.append(name)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the microbenchmarks of the game engine and protocol")
+    parser.add_argument("--output", default=os.path.join(BENCHMARK_DIR, "results.json"),
+                        help="where to save the results")
+    parser.add_argument("--baseline", default=os.path.join(BENCHMARK_DIR, "baseline.json"),
+                        help="results to compare against, if the file exists")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown factor compared to the baseline that counts as a regression")
+    parser.add_argument("--suite", choices=SUITES, nargs="*", default=SUITES)
+    args = parser.parse_args()
+
+    results = {}
+
+    for script in args.suite:
+        results.update(run_suite(script))
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to store one", file=sys.stderr)
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.threshold)
+
+    if regressions:
+        print(f"\n{len(regressions)} cases regressed by more than {args.threshold - 1:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
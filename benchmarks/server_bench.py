@@ -0,0 +1,257 @@
+import asyncio
+import os
+import random
+import sys
+import tempfile
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+sys.path.insert(0, os.path.join(REPO_DIR, "server"))
+sys.path.insert(0, REPO_DIR)
+
+import board
+import fleet_validator
+import game
+import move_log
+import player
+import spectators
+import ship
+import ship_coord
+
+from shared import fleet, protocol, shot_result
+
+from fleets import fleet_cells, shots
+from timing import Results
+
+try:
+    import ai_player
+
+except ImportError:  # the AI needs NumPy
+    ai_player = None
+
+SIZES = [10, 100, 1000]
+SHOT_COUNTS = [100, 1000]
+MESSAGE_COUNT = 10000
+AI_MOVE_COUNT = 100
+FLEET_COUNT = 1000
+VALIDATION_COUNT = 100
+LOG_MOVE_COUNT = 100000
+SPECTATOR_COUNTS = [1, 1000, 10000]
+BROADCAST_SHOT_COUNT = 100
+
+
+def make_ships(cells: list) -> list:
+    return [ship.Ship(name, [ship_coord.ShipCoordinate(x, y) for x, y in ship_cells]) for name, ship_cells in cells]
+
+
+class NullTransport:
+    def write(self, data):
+        pass
+
+    def is_closing(self):
+        return False
+
+    def get_write_buffer_size(self):
+        return 0
+
+
+class NullWriter:
+    transport = NullTransport()
+
+    def write(self, data):
+        pass
+
+    async def drain(self):
+        pass
+
+    def is_closing(self):
+        return False
+
+
+def bench_board(results: Results, size: int, shot_count: int):
+    cells = fleet_cells(size)
+    targets = shots(size, shot_count, cells)
+    params = f"[size={size},shots={shot_count}]"
+
+    def fire_all(b):
+        for x, y in targets:
+            b.fire_at(x, y)
+
+    def check_lost(b):
+        for _ in targets:
+            b.is_lost()
+
+    def hit_ships(ships):
+        for x, y in targets:
+            for ship_obj in ships:
+                ship_obj.hit(x, y)
+
+    def check_sunk(ships):
+        for _ in targets:
+            for ship_obj in ships:
+                ship_obj.is_sunk()
+
+    results.measure(f"Board.fire_at{params}", lambda: board.Board(size, make_ships(cells)), fire_all, shot_count)
+    results.measure(f"Board.is_lost{params}", lambda: board.Board(size, make_ships(cells)), check_lost, shot_count)
+
+    if board.array_board is None:
+        results.skip(f"ArrayBoard.fire_at{params}", "NumPy is not installed")
+
+    else:
+        results.measure(f"ArrayBoard.fire_at{params}",
+                        lambda: board.array_board.ArrayBoard(size, make_ships(cells)), fire_all, shot_count)
+
+    results.measure(f"Ship.hit{params}", lambda: make_ships(cells), hit_ships, shot_count * len(cells))
+    results.measure(f"Ship.is_sunk{params}", lambda: make_ships(cells), check_sunk, shot_count * len(cells))
+
+
+def bench_fleet(results: Results, size: int):
+    def generate(rng):
+        for _ in range(FLEET_COUNT):
+            fleet.random_fleet(size, rng=rng)
+
+    results.measure(f"fleet.random_fleet[size={size}]", lambda: random.Random(0), generate, FLEET_COUNT)
+
+
+def bench_fleet_validation(results: Results, size: int):
+    """
+    Checks a fleet that scales with the board. Building the ship objects of the same fleet, which every accepted
+    fleet goes through next, is measured with it to show what the check adds to it.
+    """
+
+    cells = fleet_cells(size)
+    ships = [[name, *[[x, y] for x, y in ship_cells]] for name, ship_cells in cells]
+    params = f"[size={size},ships={len(ships)}]"
+
+    def validate(validator):
+        for _ in range(VALIDATION_COUNT):
+            validator.validate(ships)
+
+    def build(_):
+        for _ in range(VALIDATION_COUNT):
+            game.Game._ship_objects(ships)
+
+    specs = [{"name": name, "length": len(ship_cells)} for name, ship_cells in cells]
+    results.measure(f"FleetValidator.validate{params}", lambda: fleet_validator.FleetValidator(size, specs),
+                    validate, VALIDATION_COUNT)
+    results.measure(f"Game._ship_objects{params}", lambda: None, build, VALIDATION_COUNT)
+
+
+def bench_ai(results: Results, size: int):
+    name = f"Targeter.move[size={size}]"
+
+    if ai_player is None:
+        results.skip(name, "NumPy is not installed")
+        return
+
+    def new_targeter():
+        return ai_player.Targeter(size, fleet.SHIPS, random.Random(0))
+
+    # Hunting on an empty board: every shot misses, so each move updates the density of a row and a column
+    def hunt(targeter):
+        for _ in range(AI_MOVE_COUNT):
+            targeter.record_shot(*targeter.choose_shot(), False)
+
+    results.measure(name, new_targeter, hunt, AI_MOVE_COUNT)
+
+
+def bench_move_log(results: Results):
+    with tempfile.TemporaryDirectory() as directory:
+        log = move_log.MoveLog(os.path.join(directory, "moves.log"))
+        game_id = log.start_game(10, ["00" * move_log.TOKEN_SIZE, "11" * move_log.TOKEN_SIZE])
+
+        # Only the part of a turn that runs on the event loop, the disk write happens in the background
+        def log_moves(_):
+            for i in range(LOG_MOVE_COUNT):
+                log.move(game_id, i & 1, i % 1000, i // 1000)
+
+            log.buffer.clear()
+
+        results.measure("MoveLog.move", lambda: None, log_moves, LOG_MOVE_COUNT)
+        log.file.close()
+
+
+def bench_broadcast(results: Results, spectator_count: int):
+    def new_broadcast():
+        broadcast = spectators.Broadcast(1, 10)
+
+        for i in range(spectator_count):
+            spectator = player.Player(None, NullWriter())
+            spectator.codec = protocol.CODECS[protocol.BINARY if i % 2 else protocol.JSON]
+            broadcast.spectators.add(spectator)
+
+        return broadcast
+
+    def shoot(broadcast):
+        for i in range(BROADCAST_SHOT_COUNT):
+            broadcast.shot(i & 1, i % 10, i // 10, shot_result.ShotResult(True, "Cruiser", False, False))
+
+    results.measure(f"Broadcast.shot[spectators={spectator_count}]", new_broadcast, shoot, BROADCAST_SHOT_COUNT)
+
+
+def bench_framing(results: Results, encoding: str, name: str, message):
+    codec = protocol.CODECS[encoding]
+    frames = b"".join(player.encode_frame(codec.encode(message), codec.binary_header)
+                      for _ in range(MESSAGE_COUNT))
+
+    def new_player(reader):
+        p = player.Player(reader, NullWriter())
+        p.codec = codec
+        p.frame_reader.binary_header = codec.binary_header
+        return p
+
+    async def send_all():
+        p = new_player(None)
+
+        for _ in range(MESSAGE_COUNT):
+            await p.send(message)
+
+    async def receive_all():
+        reader = asyncio.StreamReader()
+        reader.feed_data(frames)
+        reader.feed_eof()
+        p = new_player(reader)
+
+        for _ in range(MESSAGE_COUNT):
+            await p.receive()
+
+    results.measure(f"Player.send[{encoding},{name}]", lambda: None, lambda _: asyncio.run(send_all()),
+                    MESSAGE_COUNT)
+    results.measure(f"Player.receive[{encoding},{name}]", lambda: None, lambda _: asyncio.run(receive_all()),
+                    MESSAGE_COUNT)
+
+
+def main():
+    results = Results()
+
+    for size in SIZES:
+        for shot_count in SHOT_COUNTS:
+            bench_board(results, size, shot_count)
+
+        bench_fleet(results, size)
+        bench_fleet_validation(results, size)
+        bench_ai(results, size)
+
+    bench_move_log(results)
+
+    for spectator_count in SPECTATOR_COUNTS:
+        bench_broadcast(results, spectator_count)
+
+    endgame_cells = [list(cell) for cell in shots(10, 50, fleet_cells(10))]
+    messages = {
+        "move": [3, 7],
+        "hit": "hit",
+        "game_status": {"game_status": None, "move": [3, 7]},
+        "endgame_board": {"hits": endgame_cells[:17], "misses": endgame_cells[17:],
+                          "ships": [ship_cells for _, ship_cells in fleet_cells(10)]}
+    }
+
+    for encoding in protocol.CODECS:
+        for name, message in messages.items():
+            bench_framing(results, encoding, name, message)
+
+    results.dump()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CLIENT_DIR = os.path.join(REPO_DIR, "client")
+FIRST_FRAME_FLAG = "--first-frame"
+RUNS = 5
+
+
+def first_frame():
+    """
+    Starts the client up to the first frame of the connection screen and prints how long that took from before
+    the first import of the client
+    """
+
+    start = time.perf_counter()
+
+    sys.path.insert(0, CLIENT_DIR)
+    sys.path.insert(0, REPO_DIR)
+
+    import networking
+    import client
+    import connection_gui
+
+    from settings import settings
+
+    surface = client.create_window()
+    connection = networking.Connection(None)
+    screen = connection_gui.IPConnectionScreen(surface, settings["gui"]["gui_width"], 100, connection)
+    screen.draw()
+
+    print(time.perf_counter() - start)
+
+
+def main():
+    from timing import Results
+
+    results = Results()
+    env = {**os.environ, "SDL_VIDEODRIVER": "dummy", "SDL_AUDIODRIVER": "dummy", "PYGAME_HIDE_SUPPORT_PROMPT": "1"}
+
+    # Every run needs a new process, nothing may be imported or initialized yet
+    def start_client():
+        process = subprocess.run([sys.executable, __file__, FIRST_FRAME_FLAG], stdout=subprocess.PIPE, text=True,
+                                 env=env, check=True)
+        return float(process.stdout.splitlines()[-1])
+
+    results.record("client startup[import to first frame]", min(start_client() for _ in range(RUNS)))
+    results.dump()
+
+
+if __name__ == "__main__":
+    if FIRST_FRAME_FLAG in sys.argv:
+        first_frame()
+
+    else:
+        main()
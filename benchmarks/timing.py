@@ -0,0 +1,49 @@
+import json
+import sys
+import time
+
+REPEAT = 5
+
+
+class Results:
+    """
+    Collects the time per operation of each benchmark case and prints them as JSON for run.py
+    """
+
+    def __init__(self):
+        self.cases = {}
+
+    def measure(self, name: str, setup, run, ops: int, repeat: int = REPEAT):
+        """
+        :param name: The name of the case, including its parameters
+        :param setup: Returns the state one run works on. It is not timed
+        :param run: Takes the state from setup and performs ops operations
+        :param ops: The number of operations in one run
+        :param repeat: The number of runs, the fastest one counts
+        """
+
+        best = float("inf")
+
+        for _ in range(repeat):
+            state = setup()
+            start = time.perf_counter()
+            run(state)
+            best = min(best, time.perf_counter() - start)
+
+        self.record(name, best, ops)
+
+    def record(self, name: str, seconds: float, ops: int = 1):
+        """
+        Stores a case that was timed elsewhere, e.g. in another process
+
+        :param seconds: The time the ops operations took
+        """
+
+        self.cases[name] = {"seconds_per_op": seconds / ops, "ops": ops}
+        print(f"{name:<60} {seconds / ops * 1e9:>12.0f} ns/op", file=sys.stderr)
+
+    def skip(self, name: str, reason: str):
+        print(f"{name:<60} skipped: {reason}", file=sys.stderr)
+
+    def dump(self):
+        json.dump(self.cases, sys.stdout)
@@ -0,0 +1,131 @@
+import logging
+import os
+
+import pygame
+
+from settings import settings
+
+CLIENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def surface_size(surface: pygame.Surface) -> int:
+    """
+    :return: The size of the pixels of a surface in bytes
+    """
+
+    return surface.get_pitch() * surface.get_height()
+
+
+class Assets:
+    """
+    The sounds and fonts in settings.json, loaded once and shared by everything that uses them. Every asset is
+    loaded the first time it is asked for, and preload() asks for all of them, so nothing is read from the disk
+    or decoded once a game is running.
+    """
+
+    def __init__(self):
+        self.sounds = {}
+        self.fonts = {}
+        self.font_files = {}  # the file each font was loaded from, None for pygame's default font
+        self.surface_caches = {}
+        self.audio = True  # whether the mixer could be started
+
+    def preload(self):
+        """
+        Loads every sound and font in the settings. Starting the mixer and scanning the system fonts is slow, so
+        this should be called once the first frame is on the screen.
+        """
+
+        for name in settings["sounds"]:
+            self.sound(name)
+
+        for name in settings["fonts"]:
+            self.font(name)
+
+        usage = self.memory_usage()
+        logging.info(f"Preloaded {len(self.sounds)} sounds and {len(self.fonts)} fonts, "
+                     f"{sum(usage.values()) / 1024:.0f}KiB in total")
+
+    def _init_mixer(self) -> bool:
+        if self.audio and not pygame.mixer.get_init():
+            try:
+                pygame.mixer.init()
+
+            except pygame.error as e:
+                logging.warning(f"Couldn't open the audio device, sounds are disabled: {e}")
+                self.audio = False
+
+        return self.audio
+
+    def sound(self, name: str):
+        """
+        :param name: The name of the sound in the settings
+        :return: The shared sound, None if there is no audio device
+        """
+
+        if name not in self.sounds:
+            if not self._init_mixer():
+                return None
+
+            self.sounds[name] = pygame.mixer.Sound(file=os.path.join(CLIENT_DIR, settings["sounds"][name]))
+
+        return self.sounds[name]
+
+    def play(self, name: str):
+        sound = self.sound(name)
+
+        if sound is not None:
+            sound.play()
+
+    def font(self, name: str = "text") -> pygame.font.Font:
+        """
+        :param name: The name of the font in the settings, which is a system font name and a size
+        :return: The shared font
+        """
+
+        if name not in self.fonts:
+            if not pygame.font.get_init():
+                pygame.font.init()
+
+            # This is what SysFont does, but keeping the file shows how much memory the font takes
+            family, size = settings["fonts"][name]
+            path = pygame.font.match_font(family)
+
+            self.fonts[name] = pygame.font.Font(path, size)
+            self.font_files[name] = path
+
+        return self.fonts[name]
+
+    def track_surfaces(self, name: str, surfaces):
+        """
+        Counts the surfaces of a cache in memory_usage()
+
+        :param surfaces: A function that returns the surfaces that are currently cached
+        """
+
+        self.surface_caches[name] = surfaces
+
+    def memory_usage(self) -> dict:
+        """
+        :return: Roughly how many bytes each kind of asset takes. Fonts count the size of their file, as that is
+                 what is kept in memory, and pygame's default font is built in.
+        """
+
+        usage = {"sounds": 0, "fonts": 0}
+
+        if self.sounds:
+            frequency, size, channels = pygame.mixer.get_init()
+            sample_size = abs(size) // 8 * channels
+
+            usage["sounds"] = sum(round(sound.get_length() * frequency) * sample_size
+                                  for sound in self.sounds.values())
+
+        usage["fonts"] = sum(os.path.getsize(path) for path in set(self.font_files.values()) if path is not None)
+
+        for name, surfaces in self.surface_caches.items():
+            usage[name] = sum(surface_size(surface) for surface in surfaces())
+
+        return usage
+
+
+assets = Assets()
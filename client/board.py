@@ -1,28 +1,53 @@
-import pygame
-
 from settings import settings
+import renderer
 import ship
 
+try:
+    from shared import array_board
+
+except ImportError:  # NumPy is only needed for large boards
+    array_board = None
+
 
 class Board:
-    def __init__(self, ships):
+    def __init__(self, ships, board_size=None):
         self.ships = ships
-        self.hits = []
-        self.misses = []
+
+        # Sets of (x, y) tuples, so looking up a cell doesn't depend on the amount of shots taken
+        self.hits = set()
+        self.misses = set()
+
+        # Large boards look up ships by cell in an array instead of scanning every ship coordinate
+        self.array_board = None
+
+        if array_board is not None and board_size is not None and board_size >= array_board.MIN_BOARD_SIZE:
+            self.array_board = array_board.ArrayBoard(board_size, ships)
 
     def add_hit(self, x: int, y: int):
-        self.hits.append((x, y))
+        self.hits.add((x, y))
 
     def add_miss(self, x: int, y: int):
-        self.misses.append((x, y))
+        self.misses.add((x, y))
 
     def hit_at(self, x: int, y: int) -> bool:
-        return any(hit[0] == x and hit[1] == y for hit in self.hits)
+        return (x, y) in self.hits
 
     def miss_at(self, x: int, y: int) -> bool:
-        return any(miss[0] == x and miss[1] == y for miss in self.misses)
+        return (x, y) in self.misses
+
+    def shot_at(self, x: int, y: int) -> bool:
+        return (x, y) in self.hits or (x, y) in self.misses
 
     def fire_at(self, x, y):
+        if self.array_board is not None:
+            if self.array_board.fire_at(x, y).hit:
+                self.add_hit(x, y)
+
+            else:
+                self.add_miss(x, y)
+
+            return
+
         for shp in self.ships:
             for coord in shp.coordinates:
                 if coord.x == x and coord.y == y:
@@ -35,48 +60,46 @@ class Board:
     def from_dict(board_dict):
         board = Board([])
 
-        board.hits = board_dict["hits"]
-        board.misses = board_dict["misses"]
+        board.hits = {tuple(coord) for coord in board_dict["hits"]}
+        board.misses = {tuple(coord) for coord in board_dict["misses"]}
         board.ships = [ship.Ship.from_list(ship_coords) for ship_coords in board_dict["ships"]]
 
         return board
 
     def to_dict(self):
         return {
-            "hits": self.hits,
-            "misses": self.misses,
+            "hits": list(self.hits),
+            "misses": list(self.misses),
             "ships": [shp.to_list() for shp in self.ships]
         }
 
     @staticmethod
-    def draw_grid(surface, board_size, y_offset=0):
-        size_between = settings["gui"]["gui_width"] // board_size
+    def draw_grid(surface, view: renderer.Viewport):
+        view.draw_grid(surface)
 
-        x = 0
-        y = y_offset
+    @staticmethod
+    def draw_cubes(surface, coords: set, color, view: renderer.Viewport):
+        """
+        Fills the cells in view out of a set of (x, y) tuples. Looks up the cells in view in the set when there
+        are fewer of them than coordinates, so this never goes through more cells than are in view.
+        """
 
-        for _ in range(board_size + 1):
-            # Draw vertical lines
-            pygame.draw.line(surface, (100, 100, 100),
-                             (x, y_offset),
-                             (x, board_size * size_between + y_offset))
+        x_start, y_start, x_end, y_end = view.visible_cells()
 
-            # Draw horizontal lines
-            pygame.draw.line(surface, (100, 100, 100), (0, y), (settings["gui"]["gui_width"], y))
+        if len(coords) > (x_end - x_start) * (y_end - y_start):
+            visible = [(x, y) for y in range(y_start, y_end) for x in range(x_start, x_end) if (x, y) in coords]
 
-            x += size_between
-            y += size_between
+        else:
+            visible = [(x, y) for x, y in coords if x_start <= x < x_end and y_start <= y < y_end]
 
-    @staticmethod
-    def draw_cubes(surface, coords, color, board_size, y_offset):
-        dist = settings["gui"]["gui_width"] // board_size
-
-        for coord in coords:
-            pygame.draw.rect(surface, color,
-                             (coord[0] * dist + 1, coord[1] * dist + y_offset + 1,
-                              dist - 1, dist - 1))
-
-    def draw(self, surface, board_size, y_offset=0):
-        self.draw_grid(surface, board_size, y_offset)
-        self.draw_cubes(surface, self.hits, settings["colors"]["hit_color"], board_size, y_offset)
-        self.draw_cubes(surface, self.misses, settings["colors"]["miss_color"], board_size, y_offset)
+        for x, y in visible:
+            view.fill_cell(surface, x, y, color)
+
+    def draw(self, surface, view: renderer.Viewport):
+        """
+        Draws the grid, hits and misses in the viewport. Has to be called inside view.clip().
+        """
+
+        self.draw_grid(surface, view)
+        self.draw_cubes(surface, self.hits, settings["colors"]["hit_color"], view)
+        self.draw_cubes(surface, self.misses, settings["colors"]["miss_color"], view)
@@ -0,0 +1,260 @@
+import asyncio
+import random
+import time
+
+from shared.framing import FrameReader, encode_frame
+from shared import fleet, protocol
+
+READ_SIZE = 64 * 1024
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class BotClient:
+    """
+    A client without a GUI that places a random fleet and fires at random cells, trying the cells next to a hit
+    first. It sends and expects the same messages as game.Game and main_gui.MainGui, so it can be used to test
+    and load the server.
+    """
+
+    def __init__(self, encodings=None, seed=None, opponent: str = protocol.HUMAN, version: int = protocol.VERSION):
+        """
+        :param encodings: The encodings to negotiate in order of preference, None or empty to speak plain JSON
+                          like clients from before the negotiation
+        :param seed: The seed of the random moves
+        :param opponent: protocol.HUMAN to be paired with another bot, protocol.AI to play against the server.
+                         Asking for an opponent needs the negotiation.
+        :param version: The newest protocol version to negotiate
+        """
+
+        self.encodings = encodings
+        self.opponent = opponent
+        self.version = version
+        self.random = random.Random(seed)
+
+        self.reader = None
+        self.writer = None
+        self.frame_reader = FrameReader()
+        self.codec = protocol.CODECS[protocol.JSON]
+        self.negotiated_version = 1
+
+        self.board_size = None
+        self.token = None  # the token to resume a game with after the server restarts
+        self.resumed = None  # the state of the game the server resumed, until it is played
+        self.turn_latencies = []  # seconds from sending a move to receiving all of its result
+
+    async def connect(self, host: str, port: int, resume: bool = False):
+        """
+        :param resume: Continue the game the bot was in before the server restarted, instead of starting a new one
+        """
+
+        await self._open(host, port, protocol.hello(self.encodings, self.opponent, self.token if resume else None,
+                                                    version=self.version))
+        message = await self.receive()
+
+        if protocol.is_resume(message):
+            self.resumed = message["resume"]
+            self.board_size = self.resumed["board_size"]
+            return
+
+        if message != "start":
+            raise ProtocolError(f"Expected 'start', got {message!r}")
+
+        self.board_size = int(await self.receive())
+
+    async def _open(self, host: str, port: int, hello: dict):
+        """
+        Connects and negotiates the protocol with the hello if there are encodings to negotiate
+        """
+
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.frame_reader = FrameReader()
+        self.codec = protocol.CODECS[protocol.JSON]
+        self.negotiated_version = 1
+
+        if self.encodings:
+            await self.send(hello)
+            reply = await self.receive()
+
+            if not protocol.is_hello(reply):
+                raise ProtocolError(f"Expected a reply to the hello, got {reply!r}")
+
+            self.codec = protocol.CODECS[reply["hello"]["encoding"]]
+            self.frame_reader.binary_header = self.codec.binary_header
+            self.token = reply["hello"].get("token")
+            self.negotiated_version = reply["hello"].get("version", 1)
+
+    async def send(self, message):
+        self.writer.write(encode_frame(self.codec.encode(message), self.codec.binary_header))
+        await self.writer.drain()
+
+    async def receive(self):
+        """
+        :return: The next message that isn't a heartbeat. Bots always answer right away, so they never send any.
+        """
+
+        while True:
+            while (frame := self.frame_reader.next_frame()) is None:
+                data = await self.reader.read(READ_SIZE)
+
+                if data == b"":
+                    raise ConnectionError("Server disconnected")
+
+                self.frame_reader.feed(data)
+
+            message = self.codec.decode(frame)
+
+            if message != protocol.HEARTBEAT_MESSAGE:
+                return message
+
+    async def _expect(self, expected):
+        message = await self.receive()
+
+        if message != expected:
+            raise ProtocolError(f"Expected {expected!r}, got {message!r}")
+
+    def random_fleet(self) -> list:
+        """
+        :return: A fleet in the format sent to the server: [[name, [x, y], ...], ...]
+        """
+
+        return fleet.random_fleet(self.board_size, rng=self.random)
+
+    def _choose_shot(self, shots: set, targets: list):
+        while targets:
+            cell = targets.pop()
+
+            if cell not in shots and 0 <= cell[0] < self.board_size and 0 <= cell[1] < self.board_size:
+                return cell
+
+        while True:
+            cell = (self.random.randrange(self.board_size), self.random.randrange(self.board_size))
+
+            if cell not in shots:
+                return cell
+
+    async def play_game(self) -> str:
+        """
+        Plays one game, from submitting the fleet to exchanging the endgame boards. A game the server resumed
+        is played from where it stopped.
+
+        :return: The game status at the end of the game, "You won" or "You lost"
+        """
+
+        if self.resumed is None:
+            ships = self.random_fleet()
+            await self.send(ships)
+            await self._expect("starting")
+
+            shots = set()
+            board = {"hits": [], "misses": [], "ships": [ship[1:] for ship in ships]}
+            my_turn = False
+
+        else:
+            ships = self.resumed["ships"]
+            shots = {tuple(cell) for cells in self.resumed["shots"].values() for cell in cells}
+            board = {**self.resumed["opponent_shots"], "ships": [ship[1:] for ship in ships]}
+            my_turn = self.resumed["your_turn"]
+            self.resumed = None
+
+        targets = []
+        ship_cells = {tuple(cell) for ship in ships for cell in ship[1:]}
+
+        while True:
+            message = None if my_turn else await self.receive()
+            my_turn = False
+
+            if isinstance(message, dict):
+                move = message["move"]
+
+                if move is not None:
+                    board["hits" if tuple(move) in ship_cells else "misses"].append(move)
+
+                if message["game_status"] is not None:
+                    await self.send(board)
+                    await self.receive()  # the opponent's board
+                    return message["game_status"]
+
+            elif message not in (None, "waiting for move"):
+                raise ProtocolError(f"Expected a move or 'waiting for move', got {message!r}")
+
+            x, y = self._choose_shot(shots, targets)
+            shots.add((x, y))
+
+            start = time.perf_counter()
+            await self.send([x, y])
+
+            if self.negotiated_version >= protocol.TURN_RESULT_VERSION:
+                turn_result = await self.receive()
+                hit = turn_result["hit"]
+
+            else:
+                turn_result = None
+                hit = await self.receive() == "hit"
+                await self.receive()  # the sunk status
+
+            self.turn_latencies.append(time.perf_counter() - start)
+
+            if hit:
+                targets += [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]
+
+            if turn_result is not None and turn_result["game_status"] is not None:
+                await self.send(board)
+                await self.receive()  # the opponent's board
+                return turn_result["game_status"]
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+            try:
+                await self.writer.wait_closed()
+
+            except (ConnectionResetError, BrokenPipeError):
+                pass
+
+
+class SpectatorClient(BotClient):
+    """
+    Watches a match without a GUI and counts the shots it is sent
+    """
+
+    def __init__(self, encodings: list, match_id: int = protocol.LATEST_MATCH):
+        """
+        :param encodings: The encodings to negotiate. Watching needs the negotiation, so it can't be empty.
+        :param match_id: The match to watch, protocol.LATEST_MATCH for the match that started last
+        """
+
+        super().__init__(encodings)
+        self.match_id = match_id
+        self.shots = 0
+
+    async def watch(self, host: str, port: int) -> bool:
+        """
+        Watches the match until the server closes it
+
+        :return: False if there was no match to watch
+        """
+
+        await self._open(host, port, protocol.hello(self.encodings, spectate=self.match_id))
+        snapshot = await self.receive()
+
+        if not protocol.is_snapshot(snapshot):
+            raise ProtocolError(f"Expected a snapshot of the match, got {snapshot!r}")
+
+        if snapshot["spectate"] is None:
+            return False
+
+        self.shots += len(snapshot["spectate"]["shots"])
+
+        while True:
+            try:
+                message = await self.receive()
+
+            except ConnectionError:
+                return True
+
+            if isinstance(message, dict) and "shot" in message:
+                self.shots += 1
@@ -1,15 +1,28 @@
+import os
+import sys
+
 import pygame.surface
 
+# The modules the client and the server share are in the shared package next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
 from settings import settings
 import game
 
 
-def main():
-    pygame.init()
+def create_window() -> pygame.Surface:
+    """
+    Opens the game window. Only the display is initialized here: fonts and the mixer start the first time they
+    are used, so the connection screen appears without waiting for the audio device.
+    """
+
+    pygame.display.init()
     pygame.display.set_caption("Multiplayer Battleship")
-    surface = pygame.display.set_mode((settings["gui"]["gui_width"], settings["gui"]["gui_height"]))
+    return pygame.display.set_mode((settings["gui"]["gui_width"], settings["gui"]["gui_height"]))
+
 
-    g = game.Game(surface)
+def main():
+    g = game.Game(create_window())
     g.run()
 
 
@@ -1,16 +1,16 @@
-import threading
 import pygame
 import socket
 
-from networking import RecvMessage
-from gui_text import Text
-
-if not pygame.get_init():
-    pygame.init()
+from networking import Connection, RecvMessage
+from settings import settings
+from assets import assets
+from gui_text import Text, render_cache
+from idle import wait_for_events
+from profiler import get_profiler
+import resume
 
 COLOR_INACTIVE = pygame.Color('lightskyblue3')
 COLOR_ACTIVE = pygame.Color('dodgerblue2')
-FONT = pygame.font.SysFont("Calibri", 25)
 
 
 class InputBox:
@@ -18,7 +18,7 @@ class InputBox:
         self.rect = pygame.Rect(x, y, w, h)
         self.color = COLOR_INACTIVE
         self.text = text
-        self.txt_surface = FONT.render(text, True, (255, 255, 255))
+        self.txt_surface = render_cache.render(assets.font("text"), text, (255, 255, 255))
         self.active = False
 
     def handle_event(self, event):
@@ -37,7 +37,7 @@ class InputBox:
                 self.text += event.unicode
 
             # Re-render the won_text.
-            self.txt_surface = FONT.render(self.text, True, self.color)
+            self.txt_surface = render_cache.render(assets.font("text"), self.text, self.color)
 
     def update(self):
         width = max(200, self.txt_surface.get_width() + 10)
@@ -52,9 +52,10 @@ class InputBox:
 
 
 class IPConnectionScreen:
-    def __init__(self, surface, width, player_offset, client_socket, default_info_text="Press enter to connect"):
+    def __init__(self, surface, width, player_offset, connection: Connection,
+                 default_info_text="Press enter to connect"):
         self.surface = surface
-        self.client_socket = client_socket
+        self.connection = connection
 
         self.width = width
         self.player_offset = player_offset
@@ -74,12 +75,14 @@ class IPConnectionScreen:
         self.port_input = InputBox(self.width // 2 - 100, self.player_offset + 200, 200, 40, "9850")
 
         self.start_message = ""
+        self.start_message_recv = None
         self.connected = False
 
     def get_start_message(self):
-        start_message = RecvMessage(self.client_socket)
-        start_message.recv_blocking()
-        self.start_message = start_message.message
+        self.start_message_recv.receive()
+
+        if self.start_message_recv.received:
+            self.start_message = self.start_message_recv.message
 
     def draw(self):
         self.surface.fill((0, 0, 0))
@@ -100,31 +103,44 @@ class IPConnectionScreen:
 
     def run(self):
         clock = pygame.time.Clock()
+        events = pygame.event.get()
 
+        # Only draws after an event, which includes the start message arriving
         while not self.start_message:
-            events = pygame.event.get()
-
             for event in events:
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     exit()
 
                 if event.type == pygame.KEYDOWN and not self.connected and event.key == pygame.K_RETURN:
-                    self.connected = self.connect()
+                    with get_profiler().phase("network"):
+                        self.connected = self.connect()
 
                     if self.connected is False:  # if the connection failed
                         return False  # the connection failed
 
-                    self.client_socket.settimeout(1000)
-
-                    t = threading.Thread(target=self.get_start_message)
-                    t.start()
+                    self.connection.start_reader()
+                    self.start_message_recv = RecvMessage(self.connection)
 
                 self.ip_input.handle_event(event)
                 self.port_input.handle_event(event)
 
-            self.draw()
-            clock.tick(60)
+            if self.start_message_recv is not None:
+                with get_profiler().phase("network"):
+                    self.get_start_message()
+
+                if self.start_message:
+                    break
+
+                # The server disconnected before it sent the start message
+                if self.start_message_recv.error:
+                    self.connection.client_socket.close()
+                    return False
+
+            with get_profiler().phase("draw"):
+                self.draw()
+
+            events = wait_for_events(clock, 60, self.surface)
 
         return True  # the connection succeeded
 
@@ -133,14 +149,24 @@ class IPConnectionScreen:
         self.info_text.change_text("Connecting...")
         self.draw()
 
+        address = f"{self.ip_input.get_text()}:{self.port_input.get_text()}"
+
         try:
-            self.client_socket.connect((self.ip_input.get_text(), int(self.port_input.get_text())))
+            self.connection.client_socket.connect((self.ip_input.get_text(), int(self.port_input.get_text())))
+
+            # An empty list skips the negotiation, for servers that only speak JSON
+            if settings["network"]["encodings"]:
+                self.connection.negotiate(settings["network"]["encodings"], settings["network"]["negotiation_timeout"],
+                                          settings["network"]["opponent"], resume.load_token(address))
 
         except (TypeError, socket.error, ConnectionRefusedError, TimeoutError, ValueError):
             self.info_text.change_text("Failed")
             self.draw()
             return False
 
+        if self.connection.token is not None:
+            resume.save_token(address, self.connection.token)
+
         self.info_text.change_text("Connected")
         self.draw()
         return True
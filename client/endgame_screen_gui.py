@@ -2,6 +2,10 @@ import pygame
 
 from settings import settings
 import gui_text
+import renderer
+
+from idle import wait_for_events
+from profiler import get_profiler
 
 
 class EndgameScreenGui:
@@ -17,38 +21,47 @@ class EndgameScreenGui:
         self.player_board = player_board
         self.opponent_board = opponent_board
 
-    def _draw(self):
-        self.surface.fill((0, 0, 0))
+        width = settings["gui"]["gui_width"]
+        self.views = [renderer.Viewport(board_size, (0, 0, width, width + 1)),
+                      renderer.Viewport(board_size, (0, settings["gui"]["y_offset"], width, width + 1))]
 
-        for ship in self.player_board.ships:
-            ship.draw(self.surface, self.board_size)
+        # Only scrolling and zooming change this screen, so it is only redrawn then and when the window needs it
+        self.renderer = renderer.DirtyRenderer(surface)
+
+    def _draw_scene(self):
+        self.surface.fill((0, 0, 0))
 
-        for ship in self.opponent_board.ships:
-            ship.draw(self.surface, self.board_size, settings["gui"]["y_offset"])
+        for board, view in zip((self.player_board, self.opponent_board), self.views):
+            with view.clip(self.surface):
+                for ship in board.ships:
+                    ship.draw(self.surface, view)
 
-        self.player_board.draw(self.surface, self.board_size)
-        self.opponent_board.draw(self.surface, self.board_size, settings["gui"]["y_offset"])
+                board.draw(self.surface, view)
 
         self.won_text.draw(self.surface)
         self.info_text.draw(self.surface)
 
-        pygame.display.update()
+    def _draw(self):
+        self.renderer.render(self._draw_scene)
 
     def run(self):
         clock = pygame.time.Clock()
         waiting_for_input = True
 
         while waiting_for_input:
-            self._draw()
-
-            events = pygame.event.get()
-
-            clock.tick(60)  # tick clock here, so you don't have to wait 1 frame after key press
+            with get_profiler().phase("draw"):
+                self._draw()
 
-            for event in events:
+            for event in wait_for_events(clock, 60, self.surface):
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     exit()
 
+                self.renderer.handle_event(event)
+
+                for view in self.views:
+                    if view.handle_event(event):
+                        self.renderer.mark(view.rect)
+
                 if event.type == pygame.KEYDOWN:
                     waiting_for_input = False
@@ -3,24 +3,37 @@ import socket
 
 import pygame
 
+from assets import assets
 import connection_gui
+from idle import wait_for_events
 import networking
 import setup_gui
 import main_gui
+from shared import protocol
 
 from settings import settings
+from ship import Ship
+from ship_coord import ShipCoordinate
 
 
 class Game:
     def __init__(self, surface: pygame.Surface):
-        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.connection = networking.Connection(socket.socket(socket.AF_INET, socket.SOCK_STREAM))
         self.surface = surface
         self.ships = []
         self.board_size = None
 
     def connect(self):
+        """
+        :return: The state of the game the server resumed after a restart, None if a new game starts
+        """
+
         # Run the IP connection screen
-        conn = connection_gui.IPConnectionScreen(self.surface, settings["gui"]["gui_width"], 100, self.client_socket)
+        conn = connection_gui.IPConnectionScreen(self.surface, settings["gui"]["gui_width"], 100, self.connection)
+
+        # Load the assets while the player types the address, so turns never wait for the disk
+        conn.draw()
+        assets.preload()
 
         while True:
             connected = conn.run()
@@ -29,15 +42,35 @@ class Game:
                 break
 
             # Reset the client socket to avoid errors if the connection failed
-            self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.connection = networking.Connection(socket.socket(socket.AF_INET, socket.SOCK_STREAM))
             conn = connection_gui.IPConnectionScreen(self.surface, settings["gui"]["gui_width"], 100,
-                                                     self.client_socket, "Failed")
+                                                     self.connection, "Failed")
+
+        self.connection.start_heartbeats()
+
+        # A server that restarted during the game sends its state instead of the start message
+        if protocol.is_resume(conn.start_message):
+            return conn.start_message["resume"]
 
-        self.client_socket.settimeout(1000)
+        return None
 
     def get_board_size(self):
-        board_size_msg = networking.RecvMessage(self.client_socket)
-        board_size_msg.recv_blocking()
+        board_size_msg = networking.RecvMessage(self.connection)
+        clock = pygame.time.Clock()
+
+        # Keep the window responsive while waiting, waking up for the message
+        while True:
+            board_size_msg.receive()
+
+            if board_size_msg.error:
+                logging.critical("Lost the connection to the server")
+                exit(1)
+
+            if board_size_msg.received:
+                break
+
+            wait_for_events(clock, 60)
+
         self.board_size = int(board_size_msg.message)
 
     def run_ship_setup(self):
@@ -52,24 +85,58 @@ class Game:
             for coord in ship.coordinates:
                 server_ship_locations[-1].append([coord.x, coord.y])
 
-        send_message = networking.SendMessage(self.client_socket)
+        send_message = networking.SendMessage(self.connection)
         send_message.send(server_ship_locations)
 
-        start_message = networking.RecvMessage(self.client_socket)
-        start_message.receive()
-
+        start_message = networking.RecvMessage(self.connection)
         clock = pygame.time.Clock()
 
-        while not start_message.received:
-            pygame.event.get()  # ignore all events
+        while True:
+            start_message.receive()
+
+            if start_message.error:
+                logging.critical("Lost the connection to the server")
+                exit(1)
+
+            if start_message.received:
+                break
+
             ship_setup.draw()
-            clock.tick(60)
+
+            # Ignore all events apart from the window needing a redraw
+            for event in wait_for_events(clock, 60, self.surface):
+                ship_setup.renderer.handle_event(event)
+
+        if protocol.is_invalid_fleet(start_message.message):
+            logging.critical(f"The server rejected the fleet: {start_message.message['invalid_fleet']['description']}")
+            exit(1)
+
+        if protocol.is_aborted(start_message.message):
+            logging.critical(start_message.message["aborted"])
+            exit(1)
+
+    def resume(self, resumed: dict):
+        """
+        Continues the game the server resumed, with the ships and shots from before the restart
+        """
+
+        self.board_size = resumed["board_size"]
+        self.ships = [Ship([ShipCoordinate(x, y) for x, y in ship[1:]], ship[0]) for ship in resumed["ships"]]
+
+        mg = main_gui.MainGui(self.ships, self.board_size, self.surface, self.connection)
+        mg.restore_shots(resumed["shots"], resumed["opponent_shots"])
+        mg.run(resumed["your_turn"])
 
     def run(self):
-        self.connect()
-        self.get_board_size()
+        resumed = self.connect()
+
+        if resumed is None:
+            self.get_board_size()
+
+        else:
+            self.resume(resumed)
 
         while True:
             self.run_ship_setup()
-            mg = main_gui.MainGui(self.ships, self.board_size, self.surface, self.client_socket)
+            mg = main_gui.MainGui(self.ships, self.board_size, self.surface, self.connection)
             mg.run()
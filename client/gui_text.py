@@ -1,17 +1,52 @@
+from collections import OrderedDict
+
 import pygame
 
-if not pygame.font.get_init():
-    pygame.font.init()
+from assets import assets
+from profiler import get_profiler
+
+
+class RenderCache:
+    """
+    Least recently used cache of rendered text, keyed on the font, message and color. The surfaces it returns
+    are shared, so they must not be drawn on.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+
+    def render(self, font, message, color) -> pygame.Surface:
+        key = (font, message, tuple(color))
+        surface = self.surfaces.get(key)
+
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+
+        with get_profiler().phase("render text"):
+            surface = font.render(message, True, color)
+
+        self.surfaces[key] = surface
+
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+
+        return surface
+
+
+render_cache = RenderCache()
+assets.track_surfaces("rendered text", render_cache.surfaces.values)
 
 
 class Text:
-    def __init__(self, message, color, pos, font=pygame.font.SysFont("Calibri", 25)):
-        self.font = font
+    def __init__(self, message, color, pos, font=None):
+        self.font = font or assets.font("text")
         self.color = color
         self.pos = pos
 
         self.message = message
-        self.text = self.font.render(message, True, self.color)
+        self.text = render_cache.render(self.font, message, self.color)
         self.rect = self.text.get_rect()
         self.rect.center = self.pos
 
@@ -20,10 +55,10 @@ class Text:
 
     def change_text(self, new_text):
         self.message = new_text
-        self.text = self.font.render(self.message, True, self.color)
+        self.text = render_cache.render(self.font, self.message, self.color)
         self.rect = self.text.get_rect()
         self.rect.center = self.pos
 
     def change_color(self, new_color):
         self.color = new_color
-        self.text = self.font.render(self.message, True, self.color)
+        self.text = render_cache.render(self.font, self.message, self.color)
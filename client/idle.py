@@ -0,0 +1,29 @@
+import pygame
+
+from profiler import get_profiler
+
+# The longest a window waits for an event before it draws a frame anyway, in milliseconds
+IDLE_TIMEOUT = 1000
+
+
+def wait_for_events(clock: pygame.time.Clock, framerate: int, surface: pygame.Surface = None,
+                    timeout: int = IDLE_TIMEOUT) -> list:
+    """
+    Ends the frame like FrameProfiler.tick(), then sleeps until there is input, a window event or a message from the
+    server (networking.MESSAGE_EVENT) instead of drawing the next frame right away. A window that is waiting
+    then only draws when something changed, which takes next to no CPU.
+
+    :param timeout: How long to wait for an event in milliseconds
+    :return: The events, empty if none arrived before the timeout
+    """
+
+    get_profiler().tick(clock, framerate, surface)
+
+    with get_profiler().idle():
+        event = pygame.event.wait(timeout)
+
+    if event.type == pygame.NOEVENT:
+        return []
+
+    with get_profiler().phase("events"):
+        return [event] + pygame.event.get()
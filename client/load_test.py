@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import collections
+import os
+import socket
+import statistics
+import sys
+import time
+
+# The modules the client and the server share are in the shared package next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import bot
+from shared import protocol
+
+
+def percentile(sorted_values: list, percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[index]
+
+
+async def run_bot(args, seed: int, results: dict):
+    client = bot.BotClient(args.encodings, seed, args.opponent, args.version)
+
+    try:
+        await asyncio.wait_for(client.connect(args.host, args.port), args.timeout)
+
+        for _ in range(args.games):
+            await asyncio.wait_for(client.play_game(), args.timeout)
+            results["games"] += 1
+
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, bot.ProtocolError, ValueError) as e:
+        results["errors"][type(e).__name__] += 1
+
+    finally:
+        results["turn_latencies"] += client.turn_latencies
+        await client.close()
+
+
+async def run_spectator(args, results: dict, players_done: asyncio.Event):
+    client = bot.SpectatorClient(args.encodings or ["binary", "json"])
+
+    try:
+        # Wait for the first match to start, unless every match is already over. The server ends the watch
+        # when the match ends, so it isn't timed out like a game.
+        while not await client.watch(args.host, args.port):
+            await client.close()
+
+            if players_done.is_set():
+                break
+
+            await asyncio.sleep(0.05)
+
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, bot.ProtocolError, ValueError) as e:
+        results["spectator_errors"][type(e).__name__] += 1
+
+    finally:
+        results["spectator_shots"] += client.shots
+        await client.close()
+
+
+async def run_load(args) -> dict:
+    results = {"games": 0, "errors": collections.Counter(), "turn_latencies": [],
+               "spectator_shots": 0, "spectator_errors": collections.Counter()}
+
+    # The server pairs connections in the order they arrive, so every two bots play each other.
+    # Against the AI every bot plays a game of its own.
+    bot_count = args.pairs if args.opponent == protocol.AI else args.pairs * 2
+    players_done = asyncio.Event()
+
+    async def run_players():
+        await asyncio.gather(*[run_bot(args, seed, results) for seed in range(bot_count)])
+        players_done.set()
+
+    # Spectators all watch the latest match, like viewers piling into one popular game
+    spectators = [run_spectator(args, results, players_done) for _ in range(args.spectators)]
+
+    start = time.perf_counter()
+    await asyncio.gather(run_players(), *spectators)
+    results["duration"] = time.perf_counter() - start
+
+    return results
+
+
+def report(results: dict, opponent: str, spectators: int):
+    # Both bots of a game count it, unless they play against the AI
+    games = results["games"] if opponent == protocol.AI else results["games"] // 2
+    latencies = sorted(results["turn_latencies"])
+
+    print(f"Games:          {games} in {results['duration']:.2f}s ({games / results['duration']:.1f} games/s)")
+    print(f"Turns:          {len(latencies)}")
+
+    if latencies:
+        print(f"Turn latency:   p50 {percentile(latencies, 50) * 1000:.2f}ms  "
+              f"p90 {percentile(latencies, 90) * 1000:.2f}ms  "
+              f"p99 {percentile(latencies, 99) * 1000:.2f}ms  "
+              f"max {latencies[-1] * 1000:.2f}ms  "
+              f"mean {statistics.fmean(latencies) * 1000:.2f}ms")
+
+    print(f"Errors:         {sum(results['errors'].values())}")
+
+    for name, count in results["errors"].most_common():
+        print(f"    {name}: {count}")
+
+    if spectators:
+        print(f"Spectators:     {spectators} saw {results['spectator_shots']} shots "
+              f"({results['spectator_shots'] / spectators:.1f} each)")
+        print(f"Spectator errors: {sum(results['spectator_errors'].values())}")
+
+        for name, count in results["spectator_errors"].most_common():
+            print(f"    {name}: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays many concurrent bot games against a server and reports "
+                                                 "its throughput and turn latency")
+    parser.add_argument("--host", default=socket.gethostbyname(socket.gethostname()))
+    parser.add_argument("--port", type=int, default=9850)
+    parser.add_argument("--pairs", type=int, default=100, help="number of games played at the same time")
+    parser.add_argument("--games", type=int, default=1, help="games each pair plays before disconnecting")
+    parser.add_argument("--encodings", nargs="*", default=["binary", "json"],
+                        help="encodings to negotiate, none to speak JSON without negotiating")
+    parser.add_argument("--opponent", choices=[protocol.HUMAN, protocol.AI], default=protocol.HUMAN,
+                        help="play the bots against each other or against the server's AI")
+    parser.add_argument("--spectators", type=int, default=0, help="number of connections watching the latest match")
+    parser.add_argument("--version", type=int, default=protocol.VERSION,
+                        help="newest protocol version the bots negotiate, 1 for separate hit and sunk messages")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds before a game counts as an error")
+    args = parser.parse_args()
+
+    report(asyncio.run(run_load(args)), args.opponent, args.spectators)
+
+
+if __name__ == "__main__":
+    main()
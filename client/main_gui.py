@@ -1,5 +1,4 @@
 import logging
-import socket
 
 from enum import Enum
 
@@ -8,10 +7,16 @@ import pygame
 import endgame_screen_gui
 import settings
 import networking
+import renderer
+from shared import protocol
+
+from assets import assets
+from profiler import get_profiler
 
 from settings import settings
 from board import Board
 from gui_text import Text
+from idle import wait_for_events
 
 
 class Mode(Enum):
@@ -20,15 +25,12 @@ class Mode(Enum):
 
 
 class MainGui:
-    def __init__(self, ships: list, board_size: int, surface: pygame.Surface, client_socket: socket.socket):
-        if not pygame.mixer.get_init():
-            pygame.mixer.init()
-
+    def __init__(self, ships: list, board_size: int, surface: pygame.Surface, connection: networking.Connection):
         self.board_size = board_size
         self.surface = surface
         self.mode: Mode = Mode.WAITING_FOR_MSG
-        self.client_socket = client_socket
-        self.board: Board = Board(ships)
+        self.connection = connection
+        self.board: Board = Board(ships, board_size)
         self.opponent_board: Board = Board([])
 
         self.turn_text = Text("Waiting for other player", (255, 255, 255),
@@ -37,40 +39,95 @@ class MainGui:
         self.ship_destroy_text = Text("", (255, 255, 255),
                                       (settings["gui"]["gui_width"] // 2, settings["gui"]["y_offset"] - 25))
 
+        width = settings["gui"]["gui_width"]
+        self.view = renderer.Viewport(board_size, (0, 0, width, width + 1))
+        self.opponent_view = renderer.Viewport(board_size, (0, settings["gui"]["y_offset"], width, width + 1))
+
+        self.renderer = renderer.DirtyRenderer(surface)
+        self.preview_cell = None
+
+        self.clock = pygame.time.Clock()
+        self.last_shot = None
+
+    def _wait_for_message(self):
+        """
+        Keeps drawing and handling events until the next message from the server has arrived.
+
+        :return: The message
+        """
+
+        message = networking.RecvMessage(self.connection)
+
+        while True:
+            with get_profiler().phase("network"):
+                message.receive()
+
+            if message.error:
+                logging.critical("Lost the connection to the server")
+                exit(1)
+
+            # Don't go back to waiting once the message is here
+            if message.received:
+                return message.message
+
+            with get_profiler().phase("draw"):
+                self._draw()
+
+            for event in wait_for_events(self.clock, 60, self.surface):
+                self._handle_event(event)
+
     def _fire(self, x, y):
-        fire_message = networking.SendMessage(self.client_socket)
-        fire_message.send([x, y])
+        fire_message = networking.SendMessage(self.connection)
+
+        with get_profiler().phase("network"):
+            fire_message.send([x, y])
 
         if fire_message.error:
             logging.critical(f"Error when trying to send a fire message at coords {[x, y]}")
             exit(1)
 
-        hit_msg = networking.RecvMessage(self.client_socket)
-        hit_msg.recv_blocking()
+        self.last_shot = (x, y)
+
+    def _handle_shot_result(self, hit_message):
+        x, y = self.last_shot
 
-        if hit_msg.message == "hit":
+        if hit_message == "hit":
             self.opponent_board.add_hit(x, y)
 
         else:
             self.opponent_board.add_miss(x, y)
 
+        self.renderer.mark_cell(self.opponent_view, x, y)
+
+    def _receive_fire(self, move):
+        self.board.fire_at(*move)
+        self.renderer.mark_cell(self.view, *move)
+
+    def _change_text(self, text: Text, message: str):
+        self.renderer.mark(text.rect)
+        text.change_text(message)
+        self.renderer.mark(text.rect)
+
     def _handle_event(self, event: pygame.event):
         if event.type == pygame.QUIT:
             pygame.quit()
             exit()
 
-        if self.mode == Mode.SELECTING_MOVE and event.type == pygame.MOUSEBUTTONDOWN:
-            mouse_pos = pygame.mouse.get_pos()
+        self.renderer.handle_event(event)
+
+        for view in (self.view, self.opponent_view):
+            if view.handle_event(event):
+                self.renderer.mark(view.rect)
+
+        # The other buttons scroll and zoom
+        if self.mode == Mode.SELECTING_MOVE and event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            coords = self.opponent_view.cell_at(event.pos)
 
             # If it is out of the board
-            if mouse_pos[1] <= settings["gui"]["y_offset"]:
+            if coords is None:
                 return
 
-            coords = (int(mouse_pos[0] / settings["gui"]["gui_width"] * self.board_size),
-                      int((mouse_pos[1] - settings["gui"]["y_offset"]) /
-                          settings["gui"]["gui_width"] * self.board_size))
-
-            if not (self.opponent_board.hit_at(*coords) or self.opponent_board.miss_at(*coords)):
+            if not self.opponent_board.shot_at(*coords):
                 self._fire(*coords)
                 self.mode = Mode.WAITING_FOR_MSG
 
@@ -94,96 +151,140 @@ class MainGui:
 
     def _draw_ships(self):
         for ship in self.board.ships:
-            ship.draw(self.surface, self.board_size)
+            ship.draw(self.surface, self.view)
 
-    def _draw_preview_move(self):
-        mouse_pos = pygame.mouse.get_pos()
+    def _get_preview_cell(self):
+        """
+        :return: The cell of the opponent's board under the mouse if a move is being selected, otherwise None
+        """
+
+        if self.mode != Mode.SELECTING_MOVE:
+            return None
 
-        if mouse_pos[1] <= settings["gui"]["y_offset"]:
+        return self.opponent_view.cell_at(pygame.mouse.get_pos())
+
+    def _update_preview_move(self):
+        preview_cell = self._get_preview_cell()
+
+        if preview_cell == self.preview_cell:
             return
 
-        dist = settings["gui"]["gui_width"] // self.board_size
+        for cell in (self.preview_cell, preview_cell):
+            if cell is not None:
+                self.renderer.mark_cell(self.opponent_view, *cell)
 
-        coords = (int(mouse_pos[0] / settings["gui"]["gui_width"] * self.board_size),
-                  int((mouse_pos[1] - settings["gui"]["y_offset"]) / settings["gui"]["gui_width"] * self.board_size))
+        self.preview_cell = preview_cell
 
-        pygame.draw.rect(self.surface, settings["colors"]["preview_ship_color"],
-                         (coords[0] * dist + 1, coords[1] * dist + settings["gui"]["y_offset"] + 1,
-                          dist - 1, dist - 1))
+    def _draw_preview_move(self):
+        if self.preview_cell is None:
+            return
 
-    def _draw(self):
+        self.opponent_view.fill_cell(self.surface, *self.preview_cell, settings["colors"]["preview_ship_color"])
+
+    def _draw_scene(self):
         self.surface.fill((0, 0, 0))
-        self._draw_ships()
-        self.board.draw(self.surface, self.board_size)
-        self.opponent_board.draw(self.surface, self.board_size, settings["gui"]["y_offset"])
 
-        if self.mode == Mode.SELECTING_MOVE:
-            self._draw_preview_move()
+        with get_profiler().phase("boards"):
+            with self.view.clip(self.surface):
+                self._draw_ships()
+                self.board.draw(self.surface, self.view)
+
+            with self.opponent_view.clip(self.surface):
+                self.opponent_board.draw(self.surface, self.opponent_view)
+                self._draw_preview_move()
 
         self.turn_text.draw(self.surface)
         self.ship_destroy_text.draw(self.surface)
 
-        pygame.display.update()
+    def _draw(self):
+        """
+        Draws the parts of the window that changed since the last frame
+        """
+
+        self._update_preview_move()
+        self.renderer.render(self._draw_scene)
 
     def _handle_endgame(self, message):
-        send_ships = networking.SendMessage(self.client_socket)
-        send_ships.send(self.board.to_dict())
+        send_ships = networking.SendMessage(self.connection)
 
-        recv_ships = networking.RecvMessage(self.client_socket)
-        recv_ships.recv_blocking()
+        with get_profiler().phase("network"):
+            send_ships.send(self.board.to_dict())
 
-        opponent_board = Board.from_dict(recv_ships.message)
+        opponent_board = Board.from_dict(self._wait_for_message())
 
         endgame_screen = endgame_screen_gui.EndgameScreenGui(self.surface, self.board_size, message["game_status"],
                                                              self.board, opponent_board)
         endgame_screen.run()
 
-    def run(self):
-        clock = pygame.time.Clock()
+    def restore_shots(self, shots: dict, opponent_shots: dict):
+        """
+        Puts the shots of a resumed game on the boards
 
-        while True:
-            opponent_move_info = networking.RecvMessage(self.client_socket)
-            opponent_move_info.receive()
+        :param shots: The hits and misses of this player as {"hits": [[x, y], ...], "misses": [[x, y], ...]}
+        :param opponent_shots: The hits and misses of the opponent in the same format
+        """
 
-            while not opponent_move_info.received:
-                self._draw()
+        for x, y in shots["hits"]:
+            self.opponent_board.add_hit(x, y)
+
+        for x, y in shots["misses"]:
+            self.opponent_board.add_miss(x, y)
 
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-                        exit()
+        for x, y in opponent_shots["hits"] + opponent_shots["misses"]:
+            self.board.fire_at(x, y)
 
-                clock.tick(60)
+    def run(self, your_turn: bool = False):
+        """
+        :param your_turn: If the player moves first without the server saying so, which is how a resumed game
+                          goes on
+        """
+
+        while True:
+            opponent_move_info = "waiting for move" if your_turn else self._wait_for_message()
+            your_turn = False
 
             self.mode = Mode.SELECTING_MOVE
 
-            if type(opponent_move_info.message) == dict and opponent_move_info.message["game_status"] is not None:
-                if opponent_move_info.message["game_status"] == "You lost":
-                    self.board.fire_at(*opponent_move_info.message["move"])
+            if type(opponent_move_info) == dict and opponent_move_info["game_status"] is not None:
+                # A resumed game that was already won has no last move
+                if opponent_move_info["game_status"] == "You lost" and opponent_move_info["move"] is not None:
+                    self._receive_fire(opponent_move_info["move"])
 
-                self._handle_endgame(opponent_move_info.message)
+                self._handle_endgame(opponent_move_info)
                 return
 
-            if opponent_move_info.message != "waiting for move":
-                self.board.fire_at(*opponent_move_info.message["move"])
+            if opponent_move_info != "waiting for move":
+                self._receive_fire(opponent_move_info["move"])
 
-            self.turn_text.change_text("Your turn")
-            your_turn_sound = pygame.mixer.Sound(file=settings["sounds"]["your_turn"])
-            your_turn_sound.play()
+            self._change_text(self.turn_text, "Your turn")
+            assets.play("your_turn")
 
             while self.mode == Mode.SELECTING_MOVE:
-                self._draw()
+                with get_profiler().phase("draw"):
+                    self._draw()
 
-                for event in pygame.event.get():
+                # Moving the mouse over the board wakes the window up to draw the preview
+                for event in wait_for_events(self.clock, 60, self.surface):
                     self._handle_event(event)
 
-                clock.tick(60)
+            # The window keeps being drawn while waiting for the result of the shot
+            if self.connection.version >= protocol.TURN_RESULT_VERSION:
+                turn_result = self._wait_for_message()
+                self._handle_shot_result("hit" if turn_result["hit"] else "miss")
+                sunk_status = f"{protocol.SUNK_PREFIX}{turn_result['sunk']}" if turn_result["sunk"] else "no ship sank"
 
-            sunk_status = networking.RecvMessage(self.client_socket)
-            sunk_status.recv_blocking()
+            else:
+                turn_result = None
+                self._handle_shot_result(self._wait_for_message())
+                sunk_status = self._wait_for_message()
 
-            self.turn_text.change_text("Waiting for other player")
-            self.ship_destroy_text.change_text("")
+            self._change_text(self.turn_text, "Waiting for other player")
+            self._change_text(self.ship_destroy_text, "")
 
-            if sunk_status.message != "no ship sank":
-                self.ship_destroy_text.change_text(sunk_status.message)
+            if sunk_status != "no ship sank":
+                self._change_text(self.ship_destroy_text, sunk_status)
+
+            # In protocol version 2 the turn result says if the shot won the game
+            if turn_result is not None and turn_result["game_status"] is not None:
+                self._handle_endgame(turn_result)
+                return
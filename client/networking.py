@@ -1,62 +1,213 @@
 import threading
 import logging
 import socket
-import json
+import struct
+import queue
+import time
 
+import pygame
 
-HEADERSIZE = 10
+from shared.framing import FrameReader, encode_frame
+from shared import protocol
 
+# Put in the message queue once the server disconnects
+DISCONNECTED = object()
+
+# Posted whenever something is put in the message queue, so a window that waits for events wakes up for it
+MESSAGE_EVENT = pygame.event.custom_type()
+
+
+def _post_message_event():
+    # There is no event queue before the window is created
+    if pygame.display.get_init():
+        pygame.event.post(pygame.event.Event(MESSAGE_EVENT))
+
+
+class Connection:
+    """
+    A socket together with the one thread that receives from it. The thread decodes every frame as soon as it
+    arrives and puts the message in a queue, which the GUI takes messages from without blocking, and posts a
+    MESSAGE_EVENT to wake the GUI up.
+
+    From protocol version 3 the server sends heartbeats, so the server is taken as gone once nothing arrived for
+    protocol.HEARTBEAT_TIMEOUT, and once the game started a second thread sends heartbeats while the player
+    is thinking.
+    """
 
-class RecvMessage:
     def __init__(self, client_socket: socket.socket):
+        self.client_socket = client_socket
+        self.frame_reader = FrameReader()
+        self.codec = protocol.CODECS[protocol.JSON]
+        self.messages = queue.Queue()
+        self.reader_thread = None
+        self.heartbeat_thread = None
+        self.send_lock = threading.Lock()  # the GUI and the heartbeat thread both send
+        self.last_sent = time.monotonic()
+        self.token = None  # the server's token to resume the game with after it restarts
+        self.version = 1  # the protocol version, servers that don't negotiate speak version 1
+
+    def start_reader(self):
+        """
+        Starts receiving messages into the queue. Must be called once, after negotiate().
+        """
+
+        heartbeats = self.version >= protocol.HEARTBEAT_VERSION
+        self.client_socket.settimeout(protocol.HEARTBEAT_TIMEOUT if heartbeats else None)
+        self.reader_thread = threading.Thread(target=self._read_messages, daemon=True)
+        self.reader_thread.start()
+
+    def _read_messages(self):
+        while True:
+            try:
+                while (frame := self.frame_reader.next_frame()) is not None:
+                    message = self.codec.decode(frame)
+
+                    if message != protocol.HEARTBEAT_MESSAGE:
+                        self.messages.put(message)
+                        _post_message_event()
+
+                if self.frame_reader.recv_into(self.client_socket) == 0:
+                    logging.critical("Server disconnected")
+                    break
+
+            except socket.timeout:
+                logging.critical(f"The server sent nothing for {protocol.HEARTBEAT_TIMEOUT} seconds")
+                break
+
+            except OSError as e:
+                logging.exception(e)
+                break
+
+            # A message that can't be decoded leaves the rest of the stream unreadable
+            except (ValueError, IndexError, KeyError, struct.error) as e:
+                logging.critical(f"The server sent a malformed message: {e}")
+                break
+
+        self.messages.put(DISCONNECTED)
+        _post_message_event()
+
+    def start_heartbeats(self):
+        """
+        Starts sending heartbeats if the server speaks a protocol with them. Must be called once the game started,
+        the server expects nothing from a client that is waiting for an opponent.
+        """
+
+        if self.version >= protocol.HEARTBEAT_VERSION and self.heartbeat_thread is None:
+            self.heartbeat_thread = threading.Thread(target=self._send_heartbeats, daemon=True)
+            self.heartbeat_thread.start()
+
+    def _send_heartbeats(self):
+        while True:
+            time.sleep(max(0.0, self.last_sent + protocol.HEARTBEAT_INTERVAL - time.monotonic()))
+
+            # Something else was sent while sleeping
+            if time.monotonic() - self.last_sent < protocol.HEARTBEAT_INTERVAL:
+                continue
+
+            heartbeat = SendMessage(self)
+            heartbeat.send(protocol.HEARTBEAT_MESSAGE)
+
+            if heartbeat.error:
+                break
+
+    def negotiate(self, encodings: list, timeout: float, opponent: str = protocol.HUMAN, resume: str = None):
+        """
+        Asks the server for the first supported encoding in the list. Must be called right after connecting,
+        before any other message is sent or received.
+
+        :param encodings: The encodings to ask for, in order of preference
+        :param timeout: How long to wait for the server's reply in seconds
+        :param opponent: protocol.HUMAN to be paired with another player, protocol.AI to play against the server
+        :param resume: The token of an earlier connection, to continue its game if the server restarted during it
+        """
+
+        SendMessage(self).send(protocol.hello(encodings, opponent, resume))
+
+        previous_timeout = self.client_socket.gettimeout()
+        self.client_socket.settimeout(timeout)
+
+        # The reader thread isn't running yet, so the reply is received here
+        while (reply := self.frame_reader.next_frame()) is None:
+            if self.frame_reader.recv_into(self.client_socket) == 0:
+                raise ConnectionError("The server disconnected during the protocol negotiation")
+
+        self.client_socket.settimeout(previous_timeout)
+        reply = self.codec.decode(reply)
+
+        if not protocol.is_hello(reply):
+            raise ConnectionError("The server did not reply to the protocol negotiation")
+
+        self.codec = protocol.CODECS[reply["hello"]["encoding"]]
+        self.frame_reader.binary_header = self.codec.binary_header
+        self.token = reply["hello"].get("token")
+        self.version = reply["hello"].get("version", 1)
+
+
+class RecvMessage:
+    def __init__(self, connection: Connection):
         self.received = False
         self.message = None
         self.error = False
-        self.client_socket = client_socket
+        self.connection = connection
 
     def receive(self):
-        t = threading.Thread(target=self.recv_blocking)
-        t.start()
+        """
+        Takes the next message from the connection if it has arrived, without blocking.
+        Call it every frame until received or error is True.
+        """
 
-    def recv_blocking(self):
-        logging.debug("Attemting to receive packet")
+        if self.received or self.error:
+            return
 
         try:
-            header = self.client_socket.recv(HEADERSIZE)
+            self._set_message(self.connection.messages.get_nowait())
+
+        except queue.Empty:
+            pass
+
+    def recv_blocking(self, timeout=None):
+        """
+        Waits for the next message from the connection.
+
+        :param timeout: How long to wait in seconds, None to wait forever
+        """
 
-            if header == b"":
-                logging.critical("Server disconnected")
-                self.error = True
-                return
+        try:
+            self._set_message(self.connection.messages.get(timeout=timeout))
 
-            message_length = int(header.decode('utf-8').strip())
-            message = self.client_socket.recv(message_length)
+        except queue.Empty:
+            logging.critical("Timed out waiting for a message")
+            self.error = True
 
-        except (ConnectionResetError, ConnectionAbortedError) as e:
-            logging.exception(e)
+    def _set_message(self, message):
+        if message is DISCONNECTED:
+            # Leave the marker for any later RecvMessage
+            self.connection.messages.put(DISCONNECTED)
             self.error = True
             return
 
+        self.message = message
         self.received = True
-        self.message = json.loads(message)
 
 
 class SendMessage:
-    def __init__(self, client_socket: socket.socket):
+    def __init__(self, connection: Connection):
         self.sent = False
         self.error = False
-        self.client_socket = client_socket
+        self.connection = connection
 
     def send(self, message):
         logging.info(f"Sending message {message}")
 
-        message = json.dumps(message, ensure_ascii=False).encode("utf-8")
-        header_info = f"{len(message):<{HEADERSIZE}}".encode("utf-8")
+        codec = self.connection.codec
+        message = codec.encode(message)
 
         try:
-            self.client_socket.send(header_info)
-            self.client_socket.send(message)
+            with self.connection.send_lock:
+                self.connection.client_socket.sendall(encode_frame(message, codec.binary_header))
+                self.connection.last_sent = time.monotonic()
+
             self.sent = True
 
-        except ConnectionResetError:
+        except OSError:
             self.error = True
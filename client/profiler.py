@@ -0,0 +1,206 @@
+import atexit
+import collections
+import contextlib
+import json
+import logging
+import os
+import time
+
+import pygame
+
+from assets import assets
+from settings import settings
+
+CLIENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+GRAPH_SIZE = (180, 60)
+GRAPH_FRAMES = 180  # frames shown in the graph, one pixel wide each
+OVERLAY_MARGIN = 4
+TEXT_INTERVAL = 30  # frames between updates of the percentiles, so the text isn't rendered every frame
+TRACE_EVENTS = 200000  # the newest events kept for the trace file
+
+FRAME_BUDGET = 1 / 60  # seconds
+GRAPH_COLOR = (80, 220, 80)
+OVER_BUDGET_COLOR = (230, 60, 60)
+BUDGET_LINE_COLOR = (200, 200, 200)
+
+_NO_PHASE = contextlib.nullcontext()
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+
+
+class _Idle(_Phase):
+    __slots__ = ()
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        self.profiler.record(self.name, self.start, end)
+
+        # Waiting for something to happen is not work of the next frame
+        self.profiler.frame_start = end
+
+
+class FrameProfiler:
+    """
+    Times the phases of every frame (event handling, drawing, network calls, ...) when profiling is enabled in
+    settings.json. It draws the work time of recent frames as a graph with percentiles over the window and
+    writes every phase to a Chrome trace file (chrome://tracing or https://ui.perfetto.dev) when the client exits.
+
+    When profiling is disabled, phases are a shared no-op context manager and ticks only tick the clock.
+    """
+
+    def __init__(self, enabled: bool, trace_file: str = "trace.json"):
+        self.enabled = enabled
+        self.trace_file = trace_file
+
+        self.origin = time.perf_counter()
+        self.frame_start = self.origin
+        self.work_times = collections.deque(maxlen=GRAPH_FRAMES)  # seconds of each frame not spent idle
+        self.events = collections.deque(maxlen=TRACE_EVENTS)
+        self.frame_count = 0
+
+        self.font = None
+        self.text_surfaces = []
+
+        if enabled:
+            atexit.register(self.dump)
+
+    def phase(self, name: str):
+        """
+        :return: A context manager that times the code in it as a phase of the current frame
+        """
+
+        return _Phase(self, name) if self.enabled else _NO_PHASE
+
+    def idle(self):
+        """
+        :return: A context manager that times blocking until there is something to do as idle time between frames
+        """
+
+        return _Idle(self, "idle") if self.enabled else _NO_PHASE
+
+    def record(self, name: str, start: float, end: float, category: str = "phase"):
+        self.events.append({"name": name, "cat": category, "ph": "X", "pid": 1, "tid": 1,
+                            "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6})
+
+    def tick(self, clock: pygame.time.Clock, framerate: int, surface: pygame.Surface = None):
+        """
+        Ends the frame: draws the overlay onto the surface and waits for the next frame with the clock
+        """
+
+        if not self.enabled:
+            clock.tick(framerate)
+            return
+
+        if surface is not None:
+            with self.phase("overlay"):
+                self.draw_overlay(surface)
+
+        idle_start = time.perf_counter()
+        clock.tick(framerate)
+        end = time.perf_counter()
+
+        self.record("idle", idle_start, end)
+        self.record("frame", self.frame_start, end, "frame")
+        self.work_times.append(idle_start - self.frame_start)
+
+        self.frame_start = end
+        self.frame_count += 1
+
+    def percentiles(self) -> dict:
+        """
+        :return: The 50th, 90th and 99th percentile of the work time of the frames in the graph, in seconds
+        """
+
+        work_times = sorted(self.work_times)
+
+        if not work_times:
+            return {50: 0.0, 90: 0.0, 99: 0.0}
+
+        return {percent: work_times[min(len(work_times) - 1, len(work_times) * percent // 100)]
+                for percent in (50, 90, 99)}
+
+    def _update_text(self):
+        if self.font is None:
+            self.font = assets.font("profiler")
+
+        percentiles = self.percentiles()
+        lines = [f"work p50 {percentiles[50] * 1000:.1f}ms  p90 {percentiles[90] * 1000:.1f}ms",
+                 f"p99 {percentiles[99] * 1000:.1f}ms  max {max(self.work_times, default=0) * 1000:.1f}ms",
+                 f"assets {sum(assets.memory_usage().values()) / 1024:.0f}KiB"]
+
+        self.text_surfaces = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+
+    def draw_overlay(self, surface: pygame.Surface):
+        if self.frame_count % TEXT_INTERVAL == 0 or not self.text_surfaces:
+            self._update_text()
+
+        text_height = sum(text.get_height() for text in self.text_surfaces)
+        width, height = GRAPH_SIZE[0], GRAPH_SIZE[1] + text_height
+        rect = pygame.Rect(surface.get_width() - width - OVERLAY_MARGIN, OVERLAY_MARGIN, width, height)
+
+        # Opaque, since only the parts of the window that changed are redrawn under it
+        overlay = pygame.Surface(rect.size)
+
+        # The budget of a frame at 60 fps is at a third of the height, so frames up to 3x over it fit
+        scale = GRAPH_SIZE[1] / (FRAME_BUDGET * 3)
+        graph_bottom = GRAPH_SIZE[1] - 1
+
+        for x, work_time in enumerate(self.work_times):
+            bar_height = min(GRAPH_SIZE[1], max(1, int(work_time * scale)))
+            color = OVER_BUDGET_COLOR if work_time > FRAME_BUDGET else GRAPH_COLOR
+            pygame.draw.line(overlay, color, (x, graph_bottom), (x, graph_bottom - bar_height + 1))
+
+        budget_y = graph_bottom - int(FRAME_BUDGET * scale)
+        pygame.draw.line(overlay, BUDGET_LINE_COLOR, (0, budget_y), (width, budget_y))
+
+        y = GRAPH_SIZE[1]
+
+        for text in self.text_surfaces:
+            overlay.blit(text, (2, y))
+            y += text.get_height()
+
+        surface.blit(overlay, rect)
+        pygame.display.update(rect)
+
+    def dump(self):
+        """
+        Writes the recorded phases to the trace file
+        """
+
+        try:
+            with open(self.trace_file, "w") as f:
+                json.dump({"traceEvents": list(self.events), "displayTimeUnit": "ms"}, f)
+
+        except OSError as e:
+            logging.error(f"Couldn't write the profiler trace to {self.trace_file}: {e}")
+
+
+_profiler = None
+
+
+def get_profiler() -> FrameProfiler:
+    """
+    :return: The profiler of the client, which is created with the settings the first time it is asked for, so
+             importing this module doesn't read settings.json
+    """
+
+    global _profiler
+
+    if _profiler is None:
+        _profiler = FrameProfiler(settings["profiler"]["enabled"],
+                                  os.path.join(CLIENT_DIR, settings["profiler"]["trace_file"]))
+
+    return _profiler
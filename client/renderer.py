@@ -0,0 +1,270 @@
+from collections import OrderedDict
+import contextlib
+
+import pygame
+
+from assets import assets
+
+GRID_COLOR = (100, 100, 100)
+
+# Zooming out stops at this cell size, so a viewport never shows more than (width / MIN_CELL_SIZE)² cells
+MIN_CELL_SIZE = 4
+MAX_CELL_SIZE = 64
+ZOOM_STEP = 1.25  # how much one step of the mouse wheel zooms
+
+# Zooming goes through many cell sizes, so only the grids of the last few are kept
+GRID_CACHE_SIZE = 4
+PAN_BUTTONS = (2, 3)  # dragging with the middle or right mouse button scrolls a viewport
+
+_grid_surfaces = OrderedDict()
+assets.track_surfaces("grid lines", _grid_surfaces.values)
+
+
+def grid_surface(dist: int, width: int, height: int) -> pygame.Surface:
+    """
+    :param dist: The cell size
+    :return: Grid lines one cell larger than the given size, so every scroll position is a part of it. It is
+             rendered once per cell size and black is transparent.
+    """
+
+    key = (dist, width, height)
+
+    if key not in _grid_surfaces:
+        surface = pygame.Surface((width + dist, height + dist)).convert()
+        surface.set_colorkey((0, 0, 0))
+
+        for x in range(0, width + dist, dist):
+            pygame.draw.line(surface, GRID_COLOR, (x, 0), (x, height + dist))
+
+        for y in range(0, height + dist, dist):
+            pygame.draw.line(surface, GRID_COLOR, (0, y), (width + dist, y))
+
+        _grid_surfaces[key] = surface
+
+        if len(_grid_surfaces) > GRID_CACHE_SIZE:
+            _grid_surfaces.popitem(last=False)
+
+    _grid_surfaces.move_to_end(key)
+    return _grid_surfaces[key]
+
+
+class Viewport:
+    """
+    The part of a board that is shown in a rect of the window. The mouse wheel zooms in and out around the
+    cursor and dragging with the middle or right mouse button scrolls. Only the cells in view are drawn, so
+    drawing costs the same however large the board is.
+
+    Positions on the board are in board pixels, which are screen pixels with the board's top left corner at 0.
+    """
+
+    def __init__(self, board_size: int, rect, zoomable: bool = True):
+        """
+        :param rect: Where on the window the board is shown
+        :param zoomable: False to always show the whole board, with the cell size that fits it into the rect
+        """
+
+        self.board_size = board_size
+        self.rect = pygame.Rect(rect)
+        self.zoomable = zoomable
+
+        fit = max(1, min(self.rect.width, self.rect.height) // board_size)
+        self.min_cell_size = max(fit, MIN_CELL_SIZE) if zoomable else fit
+        self.max_cell_size = max(MAX_CELL_SIZE, self.min_cell_size) if zoomable else fit
+
+        self.cell_size = self.min_cell_size
+        self.scroll_x = 0
+        self.scroll_y = 0
+        self.panning = False
+
+    def board_pixels(self) -> int:
+        return self.board_size * self.cell_size + 1
+
+    def _clamp_scroll(self):
+        self.scroll_x = min(max(self.scroll_x, 0), max(self.board_pixels() - self.rect.width, 0))
+        self.scroll_y = min(max(self.scroll_y, 0), max(self.board_pixels() - self.rect.height, 0))
+
+    def scroll(self, dx: int, dy: int):
+        self.scroll_x += dx
+        self.scroll_y += dy
+        self._clamp_scroll()
+
+    def zoom(self, steps: float, pos):
+        """
+        :param steps: How many zoom steps to zoom in, negative to zoom out
+        :param pos: The point on the window that stays where it is
+        """
+
+        cell_size = round(self.cell_size * ZOOM_STEP ** steps)
+
+        # Small cells would not change size with a fraction of a step
+        if cell_size == self.cell_size:
+            cell_size += 1 if steps > 0 else -1
+
+        cell_size = min(max(cell_size, self.min_cell_size), self.max_cell_size)
+        x, y = pos[0] - self.rect.x, pos[1] - self.rect.y
+
+        self.scroll_x = (self.scroll_x + x) * cell_size // self.cell_size - x
+        self.scroll_y = (self.scroll_y + y) * cell_size // self.cell_size - y
+        self.cell_size = cell_size
+        self._clamp_scroll()
+
+    def handle_event(self, event: pygame.event.Event) -> bool:
+        """
+        :return: Whether the view changed, so the whole viewport has to be redrawn
+        """
+
+        if not self.zoomable:
+            return False
+
+        if event.type == pygame.MOUSEWHEEL:
+            mouse_pos = pygame.mouse.get_pos()
+
+            if not self.rect.collidepoint(mouse_pos):
+                return False
+
+            previous = (self.cell_size, self.scroll_x, self.scroll_y)
+            self.zoom(event.y, mouse_pos)
+
+            return (self.cell_size, self.scroll_x, self.scroll_y) != previous
+
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button in PAN_BUTTONS:
+            self.panning = self.rect.collidepoint(event.pos)
+
+        elif event.type == pygame.MOUSEBUTTONUP and event.button in PAN_BUTTONS:
+            self.panning = False
+
+        elif event.type == pygame.MOUSEMOTION and self.panning:
+            previous = (self.scroll_x, self.scroll_y)
+            self.scroll(-event.rel[0], -event.rel[1])
+
+            return (self.scroll_x, self.scroll_y) != previous
+
+        return False
+
+    def visible_cells(self) -> tuple:
+        """
+        :return: The first x and y and the x and y after the last of the cells that are at least partly in view
+        """
+
+        return (self.scroll_x // self.cell_size, self.scroll_y // self.cell_size,
+                min(self.board_size, (self.scroll_x + self.rect.width - 1) // self.cell_size + 1),
+                min(self.board_size, (self.scroll_y + self.rect.height - 1) // self.cell_size + 1))
+
+    def is_visible(self, x: int, y: int) -> bool:
+        x_start, y_start, x_end, y_end = self.visible_cells()
+        return x_start <= x < x_end and y_start <= y < y_end
+
+    def cell_rect(self, x: int, y: int) -> pygame.Rect:
+        """
+        :return: The rect of a cell on the window, including the grid lines around it, cut off at the viewport
+        """
+
+        return pygame.Rect(self.rect.x + x * self.cell_size - self.scroll_x,
+                           self.rect.y + y * self.cell_size - self.scroll_y,
+                           self.cell_size + 1, self.cell_size + 1).clip(self.rect)
+
+    def cells_rect(self, coordinates: list) -> pygame.Rect:
+        """
+        :param coordinates: Objects with an x and y, e.g. the coordinates of a ship
+        :return: The smallest rect on the window that contains every cell of them that is in view
+        """
+
+        rects = [rect for rect in (self.cell_rect(coord.x, coord.y) for coord in coordinates) if rect]
+        return rects[0].unionall(rects[1:]) if rects else pygame.Rect(0, 0, 0, 0)
+
+    def cell_at(self, pos):
+        """
+        :param pos: A point on the window, e.g. the mouse position
+        :return: The cell under the point as (x, y), None if it isn't on the board
+        """
+
+        if not self.rect.collidepoint(pos):
+            return None
+
+        x = (pos[0] - self.rect.x + self.scroll_x) // self.cell_size
+        y = (pos[1] - self.rect.y + self.scroll_y) // self.cell_size
+
+        if x >= self.board_size or y >= self.board_size:
+            return None
+
+        return x, y
+
+    def fill_cell(self, surface: pygame.Surface, x: int, y: int, color):
+        """
+        Fills the inside of a cell. Cells partly out of view have to be drawn inside clip().
+        """
+
+        pygame.draw.rect(surface, color, (self.rect.x + x * self.cell_size - self.scroll_x + 1,
+                                          self.rect.y + y * self.cell_size - self.scroll_y + 1,
+                                          self.cell_size - 1, self.cell_size - 1))
+
+    def draw_grid(self, surface: pygame.Surface):
+        grid = grid_surface(self.cell_size, self.rect.width, self.rect.height)
+
+        # The part of the grid surface that lines up with the scroll position, ending with the board
+        area = pygame.Rect(self.scroll_x % self.cell_size, self.scroll_y % self.cell_size,
+                           min(self.rect.width, self.board_pixels() - self.scroll_x),
+                           min(self.rect.height, self.board_pixels() - self.scroll_y))
+
+        surface.blit(grid, self.rect.topleft, area)
+
+    @contextlib.contextmanager
+    def clip(self, surface: pygame.Surface):
+        """
+        Keeps drawing inside the viewport, within any clip the surface already has
+        """
+
+        previous_clip = surface.get_clip()
+        surface.set_clip(previous_clip.clip(self.rect))
+
+        try:
+            yield
+
+        finally:
+            surface.set_clip(previous_clip)
+
+
+class DirtyRenderer:
+    """
+    Keeps track of which parts of the window changed since the last frame. A frame only redraws and pushes
+    those parts to the display, and frames where nothing changed don't draw anything.
+    """
+
+    def __init__(self, surface: pygame.Surface):
+        self.surface = surface
+        self.dirty_rects = []
+        self.full_redraw = True
+
+    def mark_all(self):
+        self.full_redraw = True
+
+    def mark(self, rect):
+        self.dirty_rects.append(pygame.Rect(rect))
+
+    def mark_cell(self, view: Viewport, x: int, y: int):
+        self.mark(view.cell_rect(x, y))
+
+    def handle_event(self, event: pygame.event.Event):
+        # The window contents may be lost when it is covered or restored
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+            self.mark_all()
+
+    def render(self, draw_scene):
+        """
+        :param draw_scene: Draws the whole frame onto the surface. It is clipped to the rect around the dirty rects,
+                           so it runs once however many parts changed, and only the dirty rects are pushed.
+        """
+
+        if self.full_redraw:
+            draw_scene()
+            pygame.display.update()
+
+        elif self.dirty_rects:
+            self.surface.set_clip(self.dirty_rects[0].unionall(self.dirty_rects[1:]))
+            draw_scene()
+
+            self.surface.set_clip(None)
+            pygame.display.update(self.dirty_rects)
+
+        self.full_redraw = False
+        self.dirty_rects = []
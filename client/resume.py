@@ -0,0 +1,50 @@
+import json
+import logging
+import os
+
+from settings import settings
+
+CLIENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _path() -> str:
+    return os.path.join(CLIENT_DIR, settings["network"]["resume_file"])
+
+
+def _load() -> dict:
+    try:
+        with open(_path()) as f:
+            tokens = json.load(f)
+
+    except (OSError, ValueError):
+        return {}
+
+    return tokens if isinstance(tokens, dict) else {}
+
+
+def load_token(address: str):
+    """
+    :param address: The server as "ip:port"
+    :return: The token the server gave the client the last time it connected, None if it never connected
+    """
+
+    return _load().get(address)
+
+
+def save_token(address: str, token: str):
+    """
+    Keeps the token the server gave the client, so the game can be resumed if the server restarts while it is
+    being played, even after the client was closed
+
+    :param address: The server as "ip:port"
+    """
+
+    tokens = _load()
+    tokens[address] = token
+
+    try:
+        with open(_path(), "w") as f:
+            json.dump(tokens, f)
+
+    except OSError as e:
+        logging.warning(f"Couldn't save the resume token, the game can't be resumed after a restart: {e}")
@@ -1,12 +1,24 @@
 import json
+import os
+
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "settings.json")
 
 
 class Settings:
+    """
+    The settings in settings.json. The file is read the first time a setting is looked up and only once, so
+    importing a module that uses settings doesn't touch the disk and works from any working directory.
+    """
+
     def __init__(self, filename):
-        with open(filename) as f:
-            self.SETTINGS = json.load(f)
+        self.filename = filename
+        self.SETTINGS = None
 
     def __getitem__(self, item):
+        if self.SETTINGS is None:
+            with open(self.filename) as f:
+                self.SETTINGS = json.load(f)
+
         try:
             return self.SETTINGS[item]
 
@@ -14,4 +26,4 @@ class Settings:
             raise KeyError(f"Item {item} is not in settings") from e
 
 
-settings = Settings("settings.json")
+settings = Settings(SETTINGS_PATH)
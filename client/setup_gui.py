@@ -2,6 +2,11 @@ import pygame
 
 from settings import settings
 import gui_text
+import renderer
+from shared import fleet
+
+from idle import wait_for_events
+from profiler import get_profiler
 
 from ship_coord import ShipCoordinate
 from ship import Ship
@@ -13,7 +18,7 @@ class SetupGui:
                                          (255, 255, 255), (settings["gui"]["gui_width"] // 2,
                                                            settings["gui"]["y_offset"] - 66))
 
-        self.undo_text = gui_text.Text("Press U to undo placement",
+        self.undo_text = gui_text.Text("Press U to undo, A to auto-place",
                                        (255, 255, 255), (settings["gui"]["gui_width"] // 2,
                                                          settings["gui"]["y_offset"] - 33))
 
@@ -25,40 +30,28 @@ class SetupGui:
         self.surface = surface
         self.place_horizontal = True
 
-        self.ship_lengths = [
-            {"name": "Destroyer", "length": 2},
-            {"name": "Submarine", "length": 3},
-            {"name": "Cruiser", "length": 3},
-            {"name": "Battleship", "length": 4},
-            {"name": "Aircraft Carrier", "length": 5}
-        ]
+        self.ship_lengths = [dict(ship) for ship in fleet.SHIPS]
 
         self.ships = []
+        self.occupied = 0  # occupancy bitmask of the placed ships, see fleet.cells_mask()
+
+        # Zooms and scrolls like the boards of the game, so the cells of large boards stay large enough to click
+        width = settings["gui"]["gui_width"]
+        self.view = renderer.Viewport(board_size, (0, 0, width, width + 1))
+
+        self.renderer = renderer.DirtyRenderer(surface)
+        self.preview_state = None
+        self.preview_rect = None
 
     def _draw_background(self):
         self.surface.fill(settings["colors"]["water_color"])
 
     def _draw_ships(self):
         for ship in self.ships:
-            ship.draw(self.surface, self.board_size)
-
-    def _draw_grid(self, y_offset=0):
-        size_between = settings["gui"]["gui_width"] // self.board_size
-
-        x = 0
-        y = y_offset
-
-        for _ in range(self.board_size + 1):
-            # Draw vertical lines
-            pygame.draw.line(self.surface, (100, 100, 100),
-                             (x, y_offset),
-                             (x, self.board_size * size_between + y_offset))
+            ship.draw(self.surface, self.view)
 
-            # Draw horizontal lines
-            pygame.draw.line(self.surface, (100, 100, 100), (0, y), (settings["gui"]["gui_width"], y))
-
-            x += size_between
-            y += size_between
+    def _draw_grid(self):
+        self.view.draw_grid(self.surface)
 
     def _draw_preview_ship(self):
         """
@@ -69,48 +62,79 @@ class SetupGui:
         if len(self.ship_lengths) == 0:
             return
 
-        mouse_pos = pygame.mouse.get_pos()
+        coords = self.view.cell_at(pygame.mouse.get_pos())
 
         # If the mouse is out of the board
-        if mouse_pos[1] >= settings["gui"]["gui_width"]:
+        if coords is None:
             return
 
-        coords = (int(mouse_pos[0] / settings["gui"]["gui_width"] * self.board_size),
-                  int(mouse_pos[1] / settings["gui"]["gui_width"] * self.board_size))
-
         can_be_placed, preview_ship = self._add_ship(coords[0], coords[1],
                                                      self.ship_lengths[-1]["length"],
                                                      self.ship_lengths[-1]["name"])
 
         # If a ship can be placed at that location
-        dist = settings["gui"]["gui_width"] // self.board_size
-
         if can_be_placed:
-            # Draw the ship
-            for coord in preview_ship.coordinates:
-                pygame.draw.rect(self.surface, settings["colors"]["preview_ship_color"],
-                                 (coord.x * dist + 1, coord.y * dist + 1,
-                                  dist - 1, dist - 1))
+            color = settings["colors"]["preview_ship_color"]
 
         else:
-            # Draw the ship
-            for coord in preview_ship.coordinates:
-                if coord.y * dist + 1 >= settings["gui"]["gui_width"]:
-                    break
+            color = settings["colors"]["preview_ship_cannot_place_color"]
 
-                pygame.draw.rect(self.surface, settings["colors"]["preview_ship_cannot_place_color"],
-                                 (coord.x * dist + 1, coord.y * dist + 1,
-                                  dist - 1, dist - 1))
+        # A ship that can't be placed may stick out of the board
+        for coord in preview_ship.coordinates:
+            if self.view.is_visible(coord.x, coord.y):
+                self.view.fill_cell(self.surface, coord.x, coord.y, color)
 
-    def draw(self):
+    def _update_preview_ship(self):
+        """
+        Marks the old and new area of the preview ship as dirty if the preview ship changed
+        """
+
+        coords = self.view.cell_at(pygame.mouse.get_pos())
+
+        # The preview moves on the window when the view zooms or scrolls
+        preview_state = (coords, self.place_horizontal, len(self.ship_lengths),
+                         self.view.cell_size, self.view.scroll_x, self.view.scroll_y)
+
+        if preview_state == self.preview_state:
+            return
+
+        if self.preview_rect is not None:
+            self.renderer.mark(self.preview_rect)
+
+        self.preview_state = preview_state
+        self.preview_rect = None
+
+        if len(self.ship_lengths) > 0 and coords is not None:
+            _, preview_ship = self._add_ship(coords[0], coords[1], self.ship_lengths[-1]["length"],
+                                             self.ship_lengths[-1]["name"])
+
+            self.preview_rect = self.view.cells_rect(preview_ship.coordinates)
+            self.renderer.mark(self.preview_rect)
+
+    def _change_text(self, new_text, new_color):
+        self.renderer.mark(self.submit_text.rect)
+        self.submit_text.change_text(new_text)
+        self.submit_text.change_color(new_color)
+        self.renderer.mark(self.submit_text.rect)
+
+    def _draw_scene(self):
         self.surface.fill((0, 0, 0))
         self.rotate_text.draw(self.surface)
         self.undo_text.draw(self.surface)
         self.submit_text.draw(self.surface)
-        self._draw_grid()
-        self._draw_ships()
-        self._draw_preview_ship()
-        pygame.display.update()
+
+        with self.view.clip(self.surface):
+            self._draw_grid()
+            self._draw_ships()
+            self._draw_preview_ship()
+
+    def draw(self):
+        """
+        Draws the parts of the window that changed since the last frame
+        """
+
+        self._update_preview_ship()
+        self.renderer.render(self._draw_scene)
 
     def _add_ship(self, x: int, y: int, length: int, name: str):
         """
@@ -138,37 +162,63 @@ class SetupGui:
             else:
                 coordinates.append(ShipCoordinate(x, y + i))
 
-        # Check if the ship overlaps with any other ship
-        # and if it does, can_be_placed will be false
-        for ship in self.ships:
-            for coord1 in coordinates:
-                for coord2 in ship.coordinates:
-                    if coord1.x == coord2.x and coord1.y == coord2.y:
-                        return False, Ship(coordinates, name)
+        # A ship that is off the board can't overlap, and its cells would wrap around into the next row
+        if can_be_placed and fleet.cells_mask(self.board_size, self._cells(coordinates)) & self.occupied:
+            can_be_placed = False
 
         return can_be_placed, Ship(coordinates, name)
 
+    @staticmethod
+    def _cells(coordinates: list) -> list:
+        return [(coord.x, coord.y) for coord in coordinates]
+
+    def _place_ship(self, ship: Ship):
+        self.ships.append(ship)
+        self.ship_lengths.pop()
+        self.occupied |= fleet.cells_mask(self.board_size, self._cells(ship.coordinates))
+        self.renderer.mark(self.view.cells_rect(ship.coordinates))
+
+    def _auto_place(self):
+        """
+        Places the ships that are left at random spots around the ships that were placed by hand
+        """
+
+        # Ships are placed from the end of the list
+        try:
+            new_fleet = fleet.random_fleet(self.board_size, self.ship_lengths[::-1],
+                                           occupied_cells=[cell for ship in self.ships
+                                                           for cell in self._cells(ship.coordinates)])
+
+        except ValueError:
+            self._change_text("No room for the remaining ships", (255, 0, 0))
+            return
+
+        for name, *coords in new_fleet:
+            self._place_ship(Ship([ShipCoordinate(x, y) for x, y in coords], name))
+
     def _handle_event(self, event: pygame.event):
         if event.type == pygame.QUIT:
             pygame.quit()
             exit()
 
-        if event.type == pygame.MOUSEBUTTONDOWN and len(self.ship_lengths) > 0:
-            mouse_pos = pygame.mouse.get_pos()
+        self.renderer.handle_event(event)
+
+        if self.view.handle_event(event):
+            self.renderer.mark(self.view.rect)
+
+        # The other buttons scroll and zoom
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and len(self.ship_lengths) > 0:
+            coords = self.view.cell_at(event.pos)
 
             # If it is out of the board
-            if mouse_pos[1] >= settings["gui"]["gui_width"]:
+            if coords is None:
                 return
 
-            coords = (int(mouse_pos[0] / settings["gui"]["gui_width"] * self.board_size),
-                      int(mouse_pos[1] / settings["gui"]["gui_width"] * self.board_size))
-
             can_be_placed, ship = self._add_ship(coords[0], coords[1], self.ship_lengths[-1]["length"],
                                                  self.ship_lengths[-1]["name"])
 
             if can_be_placed:
-                self.ships.append(ship)
-                self.ship_lengths.pop()
+                self._place_ship(ship)
 
         if event.type == pygame.KEYDOWN:
             if exit_ship_placement := self._handle_keys_pressed(pygame.key.get_pressed()):
@@ -185,16 +235,19 @@ class SetupGui:
 
         if keys[pygame.K_u] and len(self.ships) != 0:
             popped_ship = self.ships.pop()
+            self.occupied &= ~fleet.cells_mask(self.board_size, self._cells(popped_ship.coordinates))
+            self.renderer.mark(self.view.cells_rect(popped_ship.coordinates))
             self.ship_lengths.append({"name": popped_ship.name, "length": len(popped_ship.coordinates)})
 
+        if keys[pygame.K_a] and len(self.ship_lengths) != 0:
+            self._auto_place()
+
         if keys[pygame.K_RETURN]:
-            if len(self.ships) == 5:
-                self.submit_text.change_text("Submitted, waiting for opponent")
-                self.submit_text.change_color((2, 217, 2))
+            if len(self.ship_lengths) == 0:
+                self._change_text("Submitted, waiting for opponent", (2, 217, 2))
                 return True
 
-            self.submit_text.change_text("Place all ships before submitting")
-            self.submit_text.change_color((255, 0, 0))
+            self._change_text("Place all ships before submitting", (255, 0, 0))
 
         return False
 
@@ -206,9 +259,9 @@ class SetupGui:
         clock = pygame.time.Clock()
 
         while True:
-            for event in pygame.event.get():
+            with get_profiler().phase("draw"):
+                self.draw()
+
+            for event in wait_for_events(clock, 60, self.surface):
                 if self._handle_event(event):
                     return self.ships
-
-            self.draw()
-            clock.tick(60)
@@ -1,5 +1,3 @@
-import pygame
-
 from settings import settings
 import ship_coord
 
@@ -32,13 +30,16 @@ class Ship:
     def has_coords(self, x, y):
         return any(coord.x == x and coord.y == y for coord in self.coordinates)
 
-    def draw(self, surface, board_size, y_offset=0):
-        dist = settings["gui"]["gui_width"] // board_size
+    def draw(self, surface, view):
+        """
+        :param view: The renderer.Viewport of the board the ship is on
+        """
+
+        x_start, y_start, x_end, y_end = view.visible_cells()
 
         for coord in self.coordinates:
-            pygame.draw.rect(surface, settings["colors"]["ship_color"],
-                             (coord.x * dist + 1, coord.y * dist + y_offset + 1,
-                              dist - 1, dist - 1))
+            if x_start <= coord.x < x_end and y_start <= coord.y < y_end:
+                view.fill_cell(surface, coord.x, coord.y, settings["colors"]["ship_color"])
 
     def to_list(self):
         return [[coord.x, coord.y] for coord in self.coordinates]
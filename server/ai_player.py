@@ -0,0 +1,312 @@
+import asyncio
+import logging
+import random
+import time
+
+import numpy as np
+
+import board
+import constants
+from shared import fleet, protocol
+
+# How much more a placement counts for each unsunk hit it covers
+TARGET_WEIGHT = 50
+
+
+def _along(axis: int, start: int, stop: int) -> tuple:
+    """
+    :return: An index of a 2D array that slices one axis
+    """
+
+    return (slice(None), slice(start, stop)) if axis == 1 else (slice(start, stop), slice(None))
+
+
+def _window_sums(values: np.ndarray, length: int, axis: int) -> np.ndarray:
+    """
+    :return: The sum of every window of the given length along the axis. The axis shrinks by length - 1.
+    """
+
+    pad = [(0, 0), (0, 0)]
+    pad[axis] = (1, 0)
+    cumulative = np.pad(np.cumsum(values, axis=axis, dtype=np.int64), pad)
+
+    size = cumulative.shape[axis]
+    return cumulative[_along(axis, length, size)] - cumulative[_along(axis, 0, size - length)]
+
+
+def _coverage(starts: np.ndarray, length: int, axis: int) -> np.ndarray:
+    """
+    :param starts: The weight of the placement starting at each cell, length - 1 cells shorter than the board
+    :return: For every cell, the total weight of the placements covering it
+    """
+
+    pad = [(0, 0), (0, 0)]
+    pad[axis] = (length - 1, length - 1)
+    return _window_sums(np.pad(starts, pad), length, axis)
+
+
+def placement_density(blocked: np.ndarray, lengths: dict, axis: int, hits: np.ndarray = None) -> np.ndarray:
+    """
+    Counts, for every cell, the legal placements along an axis of the remaining ships that cover it.
+
+    :param blocked: Cells no ship can be on
+    :param lengths: The number of remaining ships of each length
+    :param axis: 1 for horizontal placements, 0 for vertical ones
+    :param hits: Unsunk hits. If given, only placements covering a hit count, weighted by how many they cover
+    :return: The density of each cell
+    """
+
+    density = np.zeros(blocked.shape, dtype=np.int64)
+
+    for length, count in lengths.items():
+        if length > blocked.shape[axis]:
+            continue
+
+        starts = _window_sums(blocked, length, axis) == 0
+
+        if hits is None:
+            starts = starts.astype(np.int64)
+
+        else:
+            starts = starts * _window_sums(hits, length, axis) * TARGET_WEIGHT
+
+        density += count * _coverage(starts, length, axis)
+
+    return density
+
+
+class Targeter:
+    """
+    Picks shots with a probability density over every legal placement of the ships that are still afloat.
+
+    While hunting, densities are kept per axis and only the row and column of a shot are recomputed, so a move
+    costs O(board size) instead of O(cells). Once a ship is hit, targeting only looks at the area a ship covering
+    the unsunk hits could be in.
+    """
+
+    def __init__(self, board_size: int, ships: list, rng: random.Random):
+        """
+        :param ships: The ships of the opponent, as dicts with a name and a length
+        """
+
+        self.board_size = board_size
+        self.rng = rng
+        self.remaining = [dict(ship_spec) for ship_spec in ships]
+
+        self.shots = np.zeros((board_size, board_size), dtype=bool)
+        self.blocked = np.zeros((board_size, board_size), dtype=bool)  # misses and sunk ships
+        self.hits = np.zeros((board_size, board_size), dtype=bool)  # hits on ships that are not sunk yet
+
+        self._recompute()
+
+    def _lengths(self) -> dict:
+        lengths = {}
+
+        for ship_spec in self.remaining:
+            lengths[ship_spec["length"]] = lengths.get(ship_spec["length"], 0) + 1
+
+        return lengths
+
+    def _recompute(self):
+        lengths = self._lengths()
+        self.horizontal = placement_density(self.blocked, lengths, 1)
+        self.vertical = placement_density(self.blocked, lengths, 0)
+
+        # The hunting density, with the cells that were already shot at ruled out
+        self.density = self.horizontal + self.vertical
+        self.density[self.shots] = -1
+
+    def _recompute_lines(self, x: int, y: int):
+        lengths = self._lengths()
+        self.horizontal[y:y + 1] = placement_density(self.blocked[y:y + 1], lengths, 1)
+        self.vertical[:, x:x + 1] = placement_density(self.blocked[:, x:x + 1], lengths, 0)
+
+        # A miss only changes the placements through its row and column
+        for line in (np.s_[y, :], np.s_[:, x]):
+            self.density[line] = self.horizontal[line] + self.vertical[line]
+            self.density[line][self.shots[line]] = -1
+
+    def _best(self, density: np.ndarray, x_offset: int = 0, y_offset: int = 0):
+        """
+        :return: A random cell out of the cells with the highest density, in board coordinates
+        """
+
+        best_cells = np.flatnonzero(density == density.max())
+        y, x = np.unravel_index(self.rng.choice(best_cells), density.shape)
+
+        return int(x) + x_offset, int(y) + y_offset
+
+    def choose_shot(self):
+        if self.hits.any():
+            shot = self._target()
+
+            # Hits that could not be matched to a sunk ship may have nothing left to target around them
+            if shot is not None:
+                return shot
+
+        return self._best(self.density)
+
+    def _target(self):
+        """
+        :return: The best shot out of the cells a ship covering an unsunk hit could be on, None if there is none
+        """
+
+        reach = max(ship_spec["length"] for ship_spec in self.remaining) - 1
+        ys, xs = np.nonzero(self.hits)
+        x_start, y_start = max(int(xs.min()) - reach, 0), max(int(ys.min()) - reach, 0)
+        x_end, y_end = int(xs.max()) + reach + 1, int(ys.max()) + reach + 1
+
+        blocked = self.blocked[y_start:y_end, x_start:x_end]
+        hits = self.hits[y_start:y_end, x_start:x_end]
+        lengths = self._lengths()
+
+        density = placement_density(blocked, lengths, 1, hits) + placement_density(blocked, lengths, 0, hits)
+        density[self.shots[y_start:y_end, x_start:x_end]] = -1
+
+        if density.max() <= 0:
+            return None
+
+        return self._best(density, x_start, y_start)
+
+    def record_shot(self, x: int, y: int, hit: bool, sunk_ship_name: str = None):
+        self.shots[y, x] = True
+
+        if not hit:
+            self.blocked[y, x] = True
+            self._recompute_lines(x, y)
+            return
+
+        self.hits[y, x] = True
+        self.density[y, x] = -1
+
+        if sunk_ship_name is not None:
+            self._sink(x, y, sunk_ship_name)
+
+    def _sink(self, x: int, y: int, name: str):
+        """
+        Marks the hits that most likely belong to the ship that was just sunk at (x, y) as sunk
+        """
+
+        for ship_spec in self.remaining:
+            if ship_spec["name"] == name:
+                self.remaining.remove(ship_spec)
+                length = ship_spec["length"]
+                break
+
+        else:
+            logging.warning(f"The AI sunk a ship it doesn't know about: {name}")
+            return
+
+        # Find a line of unsunk hits of the ship's length through the last shot
+        for dx, dy in ((1, 0), (0, 1)):
+            for start in range(length):
+                cells = [(x + (i - start) * dx, y + (i - start) * dy) for i in range(length)]
+
+                if all(0 <= cx < self.board_size and 0 <= cy < self.board_size and self.hits[cy, cx]
+                       for cx, cy in cells):
+                    for cx, cy in cells:
+                        self.hits[cy, cx] = False
+                        self.blocked[cy, cx] = True
+
+                    break
+
+            else:
+                continue
+
+            break
+
+        if self.remaining:
+            self._recompute()
+
+
+class AIPlayer:
+    """
+    Takes a seat in a Game in place of a socket backed Player. It reacts to the messages the game sends and
+    answers with a random fleet, its moves and its endgame board.
+    """
+
+    def __init__(self, board_size: int = constants.BOARD_SIZE, seed=None):
+        self.board_size = board_size
+        self.board = None
+        self.random = random.Random(seed)
+        self.version = protocol.VERSION
+
+        self.fleet = []
+        self.fleet_cells = set()
+        self.targeter = None
+        self.last_shot = None
+        self.last_shot_hit = False
+        self.opponent_shots = {"hits": [], "misses": []}
+        self.game_over = False
+        self.waiting_for_fleet = True
+
+    def assign_ships(self, ships: list, board_size: int):
+        self.board = board.create_board(board_size, ships)
+
+    def is_connected(self) -> bool:
+        return True
+
+    def _new_game(self):
+        self.fleet = fleet.random_fleet(self.board_size, rng=self.random)
+        self.fleet_cells = {tuple(cell) for ship_list in self.fleet for cell in ship_list[1:]}
+        self.targeter = Targeter(self.board_size, fleet.SHIPS, self.random)
+        self.opponent_shots = {"hits": [], "misses": []}
+        self.game_over = False
+        self.waiting_for_fleet = False
+
+    def _choose_move(self) -> list:
+        start = time.perf_counter()
+        self.last_shot = self.targeter.choose_shot()
+        elapsed = time.perf_counter() - start
+
+        if elapsed > constants.AI_TURN_BUDGET:
+            logging.warning(f"AI move took {elapsed * 1000:.1f}ms, over the budget of "
+                            f"{constants.AI_TURN_BUDGET * 1000:.1f}ms")
+
+        return list(self.last_shot)
+
+    async def receive(self, timeout: float = None):
+        if self.waiting_for_fleet:
+            self._new_game()
+            return self.fleet
+
+        if self.game_over:
+            self.waiting_for_fleet = True
+            return {"hits": self.opponent_shots["hits"], "misses": self.opponent_shots["misses"],
+                    "ships": [ship_list[1:] for ship_list in self.fleet]}
+
+        return self._choose_move()
+
+    async def watch(self):
+        """
+        The AI never disconnects, so this waits until it is cancelled
+        """
+
+        await asyncio.get_running_loop().create_future()
+
+    async def send(self, message):
+        if isinstance(message, dict) and "hit" in message:
+            self.targeter.record_shot(*self.last_shot, message["hit"], message["sunk"])
+            self.game_over = message["game_status"] is not None
+
+        elif message in ("hit", "miss"):
+            self.last_shot_hit = message == "hit"
+
+        elif isinstance(message, str) and message.startswith(protocol.SUNK_PREFIX):
+            self.targeter.record_shot(*self.last_shot, True, message[len(protocol.SUNK_PREFIX):])
+
+        elif message == "no ship sank":
+            self.targeter.record_shot(*self.last_shot, self.last_shot_hit)
+
+        elif isinstance(message, dict) and "game_status" in message:
+            move = message["move"]
+
+            if move is not None:
+                self.opponent_shots["hits" if tuple(move) in self.fleet_cells else "misses"].append(move)
+
+            self.game_over = message["game_status"] is not None
+
+        return True
+
+    async def close(self):
+        pass
@@ -1,26 +1,84 @@
+from shared.shot_result import ShotResult
+
+try:
+    from shared import array_board
+
+except ImportError:  # NumPy is only needed for large boards
+    array_board = None
+
+
+def create_board(size: int, ships: list):
+    """
+    :return: A NumPy backed board for large sizes if NumPy is installed, otherwise a bitmask board
+    """
+
+    if array_board is not None and size >= array_board.MIN_BOARD_SIZE:
+        return array_board.ArrayBoard(size, ships)
+
+    return Board(size, ships)
 
 
 class Board:
+    """
+    Stores the board as integer bitmasks: one occupancy mask per ship and one mask of every hit.
+    The bit of the cell (x, y) is y * size + x.
+    """
+
     def __init__(self, size: int, ships: list):
         self.size = size
+        self.place_ships(ships)
+
+    def place_ships(self, ships: list):
         self.ships = ships
+        self.ship_masks = []
+        self.hits = 0
+        self.ships_afloat = len(ships)
+
+        # Maps the bit index of each occupied cell to the index of the ship on it
+        self._cell_ships = {}
+
+        for ship_index, ship_obj in enumerate(ships):
+            mask = 0
+
+            for coord in ship_obj.coordinates:
+                bit_index = coord.y * self.size + coord.x
+                mask |= 1 << bit_index
+                self._cell_ships[bit_index] = ship_index
+
+            self.ship_masks.append(mask)
 
     def is_lost(self) -> bool:
-        return all(ship.is_sunk() for ship in self.ships)
+        return self.ships_afloat == 0
 
-    def fire_at(self, x, y) -> str:
+    def fire_at(self, x, y) -> ShotResult:
         """
         Fires at a certain x and y position. If it is a hit, it damages the ship.
 
         :param x: The x coordinate to fire a shell at
         :param y: The y coordinate to fire a shell at
-        :return: Whether the shell hit a ship (in other words, whether it was a hit)
+        :return: Whether the shell hit, the name of the ship it hit, if that ship is sunk and if the whole fleet is
+        :raise IndexError: If the coordinates are off the board
         """
 
-        hit_ship_name = ""
+        # Off the board coordinates would otherwise land on a cell of another row
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            raise IndexError(f"{x}, {y} is off the board")
+
+        bit_index = y * self.size + x
+        ship_index = self._cell_ships.get(bit_index)
+
+        if ship_index is None:
+            return ShotResult(False, "", False, self.is_lost())
+
+        bit = 1 << bit_index
+        ship_mask = self.ship_masks[ship_index]
+        sunk = self.hits & ship_mask == ship_mask
+
+        if not self.hits & bit:
+            self.hits |= bit
 
-        for ship in self.ships:
-            if ship.hit(x, y):
-                hit_ship_name = ship.name
+            if not sunk and self.hits & ship_mask == ship_mask:
+                sunk = True
+                self.ships_afloat -= 1
 
-        return hit_ship_name
+        return ShotResult(True, self.ships[ship_index].name, sunk, self.is_lost())
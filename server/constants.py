@@ -1,2 +1,19 @@
+import socket
+
 BOARD_SIZE = 10
-HEADERSIZE = 10
+HELLO_TIMEOUT = 0.5  # seconds to wait for a client to negotiate the protocol
+
+# Seconds a player may send nothing in each phase of a game before the game is abandoned. Clients that send
+# heartbeats only reach them once they are gone, older clients have to place their ships or move in time.
+IDLE_TIMEOUTS = {"setup": 300, "turn": 120, "endgame": 30}
+AI_TURN_BUDGET = 0.005  # seconds of CPU an AI move should stay under
+MOVE_LOG_PATH = "moves.log"
+MOVE_LOG_SYNC_INTERVAL = 0.05  # seconds between writes of the move log to disk
+RESUME_TIMEOUT = 600  # seconds both players have to reconnect to a game after the server stopped
+SPECTATOR_BUFFER_LIMIT = 256 * 1024  # bytes a spectator may fall behind by before it is dropped
+
+IP = socket.gethostbyname(socket.gethostname())
+PORT = 9850
+BACKLOG = 1024
+METRICS_IP = "127.0.0.1"
+METRICS_PORT = 9851
@@ -0,0 +1,105 @@
+from shared import fleet, protocol
+
+MALFORMED, COMPOSITION, OUT_OF_BOUNDS, NOT_CONTIGUOUS, OVERLAP = protocol.INVALID_FLEET_REASONS
+
+
+class InvalidFleet(ValueError):
+    def __init__(self, reason: str, message: str):
+        """
+        :param reason: One of protocol.INVALID_FLEET_REASONS
+        """
+
+        super().__init__(message)
+        self.reason = reason
+
+
+class FleetValidator:
+    """
+    Checks the fleets clients send against the board and the ships every player has to place, in one pass over
+    the cells of the ships. The cells taken so far are kept in a set, so a check takes time linear in the size of
+    the fleet, however large the board is.
+    """
+
+    def __init__(self, board_size: int, ships: list = None):
+        """
+        :param ships: Dicts with the name and length of every ship a fleet must have, fleet.SHIPS by default
+        """
+
+        self.board_size = board_size
+        self.lengths = {ship["name"]: ship["length"] for ship in (fleet.SHIPS if ships is None else ships)}
+
+    def validate(self, ships):
+        """
+        :param ships: A fleet as sent by a client: [[name, [x, y], ...], ...]
+        :raise InvalidFleet: If the fleet isn't made of the expected ships, or a ship is off the board, isn't a
+                             straight line of neighboring cells or overlaps another ship
+        """
+
+        if not isinstance(ships, list):
+            raise InvalidFleet(MALFORMED, "The fleet is not a list of ships")
+
+        if len(ships) != len(self.lengths):
+            raise InvalidFleet(COMPOSITION, f"The fleet has {len(ships)} ships instead of {len(self.lengths)}")
+
+        size = self.board_size
+        taken = set()  # y * size + x of every cell of the ships checked so far
+        seen = set()
+
+        for ship in ships:
+            if not isinstance(ship, list) or not ship or not isinstance(ship[0], str):
+                raise InvalidFleet(MALFORMED, "A ship is not a name followed by coordinates")
+
+            name = ship[0]
+
+            if name not in self.lengths or name in seen:
+                raise InvalidFleet(COMPOSITION, f"The fleet has an unexpected or a second {name}")
+
+            if len(ship) - 1 != self.lengths[name]:
+                raise InvalidFleet(COMPOSITION, f"The {name} has {len(ship) - 1} cells instead of "
+                                                f"{self.lengths[name]}")
+
+            seen.add(name)
+            first = ship[1]
+            in_row = in_column = True
+            lowest, highest = 2 * size, -1  # of x + y, which only changes along the ship if it is a line
+
+            for coord in ship[1:]:
+                # bool is a subclass of int, but True isn't a coordinate
+                if (type(coord) not in (list, tuple) or len(coord) != 2 or type(coord[0]) is not int
+                        or type(coord[1]) is not int):
+                    raise InvalidFleet(MALFORMED, f"The {name} has a coordinate that isn't two integers")
+
+                x, y = coord
+
+                if not (0 <= x < size and 0 <= y < size):
+                    raise InvalidFleet(OUT_OF_BOUNDS, f"The {name} is off the board at {x}, {y}")
+
+                cell = y * size + x
+
+                # Also catches a ship that has the same cell twice
+                if cell in taken:
+                    raise InvalidFleet(OVERLAP, f"The {name} overlaps a ship at {x}, {y}")
+
+                taken.add(cell)
+                in_row = in_row and y == first[1]
+                in_column = in_column and x == first[0]
+
+                if x + y < lowest:
+                    lowest = x + y
+
+                if x + y > highest:
+                    highest = x + y
+
+            # Its cells are all different, so a line that spans as many cells as the ship has has no gaps
+            if not ((in_row or in_column) and highest - lowest + 1 == len(ship) - 1):
+                raise InvalidFleet(NOT_CONTIGUOUS, f"The {name} is not a straight line of neighboring cells")
+
+
+def validate(ships, board_size: int):
+    """
+    Checks a fleet of the ships in fleet.SHIPS
+
+    :raise InvalidFleet: If the fleet is invalid
+    """
+
+    FleetValidator(board_size).validate(ships)
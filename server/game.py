@@ -1,73 +1,314 @@
+import asyncio
+import logging
+import time
+
 import ship_coord
 import constants
+import fleet_validator
+import metrics
 import ship
+from shared import protocol
+
+
+class InvalidMove(ValueError):
+    """
+    A player fired at something that isn't a cell of the board
+    """
 
 
 class Game:
-    def __init__(self, players: list):
+    def __init__(self, players: list, board_size: int = constants.BOARD_SIZE, move_log=None, broadcast=None,
+                 idle_timeouts: dict = None):
+        """
+        :param move_log: The move_log.MoveLog to record the game in, None to not record it. Games are only
+                         recorded if every player has a resume token.
+        :param broadcast: The spectators.Broadcast to send the shots to, None if the match can't be watched
+        :param idle_timeouts: Seconds a player may be silent in the setup, turn and endgame phases, by phase
+        """
+
         self.players = players
+        self.board_size = board_size
+        self.move_log = move_log if all(getattr(p, "token", None) for p in players) else None
+        self.broadcast = broadcast
+        self.idle_timeouts = idle_timeouts or constants.IDLE_TIMEOUTS
+        self.game_id = None  # the id of the game in the move log while it is in progress
+        self.watch = None  # the task reading from the player that waits for the other one's move
+        self.receiving = False  # if a move is being received, which a failed watch interrupts
 
-    def send_start_messages(self):
+    async def send_start_messages(self):
         for player in self.players:
-            player.send("start")
-            player.send(str(constants.BOARD_SIZE))
+            await player.send("start")
+            await player.send(str(self.board_size))
 
-    def get_ships(self):
-        for player in self.players:
-            ships = player.receive()
-            ships_objects = []
+    @staticmethod
+    def _ship_objects(ships: list) -> list:
+        ships_objects = []
 
-            for ship_coords in ships:
-                print(ship_coords)
-                coords_object = [ship_coord.ShipCoordinate(*coord) for coord in ship_coords[1:]]
-                ships_objects.append(ship.Ship(ship_coords[0], coords_object))
+        for ship_coords in ships:
+            coords_object = [ship_coord.ShipCoordinate(*coord) for coord in ship_coords[1:]]
+            ships_objects.append(ship.Ship(ship_coords[0], coords_object))
 
-            player.assign_ships(ships_objects)
+        return ships_objects
 
-    def main_game_loop(self):
-        for player in self.players:
-            player.send("starting")
+    async def _receive_all(self, timeout: float) -> list:
+        """
+        Receives the next message of every player at the same time, so a player that is gone is noticed while
+        waiting for the other one
+
+        :raise player.Disconnected: As soon as one of the players disconnects or times out
+        """
+
+        receives = [asyncio.ensure_future(player.receive(timeout)) for player in self.players]
+
+        try:
+            return await asyncio.gather(*receives)
+
+        finally:
+            for receive in receives:
+                receive.cancel()
+
+    async def _receive_move(self, turn: int):
+        """
+        Receives the move of the player whose turn it is while watching the other player, so a player that is
+        gone is noticed while the other one is thinking. The move is awaited directly rather than in a task of
+        its own, which would add two trips through the event loop to every turn, and a failed watch interrupts
+        it by cancelling the game's task.
+
+        :raise player.Disconnected: As soon as one of the players disconnects or times out
+        """
+
+        await self._stop_watching()
+
+        game_task = asyncio.current_task()
+        self.watch = asyncio.ensure_future(self.players[1 - turn].watch())
+        self.watch.add_done_callback(lambda watch: self._watch_ended(watch, game_task))
+        self.receiving = True
+
+        try:
+            move = await self.players[turn].receive(self.idle_timeouts["turn"])
+
+        except asyncio.CancelledError:
+            # Raises the disconnect of the other player if that is why the receive was cancelled
+            if self.watch.done() and not self.watch.cancelled():
+                self.watch.result()
+
+            raise
+
+        finally:
+            self.receiving = False
+            self.watch.cancel()
+
+        # The other player may have disconnected just as the move arrived
+        if self.watch.done() and not self.watch.cancelled():
+            self.watch.result()
+
+        return move
+
+    def _watch_ended(self, watch: asyncio.Future, game_task: asyncio.Task):
+        if self.receiving and not watch.cancelled():
+            game_task.cancel()
+
+    async def _stop_watching(self):
+        """
+        Waits for the last watch to end after it was cancelled, as a player can't be read from while the watch
+        still is. This only happens once the player whose turn it was got the result of their move.
+        """
+
+        # The cancelled watch was scheduled to run before this task, so it ends within a pass of the event loop,
+        # where awaiting it would take three
+        while self.watch is not None and not self.watch.done():
+            await asyncio.sleep(0)
+
+        self.watch = None
+
+    def check_move(self, move):
+        """
+        :param move: A move as sent by a client: [x, y]
+        :raise InvalidMove: If the move isn't two integers on the board
+        """
+
+        # bool is a subclass of int, but True isn't a coordinate
+        if type(move) not in (list, tuple) or len(move) != 2 or type(move[0]) is not int or type(move[1]) is not int:
+            raise InvalidMove(f"The move {move!r} is not two integers")
+
+        if not (0 <= move[0] < self.board_size and 0 <= move[1] < self.board_size):
+            raise InvalidMove(f"The move {move} is off the board")
+
+    async def get_ships(self):
+        start = time.perf_counter()
+        fleets = await self._receive_all(self.idle_timeouts["setup"])
+
+        # Nothing is built or logged before both fleets are known to follow the rules
+        for player, ships in zip(self.players, fleets):
+            try:
+                fleet_validator.validate(ships, self.board_size)
+
+            except fleet_validator.InvalidFleet as e:
+                metrics.invalid_fleets.inc()
+                await player.send(protocol.invalid_fleet(e.reason, str(e)))
+
+                for opponent in self.players:
+                    if opponent is not player:
+                        await opponent.send(protocol.aborted("The match was abandoned, your opponent's fleet "
+                                                             "broke the rules"))
+
+                raise
+
+        for player, ships in zip(self.players, fleets):
+            player.assign_ships(self._ship_objects(ships), self.board_size)
+
+        metrics.get_ships_seconds.observe(time.perf_counter() - start)
+
+        # Only games where both fleets are in can be resumed
+        if self.move_log is not None:
+            self.game_id = self.move_log.start_game(self.board_size, [p.token for p in self.players])
+
+            for seat, ships in enumerate(fleets):
+                self.move_log.fleet(self.game_id, seat, ships)
+
+        if self.broadcast is not None:
+            self.broadcast.start_game()
+
+    async def resume(self, recovered):
+        """
+        Continues a game from the move log after a restart of the server. Both players get the state of the game
+        and the game goes on with the player whose turn it was.
+
+        :param recovered: The move_log.RecoveredGame to continue
+        """
+
+        self.game_id = recovered.game_id
+        shots = [{"hits": [], "misses": []}, {"hits": [], "misses": []}]
+        result = None
+
+        for player, ships in zip(self.players, recovered.fleets):
+            player.assign_ships(self._ship_objects(ships), self.board_size)
+
+        if self.broadcast is not None:
+            self.broadcast.start_game()
+
+        for seat, x, y in recovered.moves:
+            result = self.players[1 - seat].board.fire_at(x, y)
+            shots[seat]["hits" if result.hit else "misses"].append([x, y])
+
+            if self.broadcast is not None:
+                self.broadcast.shot(seat, x, y, result)
+
+        turn = 1 - recovered.moves[-1][0] if recovered.moves else 0
+
+        for seat, player in enumerate(self.players):
+            await player.send({"resume": {"board_size": self.board_size, "ships": recovered.fleets[seat],
+                                          "shots": shots[seat], "opponent_shots": shots[1 - seat],
+                                          "your_turn": seat == turn}})
+
+        # The server stopped after the last move was logged but before the players heard that it won
+        if result is not None and result.fleet_destroyed:
+            await self.players[1 - turn].send({"game_status": "You won", "move": None})
+            await self.players[turn].send({"game_status": "You lost", "move": None})
+            self.end(1 - turn)
+            await self.exchange_boards()
+            return
+
+        await self.main_game_loop(turn, resumed=True)
+
+    def end(self, winner: int = None):
+        """
+        Marks the game as over in the move log, so it isn't resumed, and tells the spectators who won
+
+        :param winner: The seat of the player that won, None if the game was abandoned
+        """
+
+        if self.move_log is not None and self.game_id is not None:
+            self.move_log.end_game(self.game_id)
+
+        if winner is not None:
+            metrics.games_finished.inc()
+
+            if self.broadcast is not None:
+                self.broadcast.end_game(winner)
+
+        self.game_id = None
+
+    async def main_game_loop(self, turn: int = 0, resumed: bool = False):
+        """
+        :param turn: The seat of the player that moves first
+        :param resumed: If the players already got the state of a resumed game instead of the start of a new one
+        """
+
+        if not resumed:
+            for player in self.players:
+                await player.send("starting")
+
+            await self.players[turn].send("waiting for move")
+
+        i = turn
+
+        while True:
+            player = self.players[i]
+
+            move = await self._receive_move(i)  # this will be a list: [x, y]
+            start = time.perf_counter()
+
+            # Nothing is fired, logged or broadcast before the move is known to be on the board
+            try:
+                self.check_move(move)
+
+            except InvalidMove:
+                metrics.invalid_moves.inc()
+                raise
+
+            logging.debug(f"Player {i} fired at {move}")
+
+            result = self.players[i - 1].board.fire_at(*move)
+
+            if self.game_id is not None:
+                self.move_log.move(self.game_id, i, *move)
 
-        game_ended = False
+            if self.broadcast is not None:
+                self.broadcast.shot(i, *move, result)
 
-        self.players[0].send("waiting for move")
+            await self.send_turn_result(player, result)
 
-        while not game_ended:
-            for i, player in enumerate(self.players):
-                print(f"Sending waiting for move to player {i}")
+            if result.fleet_destroyed:
+                await self.players[i - 1].send({"game_status": "You lost", "move": move})
+                metrics.turn_seconds.observe(time.perf_counter() - start)
+                break
 
-                move = player.receive()  # this will be a list: [x, y]
-                print("Received move")
+            await self.players[i - 1].send({"game_status": None, "move": move})
+            metrics.turn_seconds.observe(time.perf_counter() - start)
 
-                print(move)
+            i = 1 - i
 
-                ship_hit = self.players[i - 1].board.fire_at(*move)
+        await self._stop_watching()
+        self.end(i)
+        await self.exchange_boards()
 
-                player.send("hit" if ship_hit else "miss")
+    @staticmethod
+    async def send_turn_result(player, result):
+        """
+        Tells the player that fired what the shot did: in one message from protocol version 2, otherwise in a hit,
+        a sunk and (if the game is over) a game status message
+        """
 
-                sunk = False
+        game_status = "You won" if result.fleet_destroyed else None
 
-                for ship_obj in self.players[i - 1].board.ships:
-                    if ship_obj.name == ship_hit and ship_obj.is_sunk():
-                        sunk = True
+        if player.version >= protocol.TURN_RESULT_VERSION:
+            await player.send(protocol.turn_result(result.hit, result.ship_name if result.sunk else None, game_status))
+            return
 
-                if sunk:
-                    player.send(f"You sunk a {ship_hit}")
+        await player.send("hit" if result.hit else "miss")
 
-                else:
-                    player.send("no ship sank")
+        if result.sunk:
+            await player.send(f"{protocol.SUNK_PREFIX}{result.ship_name}")
 
-                if self.players[i - 1].board.is_lost():
-                    player.send({"game_status": "You won", "move": None})
-                    self.players[i - 1].send({"game_status": "You lost", "move": move})
-                    game_ended = True
-                    break
+        else:
+            await player.send("no ship sank")
 
-                print(f"Sending to player {i - 1}")
-                self.players[i - 1].send({"game_status": None, "move": move})
+        if game_status is not None:
+            await player.send({"game_status": game_status, "move": None})
 
-        player1_board = self.players[0].receive()
-        player2_board = self.players[1].receive()
+    async def exchange_boards(self):
+        player1_board, player2_board = await self._receive_all(self.idle_timeouts["endgame"])
 
-        self.players[1].send(player1_board)
-        self.players[0].send(player2_board)
+        await self.players[1].send(player1_board)
+        await self.players[0].send(player2_board)
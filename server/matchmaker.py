@@ -0,0 +1,219 @@
+import asyncio
+import itertools
+import logging
+import time
+
+import constants
+import player
+import game
+import fleet_validator
+import metrics
+from shared import protocol
+import spectators
+
+try:
+    import ai_player
+
+except ImportError:  # the AI needs NumPy
+    ai_player = None
+
+
+class Matchmaker:
+    """
+    Pairs incoming connections and runs every pair's games as a separate asyncio task, so one process
+    can host any number of matches at the same time.
+    """
+
+    def __init__(self, board_size: int = constants.BOARD_SIZE, always_ai: bool = False, log=None,
+                 recovered_games: dict = None, idle_timeouts: dict = None):
+        """
+        :param always_ai: Seat every player against the AI, even if they didn't ask for it
+        :param log: The move_log.MoveLog to record games in, None to not record them
+        :param recovered_games: The games that were in progress when the server stopped, by game id
+        :param idle_timeouts: Seconds a player may be silent in each phase of a game, constants.IDLE_TIMEOUTS if None
+        """
+
+        self.board_size = board_size
+        self.always_ai = always_ai
+        self.log = log
+        self.idle_timeouts = idle_timeouts or constants.IDLE_TIMEOUTS
+        self.waiting_player = None
+        self.games = set()
+
+        # The spectators of every running match by match id
+        self.match_ids = itertools.count(1)
+        self.broadcasts = {}
+
+        # The seat of every player that can resume a game by their token, and the players that are back
+        self.recovered_seats = {}
+        self.resuming_players = {}
+
+        for recovered in (recovered_games or {}).values():
+            for seat, token in enumerate(recovered.tokens):
+                self.recovered_seats[token] = (recovered, seat)
+
+            delay = max(0.0, recovered.resume_deadline(constants.RESUME_TIMEOUT) - time.time())
+            asyncio.get_running_loop().call_later(delay, self.expire_game, recovered)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        logging.info(f"Accepted socket with address {writer.get_extra_info('peername')}")
+
+        new_player = player.Player(reader, writer)
+        negotiated = False
+
+        try:
+            await new_player.negotiate(constants.HELLO_TIMEOUT)
+            negotiated = True
+
+        except player.Disconnected as e:
+            logging.info(f"Dropping socket with address {writer.get_extra_info('peername')}: {e}")
+            return
+
+        finally:
+            # Closing the player also takes it out of the connection count
+            if not negotiated:
+                await new_player.close()
+
+        if new_player.spectate is not None:
+            await self.add_spectator(new_player)
+            return
+
+        if new_player.resume_token in self.recovered_seats:
+            self.resume_game(new_player)
+            return
+
+        if self.always_ai or new_player.opponent == protocol.AI:
+            if ai_player is not None:
+                self.start_ai_game(new_player)
+                return
+
+            logging.error("A player asked for the AI, but NumPy is not installed. Pairing them with a player.")
+
+        # The waiting player may have disconnected while waiting for an opponent
+        if self.waiting_player is None or not self.waiting_player.is_connected():
+            if self.waiting_player is not None:
+                await self.waiting_player.close()
+
+            self.waiting_player = new_player
+            return
+
+        players = [self.waiting_player, new_player]
+        self.waiting_player = None
+        self.start_game(players)
+
+    async def add_spectator(self, spectator: player.Player):
+        match_id = spectator.spectate
+
+        if match_id == protocol.LATEST_MATCH and self.broadcasts:
+            match_id = max(self.broadcasts)
+
+        if match_id not in self.broadcasts:
+            await spectator.send({"spectate": None})
+            await spectator.close()
+            return
+
+        self.broadcasts[match_id].subscribe(spectator)
+
+    def resume_game(self, new_player: player.Player):
+        """
+        Seats a player in the recovered game they were in. The game goes on once both players are back.
+        """
+
+        recovered, seat = self.recovered_seats.pop(new_player.resume_token)
+        logging.info(f"Player {seat} of recovered game {recovered.game_id} reconnected")
+
+        players = self.resuming_players.setdefault(recovered, [None, None])
+        players[seat] = new_player
+
+        if all(players):
+            del self.resuming_players[recovered]
+            self.start_game(players, recovered)
+
+    def expire_game(self, recovered):
+        """
+        Gives up on a recovered game if its players didn't both reconnect within constants.RESUME_TIMEOUT, so
+        it isn't kept in memory and in the move log forever
+        """
+
+        seats = [token for token in recovered.tokens if self.recovered_seats.get(token, (None,))[0] is recovered]
+
+        # Both players are back and the game is running
+        if not seats:
+            return
+
+        for token in seats:
+            del self.recovered_seats[token]
+
+        for waiting_player in self.resuming_players.pop(recovered, []):
+            if waiting_player is not None:
+                waiting_player.close_now()
+
+        if self.log is not None:
+            self.log.end_game(recovered.game_id)
+
+        logging.info(f"Recovered game {recovered.game_id} expired before both players reconnected")
+
+    def start_ai_game(self, new_player: player.Player, match_id: int = None):
+        self.start_game([new_player, ai_player.AIPlayer(self.board_size)], match_id=match_id)
+
+    def start_game(self, players: list, recovered=None, match_id: int = None):
+        """
+        :param match_id: The id spectators watch the match by, None for the next one
+        """
+
+        board_size = self.board_size if recovered is None else recovered.board_size
+        broadcast = spectators.Broadcast(match_id or next(self.match_ids), board_size)
+        self.broadcasts[broadcast.match_id] = broadcast
+        metrics.active_games.inc()
+
+        task = asyncio.create_task(self.run_game(players, broadcast, recovered))
+        self.games.add(task)
+        task.add_done_callback(self.games.discard)
+
+    async def run_game(self, players: list, broadcast: spectators.Broadcast, recovered=None):
+        """
+        :param broadcast: The spectators of the match
+        :param recovered: The move_log.RecoveredGame to continue, None to start a new game
+        """
+
+        g = game.Game(players, broadcast.board_size, self.log, broadcast, self.idle_timeouts)
+
+        try:
+            if recovered is None:
+                await g.send_start_messages()
+
+            else:
+                await g.resume(recovered)
+
+            while all(p.is_connected() for p in players):
+                await g.get_ships()
+                await g.main_game_loop()
+
+            g.end()
+
+        except player.Disconnected as e:
+            logging.info(f"Abandoning match {broadcast.match_id}: {e}")
+            g.end()
+
+        except fleet_validator.InvalidFleet as e:
+            logging.warning(f"Abandoning match {broadcast.match_id}, a player sent an invalid fleet: {e}")
+            g.end()
+
+        except game.InvalidMove as e:
+            logging.warning(f"Abandoning match {broadcast.match_id}, a player sent an invalid move: {e}")
+            g.end()
+
+        except Exception as e:
+            logging.exception(e)
+            g.end()
+
+        finally:
+            self.end_match(broadcast)
+
+            for p in players:
+                await p.close()
+
+    def end_match(self, broadcast: spectators.Broadcast):
+        del self.broadcasts[broadcast.match_id]
+        broadcast.close()
+        metrics.active_games.dec()
@@ -0,0 +1,147 @@
+import asyncio
+import bisect
+import logging
+
+# Seconds, from a fraction of a millisecond for a turn to whole seconds for players placing their ships
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+REGISTRY = []
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    A value that only goes up. Incrementing it is a single addition, so it can be used on every message.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.value = 0
+        REGISTRY.append(self)
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self) -> list:
+        return [(self.name, self.value)]
+
+
+class Gauge(Counter):
+    """
+    A value that goes up and down, like the number of open connections
+    """
+
+    kind = "gauge"
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class Histogram:
+    """
+    Counts observations in fixed buckets, so percentiles can be estimated over any time range from two scrapes
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        REGISTRY.append(self)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self) -> list:
+        samples = []
+        cumulative = 0
+
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            samples.append((f'{self.name}_bucket{{le="{bound}"}}', cumulative))
+
+        return samples + [(f"{self.name}_sum", self.sum), (f"{self.name}_count", self.count)]
+
+
+def render() -> str:
+    """
+    :return: Every metric in the Prometheus text exposition format
+    """
+
+    lines = []
+
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines += [f"{name} {_format_value(value)}" for name, value in metric.samples()]
+
+    return "\n".join(lines) + "\n"
+
+
+messages_sent = Counter("battleship_messages_sent_total", "Messages sent to players")
+bytes_sent = Counter("battleship_bytes_sent_total", "Bytes sent to players, including frame headers")
+messages_received = Counter("battleship_messages_received_total", "Messages received from players")
+bytes_received = Counter("battleship_bytes_received_total", "Bytes received from players")
+
+idle_timeouts = Counter("battleship_idle_timeouts_total",
+                        "Connections dropped for staying silent longer than the idle timeout of the game phase")
+active_connections = Gauge("battleship_active_connections", "Open connections of players and spectators")
+active_games = Gauge("battleship_active_games", "Matches that are being played")
+games_finished = Counter("battleship_games_finished_total", "Games that ended with a winner")
+invalid_fleets = Counter("battleship_invalid_fleets_total", "Fleets rejected for breaking the rules of the game")
+invalid_moves = Counter("battleship_invalid_moves_total", "Moves rejected for not being a cell of the board")
+
+turn_seconds = Histogram("battleship_turn_seconds",
+                         "Time from receiving a move to sending its result to both players and the spectators")
+get_ships_seconds = Histogram("battleship_get_ships_seconds", "Time spent waiting for both players' fleets")
+
+
+async def _handle_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = await reader.readline()
+        path = request_line.split()[1] if len(request_line.split()) > 1 else b""
+
+        # Skip the headers of the request
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+        if path == b"/metrics":
+            status, body = "200 OK", render().encode("utf-8")
+
+        else:
+            status, body = "404 Not Found", b"Not found\n"
+
+        writer.write(f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body)
+        await writer.drain()
+
+    except (ConnectionResetError, BrokenPipeError):
+        pass
+
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int):
+    """
+    Serves the metrics at http://host:port/metrics until cancelled
+    """
+
+    server = await asyncio.start_server(_handle_request, host, port, reuse_address=True)
+    logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import os
+import string
+import struct
+import time
+
+from shared import protocol
+
+# Record types
+GAME = 1  # a game started: board size and the resume tokens of both players
+FLEET = 2  # a player's fleet, encoded like the binary protocol encodes it
+MOVE = 3  # a player fired at a cell
+END = 4  # the game ended or was abandoned, so there is nothing to recover
+STOPPED = 5  # the server stopped while the game was in progress: when it was first recovered
+
+LENGTH = struct.Struct("!I")  # the length of the record after it
+RECORD = struct.Struct("!BQ")  # record type, game id
+GAME_INFO = struct.Struct("!I8s8s")  # board size, the resume token of each seat
+SEAT = struct.Struct("!B")
+MOVE_INFO = struct.Struct("!BII")  # seat, x, y
+STOPPED_INFO = struct.Struct("!d")  # seconds since the epoch
+
+TOKEN_SIZE = 8
+
+
+def is_token(value) -> bool:
+    """
+    :return: If the value is a resume token, as the hex string Player gives its client
+    """
+
+    return isinstance(value, str) and len(value) == TOKEN_SIZE * 2 and all(char in string.hexdigits for char in value)
+
+
+class RecoveredGame:
+    """
+    A game that was in progress when the log was last written to
+    """
+
+    def __init__(self, game_id: int, board_size: int, tokens: list):
+        self.game_id = game_id
+        self.board_size = board_size
+        self.tokens = tokens
+        self.fleets = [None, None]
+        self.moves = []  # (seat, x, y) in the order they were played
+        self.records = []  # the raw records, to write them again when compacting the log
+        self.stopped_at = None  # when the game was first recovered, None if it was played since
+
+    def resume_deadline(self, resume_timeout: float) -> float:
+        """
+        :return: The time since the epoch after which the players can't resume the game anymore
+        """
+
+        return self.stopped_at + resume_timeout
+
+
+def _record(record_type: int, game_id: int, *parts: bytes) -> bytes:
+    body = RECORD.pack(record_type, game_id) + b"".join(parts)
+    return LENGTH.pack(len(body)) + body
+
+
+def replay(path: str, resume_timeout: float = None) -> tuple:
+    """
+    Reads a move log and finds the games that didn't end.
+
+    :param resume_timeout: Seconds the players of a game have to resume it after the server stopped, counted
+                           from when it was first recovered. Games that ran out of time are left out. None to
+                           keep every game.
+    :return: (the games that were in progress by game id, the first unused game id)
+    """
+
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+
+    except FileNotFoundError:
+        return {}, 1
+
+    games = {}
+    next_game_id = 1
+    offset = 0
+
+    while offset + LENGTH.size <= len(data):
+        length = LENGTH.unpack_from(data, offset)[0]
+
+        # The server stopped in the middle of a write, everything before the record is intact
+        if offset + LENGTH.size + length > len(data):
+            break
+
+        record = data[offset:offset + LENGTH.size + length]
+        offset += LENGTH.size + length
+
+        record_type, game_id = RECORD.unpack_from(record, LENGTH.size)
+        body = LENGTH.size + RECORD.size
+        next_game_id = max(next_game_id, game_id + 1)
+
+        if record_type == GAME:
+            board_size, *tokens = GAME_INFO.unpack_from(record, body)
+            games[game_id] = RecoveredGame(game_id, board_size, [token.hex() for token in tokens])
+
+        elif game_id not in games:
+            continue
+
+        elif record_type == FLEET:
+            seat = SEAT.unpack_from(record, body)[0]
+            games[game_id].fleets[seat] = protocol.CODECS[protocol.BINARY].decode(record[body + SEAT.size:])
+
+        elif record_type == MOVE:
+            games[game_id].moves.append(MOVE_INFO.unpack_from(record, body))
+            games[game_id].stopped_at = None
+
+        elif record_type == STOPPED:
+            games[game_id].stopped_at = STOPPED_INFO.unpack_from(record, body)[0]
+
+        elif record_type == END:
+            del games[game_id]
+            continue
+
+        if game_id in games:
+            games[game_id].records.append(record)
+
+    if offset != len(data):
+        logging.warning(f"Ignoring {len(data) - offset} bytes of a partly written record at the end of {path}")
+
+    # A game is logged together with both fleets, but a torn write may have kept only part of them
+    games = {game_id: recovered for game_id, recovered in games.items() if None not in recovered.fleets}
+    now = time.time()
+
+    # Games that were played since the last recovery stopped now
+    for recovered in games.values():
+        if recovered.stopped_at is None:
+            recovered.stopped_at = now
+
+    if resume_timeout is not None:
+        expired = [game_id for game_id, recovered in games.items() if recovered.resume_deadline(resume_timeout) < now]
+
+        for game_id in expired:
+            del games[game_id]
+
+        if expired:
+            logging.info(f"Dropping {len(expired)} games from {path} that nobody resumed in {resume_timeout} seconds")
+
+    return games, next_game_id
+
+
+def compact(path: str, games: dict):
+    """
+    Rewrites the log with only the records of the games that are still in progress, and when each of them
+    stopped, so the time the players have to resume it doesn't start over on every restart
+    """
+
+    temporary_path = path + ".tmp"
+
+    with open(temporary_path, "wb") as file:
+        for recovered_game in games.values():
+            file.writelines(recovered_game.records)
+
+            if recovered_game.records[-1][LENGTH.size] != STOPPED:
+                file.write(_record(STOPPED, recovered_game.game_id, STOPPED_INFO.pack(recovered_game.stopped_at)))
+
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temporary_path, path)
+
+
+class MoveLog:
+    """
+    An append-only log of every game event. Records are only appended to a buffer when an event happens,
+    which takes microseconds, and a background task writes and fsyncs the buffer every sync interval. A crash
+    loses at most the events of the last interval.
+
+    Every record is a 4 byte length followed by the record type, the game id and the event.
+    """
+
+    def __init__(self, path: str, next_game_id: int = 1, sync_interval: float = 0.05):
+        self.path = path
+        self.next_game_id = next_game_id
+        self.sync_interval = sync_interval
+
+        self.file = open(path, "ab")
+        self.buffer = bytearray()
+
+    def _append(self, record_type: int, game_id: int, *parts: bytes):
+        self.buffer += _record(record_type, game_id, *parts)
+
+    def start_game(self, board_size: int, tokens: list) -> int:
+        """
+        :param tokens: The resume tokens of both players as hex strings
+        :return: The id of the new game
+        """
+
+        game_id = self.next_game_id
+        self.next_game_id += 1
+
+        self._append(GAME, game_id, GAME_INFO.pack(board_size, *[bytes.fromhex(token) for token in tokens]))
+        return game_id
+
+    def fleet(self, game_id: int, seat: int, ships: list):
+        self._append(FLEET, game_id, SEAT.pack(seat), protocol.CODECS[protocol.BINARY].encode(ships))
+
+    def move(self, game_id: int, seat: int, x: int, y: int):
+        self._append(MOVE, game_id, MOVE_INFO.pack(seat, x, y))
+
+    def end_game(self, game_id: int):
+        self._append(END, game_id)
+
+    def _write(self, data: bytes):
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def sync(self):
+        """
+        Writes and fsyncs the buffered records, blocking until they are on disk
+        """
+
+        if self.buffer:
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            self._write(data)
+
+    async def run(self):
+        """
+        Writes the buffered records every sync interval in a thread, so the event loop never waits for the disk
+        """
+
+        writing = None
+
+        try:
+            while True:
+                await asyncio.sleep(self.sync_interval)
+
+                if self.buffer:
+                    data = bytes(self.buffer)
+                    self.buffer.clear()
+                    writing = asyncio.ensure_future(asyncio.to_thread(self._write, data))
+                    await asyncio.shield(writing)
+
+        finally:
+            # A write keeps running in its thread when the task is cancelled. It must finish before the rest
+            # of the buffer is written, to keep the records in order.
+            if writing is not None:
+                await writing
+
+            self.sync()
+            self.file.close()
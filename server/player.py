@@ -1,45 +1,248 @@
-import logging
-import json
+import asyncio
+import collections
+import secrets
+import time
 
-from board import Board
-import constants
+import board
+from shared.framing import FrameReader, encode_frame
+import metrics
+import move_log
+from shared import protocol
+
+READ_SIZE = 64 * 1024
+
+
+class Disconnected(Exception):
+    """
+    The client closed the connection or stayed silent for longer than it may
+    """
 
 
 class Player:
-    def __init__(self, clientsocket):
-        self.clientsocket = clientsocket
-        self.board = Board(constants.BOARD_SIZE, [])
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.frame_reader = FrameReader()
+        self.encoding = protocol.JSON
+        self.codec = protocol.CODECS[self.encoding]
+        self.version = 1  # clients that don't negotiate speak the first version of the protocol
+        self.opponent = protocol.HUMAN
+        self.token = secrets.token_hex(move_log.TOKEN_SIZE)
+        self.resume_token = None  # the token of the game the client wants to resume
+        self.spectate = None  # the id of the match the client wants to watch
+        self.board = None  # created once the player is seated in a game, spectators never get one
+        self.closed = False
+        self.inbox = collections.deque()  # messages that arrived while watching the connection
+        self.heartbeats = None  # the task sending heartbeats, for clients that speak a protocol with them
+        self.last_sent = time.monotonic()
+
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.messages_received = 0
+        self.bytes_received = 0
+        metrics.active_connections.inc()
+
+    def assign_ships(self, ships: list, board_size: int):
+        self.board = board.create_board(board_size, ships)
+
+    def is_connected(self) -> bool:
+        return not (self.reader.at_eof() or self.writer.is_closing())
+
+    async def negotiate(self, timeout: float):
+        """
+        Waits for the hello a client sends right after connecting, switches to the encoding and protocol version
+        it asks for and stores the opponent, the game to resume or the match to watch it asks for. Clients from
+        before the binary protocol never send a hello, so they keep using JSON.
 
-    def assign_ships(self, ships: list):
-        self.board.ships = ships
+        :param timeout: How long to wait for the hello in seconds
+        :raise Disconnected: If the client disconnected or sent something that isn't a frame of JSON
+        """
 
-    def receive(self):
         try:
-            header = self.clientsocket.recv(constants.HEADERSIZE)
+            message = await asyncio.wait_for(self.receive(), timeout)
+
+        except asyncio.TimeoutError:
+            return
+
+        # A length header that isn't a number, or a payload that isn't UTF-8 JSON
+        except ValueError as e:
+            raise Disconnected(f"The client sent a malformed message: {e}") from None
+
+        if not protocol.is_hello(message):
+            return
+
+        self.opponent = message["hello"].get("opponent", protocol.HUMAN)
+        resume_token = message["hello"].get("resume")
+
+        # A resumed game is recorded under the token the client had before
+        if move_log.is_token(resume_token):
+            self.resume_token = self.token = resume_token
+
+        if isinstance(message["hello"].get("spectate"), int):
+            self.spectate = message["hello"]["spectate"]
 
-            if header == b"":
-                logging.critical("Socket disconnected")
-                return "Client disconnected"
+        encoding = protocol.choose_encoding(message)
+        self.version = protocol.choose_version(message)
+        await self.send(protocol.hello_reply(encoding, self.token, self.version))
+        self._use_encoding(encoding)
+        self._start_heartbeats()
 
-            message_length = int(header.decode('utf-8').strip())
-            message = self.clientsocket.recv(message_length)
+    def _use_encoding(self, encoding: str):
+        self.encoding = encoding
+        self.codec = protocol.CODECS[encoding]
+        self.frame_reader.binary_header = self.codec.binary_header
 
-        except (ConnectionResetError, ConnectionAbortedError):
-            logging.critical("Connection reset or connection aborted error: socket disconnected")
-            return "Client disconnected"
+    def handoff_state(self) -> dict:
+        """
+        Stops reading from the connection, so everything the client sends from now on stays in the socket for the
+        other process. What was already read but not decoded, like a fleet sent right after the hello, goes with
+        the state.
 
-        return json.loads(message)
+        :return: What another process needs to take over the connection after it was negotiated here
+        """
 
-    def send(self, message):
-        logging.info(f"Sending message {message}")
+        self.writer.transport.pause_reading()
 
-        message = json.dumps(message, ensure_ascii=False).encode("utf-8")
-        header_info = f"{len(message):<{constants.HEADERSIZE}}".encode("utf-8")
+        # StreamReader has no way to take its buffer without awaiting, and reading it empty would wait forever
+        unread = self.frame_reader.unread() + bytes(self.reader._buffer)
 
+        return {"encoding": self.encoding, "version": self.version, "token": self.token, "resume": self.resume_token,
+                "spectate": self.spectate, "opponent": self.opponent, "unread": unread.hex()}
+
+    def take_over(self, state: dict):
+        """
+        Continues a connection that was negotiated by another process
+
+        :param state: The handoff_state() of the player in the other process
+        """
+
+        self._use_encoding(state["encoding"])
+        self.version = state["version"]
+        self.token = state["token"]
+        self.resume_token = state["resume"]
+        self.spectate = state["spectate"]
+        self.opponent = state["opponent"]
+        self.frame_reader.feed(bytes.fromhex(state["unread"]))
+        self._start_heartbeats()
+
+    def _start_heartbeats(self):
+        if self.version >= protocol.HEARTBEAT_VERSION and self.heartbeats is None:
+            self.heartbeats = asyncio.create_task(self._send_heartbeats())
+
+    async def _send_heartbeats(self):
+        """
+        Sends a heartbeat whenever nothing else was sent for a heartbeat interval, so the client can tell that the
+        server is still there. Writing also makes the OS notice a connection whose other end is gone.
+        """
+
+        while not self.closed:
+            await asyncio.sleep(self.last_sent + protocol.HEARTBEAT_INTERVAL - time.monotonic())
+
+            # Something else was sent while sleeping
+            if time.monotonic() - self.last_sent < protocol.HEARTBEAT_INTERVAL:
+                continue
+
+            if not await self.send(protocol.HEARTBEAT_MESSAGE):
+                return
+
+    async def _read(self, timeout: float = None) -> bytes:
         try:
-            self.clientsocket.send(header_info)
-            self.clientsocket.send(message)
+            data = await asyncio.wait_for(self.reader.read(READ_SIZE), timeout)
+
+        except asyncio.TimeoutError:
+            metrics.idle_timeouts.inc()
+            raise Disconnected(f"The client sent nothing for {timeout} seconds") from None
+
+        except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError) as e:
+            raise Disconnected(f"The connection was reset or aborted: {e}") from None
+
+        if data == b"":
+            raise Disconnected("The client disconnected")
+
+        return data
+
+    async def receive(self, timeout: float = None):
+        """
+        :param timeout: How long the client may stay silent in seconds, None to wait forever. Every message counts,
+                        so a client that sends heartbeats only times out once it is gone.
+        :return: The next message that isn't a heartbeat
+        :raise Disconnected: If the client disconnected or was silent for longer than the timeout
+        """
+
+        if self.inbox:
+            return self.inbox.popleft()
+
+        return await self._next_message(timeout)
+
+    async def watch(self):
+        """
+        Reads from the client while it waits for the other player, so a client that disconnects is noticed right
+        away instead of on its next turn. Runs until it is cancelled and keeps what arrives for receive().
+
+        There is no timeout, as cancelling a read with one can lose what it read. A client that is gone without
+        closing the connection is noticed by the idle timeout of its next turn.
+
+        :raise Disconnected: If the client disconnected
+        """
+
+        while True:
+            self.inbox.append(await self._next_message())
+
+    async def _next_message(self, timeout: float = None):
+        while True:
+            # One read can hold several frames, so only read from the stream once the buffered ones are used up
+            while (frame := self.frame_reader.next_frame()) is None:
+                data = await self._read(timeout)
+
+                self.bytes_received += len(data)
+                metrics.bytes_received.inc(len(data))
+                self.frame_reader.feed(data)
+
+            self.messages_received += 1
+            metrics.messages_received.inc()
+            message = self.codec.decode(frame)
+
+            if message != protocol.HEARTBEAT_MESSAGE:
+                return message
+
+    def count_sent(self, frame_size: int):
+        self.messages_sent += 1
+        self.bytes_sent += frame_size
+        self.last_sent = time.monotonic()
+        metrics.messages_sent.inc()
+        metrics.bytes_sent.inc(frame_size)
+
+    async def send(self, message):
+        frame = encode_frame(self.codec.encode(message), self.codec.binary_header)
+        self.count_sent(len(frame))
+
+        try:
+            self.writer.write(frame)
+            await self.writer.drain()
             return True
 
-        except ConnectionResetError:
+        except (ConnectionResetError, BrokenPipeError):
             return False
+
+    def close_now(self):
+        """
+        Closes the connection without waiting for it to be closed
+        """
+
+        if not self.closed:
+            self.closed = True
+            metrics.active_connections.dec()
+
+            if self.heartbeats is not None:
+                self.heartbeats.cancel()
+
+        self.writer.close()
+
+    async def close(self):
+        self.close_now()
+
+        try:
+            await self.writer.wait_closed()
+
+        except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError):
+            pass
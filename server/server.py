@@ -1,36 +1,78 @@
+import argparse
+import asyncio
 import logging
-import socket
+import os
+import sys
 
-import player
-import game
+# The modules the client and the server share are in the shared package next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
-IP = socket.gethostbyname(socket.gethostname())
-PORT = 9850
+import constants
+import metrics
+import move_log
+import supervisor
+from matchmaker import Matchmaker
 
-serversocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-serversocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
-serversocket.bind((IP, PORT))
-serversocket.listen(2)
+async def serve(ip: str, port: int, board_size: int, always_ai: bool = False, log_path: str = None,
+                metrics_port: int = constants.METRICS_PORT, idle_timeouts: dict = None):
+    """
+    :param log_path: The move log to recover games from and record them in, None to not record games
+    :param metrics_port: The local port to serve the Prometheus metrics on, 0 to not serve them
+    :param idle_timeouts: Seconds a player may be silent in each phase of a game
+    """
 
+    log = None
+    recovered_games = {}
 
-def main():
-    clientsockets = []
+    if log_path:
+        recovered_games, next_game_id = move_log.replay(log_path, constants.RESUME_TIMEOUT)
+        move_log.compact(log_path, recovered_games)
+        logging.info(f"Recovered {len(recovered_games)} games from {log_path}")
+
+        log = move_log.MoveLog(log_path, next_game_id, constants.MOVE_LOG_SYNC_INTERVAL)
+
+    matchmaker = Matchmaker(board_size, always_ai, log, recovered_games, idle_timeouts)
+    server = await asyncio.start_server(matchmaker.handle_connection, ip, port,
+                                        reuse_address=True, backlog=constants.BACKLOG)
+
+    tasks = [server.serve_forever()]
+
+    if log is not None:
+        tasks.append(log.run())
 
-    while len(clientsockets) < 2:
-        clientsocket, addr = serversocket.accept()
-        logging.info(f"Accepted socket with address {addr}")
-        clientsockets.append(clientsocket)
+    if metrics_port:
+        tasks.append(metrics.serve(constants.METRICS_IP, metrics_port))
+
+    async with server:
+        await asyncio.gather(*tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multiplayer battleship server")
+    parser.add_argument("--board-size", type=int, default=constants.BOARD_SIZE,
+                        help="width and height of the board (NumPy is needed to run large boards efficiently)")
+    parser.add_argument("--ai", action="store_true",
+                        help="play every player against the AI instead of pairing them (needs NumPy)")
+    parser.add_argument("--move-log", default=constants.MOVE_LOG_PATH,
+                        help="file to record games in and resume them from after a restart, empty to not record")
+    parser.add_argument("--metrics-port", type=int, default=constants.METRICS_PORT,
+                        help=f"port on {constants.METRICS_IP} to serve Prometheus metrics on, 0 to not serve them")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes to run games in, 0 for one per CPU core (more than 1 needs Linux)")
+    parser.add_argument("--idle-timeouts", type=float, nargs=3, metavar=("SETUP", "TURN", "ENDGAME"),
+                        default=[constants.IDLE_TIMEOUTS[phase] for phase in ("setup", "turn", "endgame")],
+                        help="seconds a player may send nothing while placing ships, on their turn and after a game")
+    args = parser.parse_args()
 
-    players = [player.Player(clientsocket) for clientsocket in clientsockets]
+    idle_timeouts = dict(zip(("setup", "turn", "endgame"), args.idle_timeouts))
 
-    while True:
-        g = game.Game(players)
-        g.send_start_messages()
+    if args.workers != 1:
+        supervisor.run(constants.IP, constants.PORT, args.workers, args.board_size, args.ai, args.move_log, args.metrics_port,
+                       idle_timeouts)
+        return
 
-        while True:
-            g.get_ships()
-            g.main_game_loop()
+    asyncio.run(serve(constants.IP, constants.PORT, args.board_size, args.ai, args.move_log, args.metrics_port, idle_timeouts))
 
 
 if __name__ == "__main__":
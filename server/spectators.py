@@ -0,0 +1,76 @@
+import logging
+
+from shared.framing import encode_frame
+import constants
+
+
+class Broadcast:
+    """
+    Sends the events of one match to everyone watching it. Each event is encoded once per encoding and the
+    same frame is written to every spectator without waiting for it to be sent, so spectators never slow down
+    the turn loop. A spectator whose unsent data passes constants.SPECTATOR_BUFFER_LIMIT is too slow to keep
+    up and is dropped; it can reconnect and will get a snapshot of the game.
+    """
+
+    def __init__(self, match_id: int, board_size: int):
+        self.match_id = match_id
+        self.board_size = board_size
+        self.spectators = set()
+        self.shots = []  # [seat, x, y, hit, sunk ship name or None] of the current game
+        self.dropped = 0
+
+    def snapshot(self) -> dict:
+        return {"spectate": {"match": self.match_id, "board_size": self.board_size, "shots": self.shots}}
+
+    def publish(self, message):
+        frames = {}  # encoded frames by codec
+
+        for spectator in list(self.spectators):
+            transport = spectator.writer.transport
+
+            if transport.is_closing():
+                self.spectators.discard(spectator)
+                spectator.close_now()
+                continue
+
+            if transport.get_write_buffer_size() > constants.SPECTATOR_BUFFER_LIMIT:
+                logging.warning(f"Dropping a spectator of match {self.match_id} that can't keep up")
+                self.spectators.discard(spectator)
+                self.dropped += 1
+                transport.abort()
+                spectator.close_now()
+                continue
+
+            if spectator.codec not in frames:
+                frames[spectator.codec] = encode_frame(spectator.codec.encode(message), spectator.codec.binary_header)
+
+            transport.write(frames[spectator.codec])
+            spectator.count_sent(len(frames[spectator.codec]))
+
+    def subscribe(self, spectator):
+        """
+        :param spectator: A player.Player that negotiated to watch this match
+        """
+
+        frame = encode_frame(spectator.codec.encode(self.snapshot()), spectator.codec.binary_header)
+        spectator.writer.write(frame)
+        spectator.count_sent(len(frame))
+        self.spectators.add(spectator)
+
+    def start_game(self):
+        self.shots = []
+        self.publish(self.snapshot())
+
+    def shot(self, seat: int, x: int, y: int, result):
+        shot = [seat, x, y, result.hit, result.ship_name if result.sunk else None]
+        self.shots.append(shot)
+        self.publish({"shot": shot})
+
+    def end_game(self, winner: int):
+        self.publish({"winner": winner})
+
+    def close(self):
+        for spectator in self.spectators:
+            spectator.close_now()
+
+        self.spectators.clear()
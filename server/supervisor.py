@@ -0,0 +1,335 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+
+import constants
+import metrics
+import move_log
+import player
+from shared import protocol
+from matchmaker import Matchmaker
+
+HANDOFF_SIZE = 64 * 1024  # the largest control message between the supervisor and a worker
+MAX_FDS = 2  # a match hands off at most both of its players
+
+
+async def _wait_for(sock: socket.socket, add, remove):
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    add(sock, lambda: ready.done() or ready.set_result(None))
+
+    try:
+        await ready
+
+    finally:
+        remove(sock)
+
+
+async def send_packet(sock: socket.socket, message: dict, fds: list = ()):
+    """
+    Sends a control message and the file descriptors with it over a non-blocking SOCK_SEQPACKET socket
+
+    :raise ValueError: If the message is larger than HANDOFF_SIZE
+    """
+
+    loop = asyncio.get_running_loop()
+    data = json.dumps(message).encode("utf-8")
+
+    # The other side would only get the start of it
+    if len(data) > HANDOFF_SIZE:
+        raise ValueError(f"The control message is {len(data)} bytes, the limit is {HANDOFF_SIZE}")
+
+    while True:
+        try:
+            socket.send_fds(sock, [data], list(fds))
+            return
+
+        except BlockingIOError:
+            await _wait_for(sock, loop.add_writer, loop.remove_writer)
+
+
+async def receive_packet(sock: socket.socket) -> tuple:
+    """
+    :return: (the control message, the file descriptors that came with it), (None, []) if the other side closed
+    """
+
+    loop = asyncio.get_running_loop()
+
+    while True:
+        try:
+            data, fds, _, _ = socket.recv_fds(sock, HANDOFF_SIZE, MAX_FDS)
+
+        except BlockingIOError:
+            await _wait_for(sock, loop.add_reader, loop.remove_reader)
+            continue
+
+        return (json.loads(data) if data else None), fds
+
+
+def log_path_of(log_path: str, index: int) -> str:
+    """
+    :return: The move log of a worker. Every worker writes its own log, so they never write to the same file.
+    """
+
+    return f"{log_path}.{index}" if log_path else log_path
+
+
+class Worker:
+    """
+    The supervisor's handle of a worker process
+    """
+
+    def __init__(self, index: int, process, sock: socket.socket):
+        self.index = index
+        self.process = process
+        self.sock = sock
+        self.matches = set()  # the ids of the matches the worker is running
+        self.alive = True
+
+
+class Supervisor(Matchmaker):
+    """
+    Accepts and negotiates every connection like the single process server, but instead of running the games
+    it hands the sockets of each match to one of the worker processes with SCM_RIGHTS. Both players of a match
+    and its spectators always go to the same worker, which runs the game like the single process server does.
+    The supervisor only pairs players, so the games of all workers run in parallel on every core.
+    """
+
+    def __init__(self, workers: list, board_size: int = constants.BOARD_SIZE, always_ai: bool = False,
+                 recovered_games: dict = None):
+        """
+        :param recovered_games: The games that were in progress in any worker when the server stopped, by
+                                (worker index, game id)
+        """
+
+        super().__init__(board_size, always_ai, None, recovered_games)
+        self.workers = workers
+        self.match_workers = {}  # the worker running every match by match id
+
+    def _least_busy_worker(self) -> Worker:
+        return min((w for w in self.workers if w.alive), key=lambda w: len(w.matches))
+
+    def _hand_off(self, worker: Worker, message: dict, players: list):
+        message["players"] = [p.handoff_state() for p in players]
+        fds = [p.writer.get_extra_info("socket").fileno() for p in players]
+
+        task = asyncio.create_task(self._send_handoff(worker, message, fds, players))
+        self.games.add(task)
+        task.add_done_callback(self.games.discard)
+
+    @staticmethod
+    async def _send_handoff(worker: Worker, message: dict, fds: list, players: list):
+        try:
+            await send_packet(worker.sock, message, fds)
+
+        except (OSError, ValueError) as e:
+            logging.error(f"Couldn't hand a connection off to worker {worker.index}: {e}")
+
+        # The worker has its own copy of the sockets now
+        for p in players:
+            p.close_now()
+
+    def _start_match(self, worker: Worker) -> int:
+        match_id = next(self.match_ids)
+        worker.matches.add(match_id)
+        self.match_workers[match_id] = worker
+
+        return match_id
+
+    def start_ai_game(self, new_player: player.Player, match_id: int = None):
+        worker = self._least_busy_worker()
+        self._hand_off(worker, {"match": self._start_match(worker), "ai": True}, [new_player])
+
+    def start_game(self, players: list, recovered=None, match_id: int = None):
+        worker = self._least_busy_worker() if recovered is None else self.workers[recovered.worker]
+        message = {"match": self._start_match(worker), "recovered": None if recovered is None else recovered.game_id}
+        self._hand_off(worker, message, players)
+
+    async def add_spectator(self, spectator: player.Player):
+        match_id = spectator.spectate
+
+        if match_id == protocol.LATEST_MATCH and self.match_workers:
+            match_id = max(self.match_workers)
+
+        if match_id not in self.match_workers:
+            await spectator.send({"spectate": None})
+            await spectator.close()
+            return
+
+        self._hand_off(self.match_workers[match_id], {"spectate": match_id}, [spectator])
+
+    async def watch_worker(self, worker: Worker):
+        """
+        Forgets the matches of the worker as they end, so spectators aren't sent to matches that are over
+        """
+
+        while True:
+            message, _ = await receive_packet(worker.sock)
+
+            if message is None:
+                break
+
+            worker.matches.discard(message["ended"])
+            self.match_workers.pop(message["ended"], None)
+
+        worker.alive = False
+        logging.error(f"Worker {worker.index} stopped")
+
+        for match_id in worker.matches:
+            self.match_workers.pop(match_id, None)
+
+        if not any(w.alive for w in self.workers):
+            raise RuntimeError("Every worker stopped")
+
+
+class WorkerMatchmaker(Matchmaker):
+    """
+    Runs the matches a supervisor hands to this worker process
+    """
+
+    def __init__(self, sock: socket.socket, board_size: int = constants.BOARD_SIZE, always_ai: bool = False,
+                 log=None, recovered_games: dict = None, idle_timeouts: dict = None):
+        super().__init__(board_size, always_ai, log, recovered_games, idle_timeouts)
+        self.sock = sock
+        self.recovered_games = recovered_games or {}
+
+    def expire_game(self, recovered):
+        # The supervisor seats the players, so the worker only knows which recovered games it didn't start
+        if self.recovered_games.pop(recovered.game_id, None) is not None:
+            super().expire_game(recovered)
+
+    def end_match(self, broadcast):
+        super().end_match(broadcast)
+
+        task = asyncio.create_task(send_packet(self.sock, {"ended": broadcast.match_id}))
+        self.games.add(task)
+        task.add_done_callback(self.games.discard)
+
+    async def _take_over(self, state: dict, fd: int) -> player.Player:
+        reader, writer = await asyncio.open_connection(sock=socket.socket(fileno=fd))
+        new_player = player.Player(reader, writer)
+        new_player.take_over(state)
+
+        return new_player
+
+    async def serve_supervisor(self):
+        """
+        Takes over the connections the supervisor hands off until it stops
+        """
+
+        while True:
+            message, fds = await receive_packet(self.sock)
+
+            if message is None:
+                logging.info("The supervisor stopped")
+                return
+
+            players = [await self._take_over(state, fd) for state, fd in zip(message["players"], fds)]
+
+            if message.get("spectate") is not None:
+                await self.add_spectator(players[0])
+
+            elif message.get("ai"):
+                self.start_ai_game(players[0], message["match"])
+
+            else:
+                self.start_game(players, self.recovered_games.pop(message["recovered"], None), message["match"])
+
+
+async def serve_worker(index: int, sock: socket.socket, board_size: int, always_ai: bool, log_path: str,
+                       metrics_port: int, idle_timeouts: dict):
+    log = None
+    recovered_games = {}
+
+    if log_path:
+        recovered_games, next_game_id = move_log.replay(log_path, constants.RESUME_TIMEOUT)
+        move_log.compact(log_path, recovered_games)
+        log = move_log.MoveLog(log_path, next_game_id, constants.MOVE_LOG_SYNC_INTERVAL)
+
+    sock.setblocking(False)
+    matchmaker = WorkerMatchmaker(sock, board_size, always_ai, log, recovered_games, idle_timeouts)
+    tasks = []
+
+    if log is not None:
+        tasks.append(asyncio.create_task(log.run()))
+
+    if metrics_port:
+        tasks.append(asyncio.create_task(metrics.serve(constants.METRICS_IP, metrics_port)))
+
+    try:
+        await matchmaker.serve_supervisor()
+
+    finally:
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def run_worker(index: int, sock: socket.socket, board_size: int, always_ai: bool, log_path: str, metrics_port: int,
+               idle_timeouts: dict):
+    try:
+        asyncio.run(serve_worker(index, sock, board_size, always_ai, log_path, metrics_port, idle_timeouts))
+
+    except KeyboardInterrupt:
+        pass
+
+
+async def supervise(ip: str, port: int, workers: list, board_size: int, always_ai: bool, recovered_games: dict,
+                    metrics_port: int):
+    supervisor = Supervisor(workers, board_size, always_ai, recovered_games)
+    listener = await asyncio.start_server(supervisor.handle_connection, ip, port,
+                                          reuse_address=True, backlog=constants.BACKLOG)
+
+    tasks = [listener.serve_forever()] + [supervisor.watch_worker(w) for w in workers]
+
+    if metrics_port:
+        tasks.append(metrics.serve(constants.METRICS_IP, metrics_port))
+
+    async with listener:
+        await asyncio.gather(*tasks)
+
+
+def run(ip: str, port: int, worker_count: int, board_size: int, always_ai: bool = False, log_path: str = None,
+        metrics_port: int = constants.METRICS_PORT, idle_timeouts: dict = None):
+    """
+    Runs the server as a supervisor and worker processes
+
+    :param worker_count: The number of worker processes, 0 for one per CPU core
+    :param log_path: The move logs are this path with the index of the worker appended
+    :param metrics_port: The supervisor serves metrics on this port and worker n on this port + 1 + n
+    """
+
+    worker_count = worker_count or os.cpu_count()
+    context = multiprocessing.get_context("spawn")  # a forked worker would keep the other workers' sockets open
+    workers = []
+    recovered_games = {}
+
+    for index in range(worker_count):
+        if log_path:
+            games, _ = move_log.replay(log_path_of(log_path, index), constants.RESUME_TIMEOUT)
+
+            for recovered in games.values():
+                recovered.worker = index
+                recovered_games[index, recovered.game_id] = recovered
+
+        supervisor_sock, worker_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        process = context.Process(target=run_worker, daemon=True,
+                                  args=(index, worker_sock, board_size, always_ai, log_path_of(log_path, index),
+                                        metrics_port + 1 + index if metrics_port else 0, idle_timeouts))
+        process.start()
+        worker_sock.close()
+
+        supervisor_sock.setblocking(False)
+        workers.append(Worker(index, process, supervisor_sock))
+
+    logging.info(f"Started {worker_count} workers, recovered {len(recovered_games)} games")
+
+    try:
+        asyncio.run(supervise(ip, port, workers, board_size, always_ai, recovered_games, metrics_port))
+
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,3 @@
+"""
+Modules the client and the server both use
+"""
@@ -0,0 +1,93 @@
+import numpy as np
+
+from .shot_result import ShotResult
+
+# Boards smaller than this are faster with plain Python structures
+MIN_BOARD_SIZE = 64
+
+WATER = -1
+
+
+class ArrayBoard:
+    """
+    Stores the board in NumPy arrays indexed [y, x], so memory and the cost of each operation stay flat as the
+    board grows: the id of the ship on each cell, every cell that was fired at, and hit counts per ship.
+    """
+
+    def __init__(self, size: int, ships: list):
+        self.size = size
+        self.place_ships(ships)
+
+    def place_ships(self, ships: list):
+        """
+        :param ships: Objects with a name and a list of coordinates with an x and y
+        """
+
+        self.ships = ships
+
+        # The smallest signed integer that fits every ship id, with -1 meaning water
+        self.ship_ids = np.full((self.size, self.size), WATER, dtype=np.min_scalar_type(-max(len(ships), 1)))
+        self.shots = np.zeros((self.size, self.size), dtype=bool)
+
+        for ship_id, ship_obj in enumerate(ships):
+            xs = [coord.x for coord in ship_obj.coordinates]
+            ys = [coord.y for coord in ship_obj.coordinates]
+            self.ship_ids[ys, xs] = ship_id
+
+        self.ship_lengths = np.array([len(ship_obj.coordinates) for ship_obj in ships], dtype=np.int64)
+        self.ship_hits = np.zeros(len(ships), dtype=np.int64)
+        self.ships_afloat = len(ships)
+
+    def is_lost(self) -> bool:
+        return self.ships_afloat == 0
+
+    def sunk_ships(self) -> np.ndarray:
+        """
+        :return: The ids of every sunk ship
+        """
+
+        return np.flatnonzero(self.ship_hits == self.ship_lengths)
+
+    def hit_cells(self) -> np.ndarray:
+        """
+        :return: An (n, 2) array of the x and y of every hit
+        """
+
+        return np.argwhere(self.shots & (self.ship_ids != WATER))[:, ::-1]
+
+    def miss_cells(self) -> np.ndarray:
+        """
+        :return: An (n, 2) array of the x and y of every miss
+        """
+
+        return np.argwhere(self.shots & (self.ship_ids == WATER))[:, ::-1]
+
+    def fire_at(self, x: int, y: int) -> ShotResult:
+        """
+        Fires at a certain x and y position. If it is a hit, it damages the ship.
+
+        :param x: The x coordinate to fire a shell at
+        :param y: The y coordinate to fire a shell at
+        :return: Whether the shell hit, the name of the ship it hit, if that ship is sunk and if the whole fleet is
+        :raise IndexError: If the coordinates are off the board
+        """
+
+        # Negative indices would otherwise count from the other side of the board
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            raise IndexError(f"{x}, {y} is off the board")
+
+        ship_id = int(self.ship_ids[y, x])
+        already_shot = self.shots[y, x]
+        self.shots[y, x] = True
+
+        if ship_id == WATER:
+            return ShotResult(False, "", False, self.is_lost())
+
+        if not already_shot:
+            self.ship_hits[ship_id] += 1
+
+            if self.ship_hits[ship_id] == self.ship_lengths[ship_id]:
+                self.ships_afloat -= 1
+
+        sunk = bool(self.ship_hits[ship_id] == self.ship_lengths[ship_id])
+        return ShotResult(True, self.ships[ship_id].name, sunk, self.is_lost())
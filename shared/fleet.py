@@ -0,0 +1,165 @@
+import random
+
+# The ships every player places, in the reverse order of placement
+SHIPS = [
+    {"name": "Destroyer", "length": 2},
+    {"name": "Submarine", "length": 3},
+    {"name": "Cruiser", "length": 3},
+    {"name": "Battleship", "length": 4},
+    {"name": "Aircraft Carrier", "length": 5}
+]
+
+# Random placements tried before enumerating every legal one. On a sparse board the first one almost always fits.
+SAMPLE_TRIES = 8
+
+# Times a fleet is started over when a ship doesn't fit next to the ones placed before it
+FLEET_TRIES = 100
+
+_start_masks = {}
+
+
+def cells_mask(board_size: int, cells) -> int:
+    """
+    :param cells: (x, y) pairs on the board
+    :return: An occupancy bitmask with bit y * board_size + x set for every cell
+    """
+
+    mask = 0
+
+    for x, y in cells:
+        mask |= 1 << (y * board_size + x)
+
+    return mask
+
+
+def _placement_masks(board_size: int, length: int) -> tuple:
+    """
+    :return: (the starts of the horizontal placements that fit on the board, the same for vertical placements,
+              the cells of a horizontal ship starting at 0, the cells of a vertical ship starting at 0)
+    """
+
+    key = (board_size, length)
+
+    if key not in _start_masks:
+        fits = max(board_size - length + 1, 0)
+        rows = sum(1 << (y * board_size) for y in range(board_size))
+
+        _start_masks[key] = (((1 << fits) - 1) * rows,
+                             (1 << (fits * board_size)) - 1,
+                             (1 << length) - 1,
+                             sum(1 << (i * board_size) for i in range(length)))
+
+    return _start_masks[key]
+
+
+def _legal_starts(occupied: int, length: int, step: int, starts: int) -> int:
+    """
+    :param step: The distance between the bits of two neighboring cells of the ship
+    :param starts: The starts of the placements that fit on the board
+    :return: The starts of the placements that don't overlap an occupied cell
+    """
+
+    free = ~occupied
+
+    for i in range(length):
+        starts &= free >> (i * step)
+
+    return starts
+
+
+def _nth_bit(mask: int, n: int) -> int:
+    """
+    :return: The index of the nth set bit of the mask, counting from 0
+    """
+
+    low, high = 0, mask.bit_length()
+
+    # The smallest number of low bits that contains more than n set bits
+    while low < high:
+        middle = (low + high) // 2
+
+        if (mask & ((1 << middle) - 1)).bit_count() > n:
+            high = middle
+
+        else:
+            low = middle + 1
+
+    return low - 1
+
+
+def _place(board_size: int, length: int, occupied: int, rng: random.Random):
+    """
+    Picks a placement uniformly out of every placement of the ship that doesn't overlap an occupied cell.
+
+    :return: (the occupancy mask of the ship, its start bit, if it is horizontal), None if the ship doesn't fit
+    """
+
+    horizontal_starts, vertical_starts, row, column = _placement_masks(board_size, length)
+    fits = board_size - length + 1
+
+    if fits <= 0:
+        return None
+
+    # Both orientations have board_size * fits placements, so a random one of them is uniform
+    for _ in range(SAMPLE_TRIES):
+        horizontal = rng.random() < 0.5
+        along, across = rng.randrange(fits), rng.randrange(board_size)
+        start = across * board_size + along if horizontal else along * board_size + across
+        cells = (row if horizontal else column) << start
+
+        if not cells & occupied:
+            return cells, start, horizontal
+
+    horizontal_starts = _legal_starts(occupied, length, 1, horizontal_starts)
+    vertical_starts = _legal_starts(occupied, length, board_size, vertical_starts)
+    horizontal_count = horizontal_starts.bit_count()
+    count = horizontal_count + vertical_starts.bit_count()
+
+    if count == 0:
+        return None
+
+    n = rng.randrange(count)
+
+    if n < horizontal_count:
+        start = _nth_bit(horizontal_starts, n)
+        return row << start, start, True
+
+    start = _nth_bit(vertical_starts, n - horizontal_count)
+    return column << start, start, False
+
+
+def random_fleet(board_size: int, ships: list = None, rng: random.Random = None, occupied_cells=()) -> list:
+    """
+    Places every ship at a random spot where it doesn't overlap another ship.
+
+    :param ships: Dicts with the name and length of every ship, SHIPS by default
+    :param rng: The random generator to use, the random module by default
+    :param occupied_cells: (x, y) pairs the ships must not overlap, e.g. ships that were placed by hand
+    :return: The fleet in the format sent to the server: [[name, [x, y], ...], ...]
+    :raises ValueError: If the ships don't fit on the board
+    """
+
+    ships = SHIPS if ships is None else ships
+    rng = random if rng is None else rng
+    already_occupied = cells_mask(board_size, occupied_cells)
+
+    for _ in range(FLEET_TRIES):
+        occupied = already_occupied
+        placed = []
+
+        for ship in ships:
+            placement = _place(board_size, ship["length"], occupied, rng)
+
+            if placement is None:
+                break
+
+            cells, start, horizontal = placement
+            occupied |= cells
+
+            x, y = start % board_size, start // board_size
+            placed.append([ship["name"], *[[x + i, y] if horizontal else [x, y + i] for i in range(ship["length"])]])
+
+        else:
+            return placed
+
+    raise ValueError(f"The ships don't fit on a {board_size}x{board_size} board")
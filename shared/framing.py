@@ -0,0 +1,154 @@
+import socket
+import struct
+
+HEADERSIZE = 10
+BINARY_HEADER = struct.Struct("!I")
+BUFFER_SIZE = 64 * 1024
+
+# The largest payload a peer may announce. The endgame board of a 1000x1000 board where every cell was fired at is
+# about 12MiB of JSON.
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+def encode_frame(payload: bytes, binary_header: bool = False) -> bytes:
+    """
+    Prefixes a payload with its length header.
+
+    :param payload: The encoded message
+    :param binary_header: If the length is a 4 byte unsigned integer instead of space-padded ASCII
+    :return: The bytes to write to the socket
+    """
+
+    if binary_header:
+        return BINARY_HEADER.pack(len(payload)) + payload
+
+    return f"{len(payload):<{HEADERSIZE}}".encode("utf-8") + payload
+
+
+class FrameReader:
+    """
+    Reassembles length-prefixed frames from a byte stream.
+
+    Received bytes are written into one preallocated buffer, so a single recv can complete several queued
+    frames and a frame split over several recvs is only returned once all of it has arrived.
+    """
+
+    def __init__(self, buffer_size: int = BUFFER_SIZE):
+        # Switched once the binary protocol is negotiated. Frames still in the buffer are decoded lazily, so
+        # the switch applies from the next call to next_frame()
+        self.binary_header = False
+
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # index of the first byte that has not been decoded yet
+        self._end = 0  # index after the last received byte
+
+    def pending(self) -> int:
+        return self._end - self._start
+
+    def unread(self) -> bytes:
+        """
+        :return: A copy of the bytes that were received but not decoded yet
+        """
+
+        return bytes(self._view[self._start:self._end])
+
+    def get_buffer(self, min_size: int = 1) -> memoryview:
+        """
+        :param min_size: The minimum amount of free space needed
+        :return: A writable view of the free space at the end of the buffer
+        """
+
+        if self._start == self._end:
+            self._start = self._end = 0
+
+        if len(self._buffer) - self._end < min_size:
+            pending = self.pending()
+
+            # Move the undecoded bytes to the front, growing the buffer if they still don't leave enough room
+            if len(self._buffer) - pending < min_size:
+                new_buffer = bytearray(max(len(self._buffer) * 2, pending + min_size))
+                new_buffer[:pending] = self._view[self._start:self._end]
+                self._view.release()
+                self._buffer = new_buffer
+                self._view = memoryview(self._buffer)
+
+            else:
+                self._buffer[:pending] = self._view[self._start:self._end]
+
+            self._start, self._end = 0, pending
+
+        return self._view[self._end:]
+
+    def buffer_updated(self, nbytes: int):
+        """
+        Marks bytes written into the view returned by get_buffer() as received.
+
+        :param nbytes: The amount of bytes that were written
+        """
+
+        self._end += nbytes
+
+    def feed(self, data: bytes):
+        self.get_buffer(len(data))[:len(data)] = data
+        self.buffer_updated(len(data))
+
+    def recv_into(self, sock: socket.socket) -> int:
+        """
+        Receives as many bytes as are available (up to the free space in the buffer) with a single syscall.
+
+        :param sock: The socket to receive from
+        :return: The amount of bytes received, 0 if the socket disconnected
+        """
+
+        nbytes = sock.recv_into(self.get_buffer(max(1, self._missing_bytes())))
+        self.buffer_updated(nbytes)
+        return nbytes
+
+    def _missing_bytes(self) -> int:
+        """
+        :return: The amount of bytes needed to complete the frame at the front of the buffer
+        """
+
+        if self.pending() < self.header_size():
+            return self.header_size() - self.pending()
+
+        return self.header_size() + self._frame_length() - self.pending()
+
+    def header_size(self) -> int:
+        return BINARY_HEADER.size if self.binary_header else HEADERSIZE
+
+    def _frame_length(self) -> int:
+        """
+        :raise ValueError: If the header isn't a length, or the length is negative or larger than MAX_FRAME_SIZE
+        """
+
+        if self.binary_header:
+            length = BINARY_HEADER.unpack_from(self._buffer, self._start)[0]
+
+        else:
+            length = int(self._buffer[self._start:self._start + HEADERSIZE])
+
+        # Buffering a frame of any announced size would let a peer take all the memory
+        if not 0 <= length <= MAX_FRAME_SIZE:
+            raise ValueError(f"The frame length {length} is not between 0 and {MAX_FRAME_SIZE}")
+
+        return length
+
+    def next_frame(self):
+        """
+        :return: The payload of the next complete frame, or None if a full frame has not been received yet
+        :raise ValueError: If the length header of the frame is invalid
+        """
+
+        if self.pending() < self.header_size():
+            return None
+
+        payload_start = self._start + self.header_size()
+        payload_end = payload_start + self._frame_length()
+
+        if payload_end > self._end:
+            return None
+
+        self._start = payload_end
+        return bytes(self._view[payload_start:payload_end])
@@ -0,0 +1,387 @@
+import json
+import struct
+
+JSON = "json"
+BINARY = "binary"
+
+# Versions of the game protocol. In version 2 the player that fired gets one turn result message with the hit,
+# the sunk ship and the game status, instead of separate hit, sunk and game status messages. In version 3 both
+# sides send heartbeats when they have been quiet for a heartbeat interval, so a dead connection is noticed even
+# while nobody has to move.
+VERSION = 3
+TURN_RESULT_VERSION = 2
+HEARTBEAT_VERSION = 3
+
+HEARTBEAT_MESSAGE = "heartbeat"
+HEARTBEAT_INTERVAL = 5  # seconds
+HEARTBEAT_TIMEOUT = 3 * HEARTBEAT_INTERVAL  # seconds without any message after which the other side is gone
+
+# Opponents a client can ask for in its hello
+HUMAN = "human"
+AI = "ai"
+
+# Message type bytes of the binary protocol
+JSON_MESSAGE = 0  # anything without a layout of its own, encoded as JSON after the type byte
+START = 1
+BOARD_SIZE = 2
+FLEET = 3
+MOVE = 4
+HIT = 5
+MISS = 6
+SUNK = 7
+NO_SHIP_SANK = 8
+STARTING = 9
+WAITING_FOR_MOVE = 10
+GAME_STATUS = 11
+ENDGAME_BOARD = 12
+SHOT = 13  # a move and its result, sent to spectators
+TURN_RESULT = 14
+HEARTBEAT = 15
+INVALID_FLEET = 16
+
+LITERALS = {
+    "start": START,
+    "hit": HIT,
+    "miss": MISS,
+    "no ship sank": NO_SHIP_SANK,
+    "starting": STARTING,
+    "waiting for move": WAITING_FOR_MOVE,
+    HEARTBEAT_MESSAGE: HEARTBEAT
+}
+
+LITERAL_TYPES = {message_type: literal for literal, message_type in LITERALS.items()}
+
+SUNK_PREFIX = "You sunk a "
+GAME_STATUSES = [None, "You won", "You lost"]
+
+# Why the server rejected a fleet
+INVALID_FLEET_REASONS = ["malformed", "composition", "out of bounds", "not contiguous", "overlap"]
+
+TYPE = struct.Struct("!B")
+UINT = struct.Struct("!I")
+COUNT = struct.Struct("!H")
+COORD = struct.Struct("!HH")
+NAME_LENGTH = struct.Struct("!B")
+STATUS = struct.Struct("!BBHH")  # game status, has move, move x, move y
+BOARD_COUNTS = struct.Struct("!III")  # hits, misses, ships
+SHOT_INFO = struct.Struct("!BHHBB")  # seat, x, y, hit, sunk (followed by the name of the sunk ship)
+TURN_INFO = struct.Struct("!BBB")  # hit, game status, sunk (followed by the name of the sunk ship)
+TEXT_LENGTH = struct.Struct("!H")
+
+
+def hello(encodings: list, opponent: str = HUMAN, resume: str = None, spectate: int = None,
+          version: int = VERSION) -> dict:
+    """
+    :param encodings: The encodings the client supports, in order of preference
+    :param opponent: HUMAN to be paired with another player, AI to play against the server
+    :param resume: The token the server gave the client in an earlier connection, to continue the game it was in
+                   when the server restarted
+    :param spectate: The id of a match to watch instead of playing, LATEST_MATCH for the match that started last
+    :param version: The newest protocol version the client speaks
+    :return: The first message a client sends to negotiate the protocol
+    """
+
+    message = {"hello": {"encodings": encodings, "opponent": opponent, "version": version}}
+
+    if resume is not None:
+        message["hello"]["resume"] = resume
+
+    if spectate is not None:
+        message["hello"]["spectate"] = spectate
+
+    return message
+
+
+def is_hello(message) -> bool:
+    return isinstance(message, dict) and isinstance(message.get("hello"), dict)
+
+
+def choose_encoding(hello_message: dict) -> str:
+    """
+    :param hello_message: The hello sent by the client
+    :return: The first encoding the client asked for that is supported, JSON if there is none
+    """
+
+    encodings = hello_message["hello"].get("encodings", [])
+
+    for encoding in encodings if isinstance(encodings, list) else []:
+        if isinstance(encoding, str) and encoding in CODECS:
+            return encoding
+
+    return JSON
+
+
+def choose_version(hello_message: dict) -> int:
+    """
+    :return: The newest protocol version both sides speak. Clients that don't send a version speak version 1.
+    """
+
+    version = hello_message["hello"].get("version", 1)
+    return min(version, VERSION) if isinstance(version, int) and version >= 1 else 1
+
+
+def hello_reply(encoding: str, token: str = None, version: int = 1) -> dict:
+    """
+    :param token: The token the client can resume its game with after a restart of the server
+    :param version: The protocol version the connection uses from now on
+    """
+
+    message = {"hello": {"encoding": encoding, "version": version}}
+
+    if token is not None:
+        message["hello"]["token"] = token
+
+    return message
+
+
+def is_resume(message) -> bool:
+    return isinstance(message, dict) and "resume" in message
+
+
+def turn_result(hit: bool, sunk_ship: str = None, game_status: str = None) -> dict:
+    """
+    :param sunk_ship: The name of the ship the shot sank, None if it didn't sink one
+    :param game_status: "You won" if the shot sank the last ship, None if the game goes on
+    :return: The message the player that fired gets in protocol version 2
+    """
+
+    return {"hit": hit, "sunk": sunk_ship, "game_status": game_status}
+
+
+def invalid_fleet(reason: str, description: str) -> dict:
+    """
+    :param reason: One of INVALID_FLEET_REASONS
+    :param description: What is wrong with the fleet, for people
+    :return: The message a player gets instead of the start of the game if its fleet breaks the rules. The server
+             closes the connection after it.
+    """
+
+    return {"invalid_fleet": {"reason": reason, "description": description}}
+
+
+def is_invalid_fleet(message) -> bool:
+    return isinstance(message, dict) and "invalid_fleet" in message
+
+
+def aborted(description: str) -> dict:
+    """
+    :param description: Why the match ended, for people
+    :return: The message a player gets when the match ends because of the other player, e.g. because the other
+             player's fleet broke the rules. The server closes the connection after it.
+    """
+
+    return {"aborted": description}
+
+
+def is_aborted(message) -> bool:
+    return isinstance(message, dict) and "aborted" in message
+
+
+# Messages a spectator gets: a snapshot of the game when it subscribes and when a new game of the match starts,
+# then every shot and the winner
+LATEST_MATCH = 0
+
+
+def is_snapshot(message) -> bool:
+    return isinstance(message, dict) and "spectate" in message
+
+
+def _pack_coords(coords) -> bytes:
+    flat = [value for coord in coords for value in coord]
+    return struct.pack(f"!{len(flat)}H", *flat)
+
+
+def _unpack_coords(payload: bytes, offset: int, count: int):
+    """
+    :return: (the coordinates as [x, y] lists, the offset after the coordinates)
+    """
+
+    flat = struct.unpack_from(f"!{count * 2}H", payload, offset)
+    return [list(flat[i:i + 2]) for i in range(0, len(flat), 2)], offset + count * COORD.size
+
+
+class JsonCodec:
+    binary_header = False
+
+    @staticmethod
+    def encode(message) -> bytes:
+        return json.dumps(message, ensure_ascii=False).encode("utf-8")
+
+    @staticmethod
+    def decode(payload: bytes):
+        return json.loads(payload)
+
+
+class BinaryCodec:
+    """
+    Encodes the messages of the game into fixed struct layouts, each starting with a message type byte.
+    Messages are the same Python values the JSON protocol uses, so the rest of the code doesn't need to know
+    which encoding a connection negotiated.
+    """
+
+    binary_header = True
+
+    def encode(self, message) -> bytes:
+        try:
+            return self._encode(message)
+
+        except (struct.error, TypeError, ValueError):
+            # Values outside the struct layouts (e.g. coordinates above 65535) fall back to JSON
+            return TYPE.pack(JSON_MESSAGE) + JsonCodec.encode(message)
+
+    @staticmethod
+    def _encode(message) -> bytes:
+        if isinstance(message, str):
+            if message in LITERALS:
+                return TYPE.pack(LITERALS[message])
+
+            if message.isdigit():
+                return TYPE.pack(BOARD_SIZE) + UINT.pack(int(message))
+
+            if message.startswith(SUNK_PREFIX):
+                name = message[len(SUNK_PREFIX):].encode("utf-8")
+                return TYPE.pack(SUNK) + NAME_LENGTH.pack(len(name)) + name
+
+        elif isinstance(message, list):
+            if len(message) == 2 and all(isinstance(value, int) for value in message):
+                return TYPE.pack(MOVE) + COORD.pack(*message)
+
+            if all(isinstance(ship, list) and ship and isinstance(ship[0], str) for ship in message):
+                parts = [TYPE.pack(FLEET), COUNT.pack(len(message))]
+
+                for ship in message:
+                    name = ship[0].encode("utf-8")
+                    parts += [NAME_LENGTH.pack(len(name)), name, COUNT.pack(len(ship) - 1), _pack_coords(ship[1:])]
+
+                return b"".join(parts)
+
+        elif isinstance(message, dict):
+            if message.keys() == {"game_status", "move"}:
+                move = message["move"] or [0, 0]
+                return TYPE.pack(GAME_STATUS) + STATUS.pack(GAME_STATUSES.index(message["game_status"]),
+                                                            message["move"] is not None, *move)
+
+            if message.keys() == {"shot"}:
+                seat, x, y, hit, sunk_ship = message["shot"]
+                parts = [TYPE.pack(SHOT), SHOT_INFO.pack(seat, x, y, hit, sunk_ship is not None)]
+
+                if sunk_ship is not None:
+                    name = sunk_ship.encode("utf-8")
+                    parts += [NAME_LENGTH.pack(len(name)), name]
+
+                return b"".join(parts)
+
+            if message.keys() == {"hit", "sunk", "game_status"}:
+                status = GAME_STATUSES.index(message["game_status"])
+                parts = [TYPE.pack(TURN_RESULT), TURN_INFO.pack(message["hit"], status, message["sunk"] is not None)]
+
+                if message["sunk"] is not None:
+                    name = message["sunk"].encode("utf-8")
+                    parts += [NAME_LENGTH.pack(len(name)), name]
+
+                return b"".join(parts)
+
+            if message.keys() == {"invalid_fleet"}:
+                reason = INVALID_FLEET_REASONS.index(message["invalid_fleet"]["reason"])
+                description = message["invalid_fleet"]["description"].encode("utf-8")
+                return TYPE.pack(INVALID_FLEET) + TYPE.pack(reason) + TEXT_LENGTH.pack(len(description)) + description
+
+            if message.keys() == {"hits", "misses", "ships"}:
+                parts = [TYPE.pack(ENDGAME_BOARD),
+                         BOARD_COUNTS.pack(len(message["hits"]), len(message["misses"]), len(message["ships"])),
+                         _pack_coords(message["hits"]), _pack_coords(message["misses"])]
+
+                for ship in message["ships"]:
+                    parts += [COUNT.pack(len(ship)), _pack_coords(ship)]
+
+                return b"".join(parts)
+
+        return TYPE.pack(JSON_MESSAGE) + JsonCodec.encode(message)
+
+    @staticmethod
+    def decode(payload: bytes):
+        message_type = payload[0]
+
+        if message_type in LITERAL_TYPES:
+            return LITERAL_TYPES[message_type]
+
+        if message_type == BOARD_SIZE:
+            return str(UINT.unpack_from(payload, 1)[0])
+
+        if message_type == MOVE:
+            return list(COORD.unpack_from(payload, 1))
+
+        if message_type == SUNK:
+            name_length = NAME_LENGTH.unpack_from(payload, 1)[0]
+            return SUNK_PREFIX + payload[2:2 + name_length].decode("utf-8")
+
+        if message_type == GAME_STATUS:
+            status, has_move, x, y = STATUS.unpack_from(payload, 1)
+            return {"game_status": GAME_STATUSES[status], "move": [x, y] if has_move else None}
+
+        if message_type == SHOT:
+            seat, x, y, hit, sunk = SHOT_INFO.unpack_from(payload, 1)
+            sunk_ship = None
+
+            if sunk:
+                offset = 1 + SHOT_INFO.size
+                name_length = NAME_LENGTH.unpack_from(payload, offset)[0]
+                sunk_ship = payload[offset + NAME_LENGTH.size:offset + NAME_LENGTH.size + name_length].decode("utf-8")
+
+            return {"shot": [seat, x, y, bool(hit), sunk_ship]}
+
+        if message_type == TURN_RESULT:
+            hit, status, sunk = TURN_INFO.unpack_from(payload, 1)
+            sunk_ship = None
+
+            if sunk:
+                offset = 1 + TURN_INFO.size
+                name_length = NAME_LENGTH.unpack_from(payload, offset)[0]
+                sunk_ship = payload[offset + NAME_LENGTH.size:offset + NAME_LENGTH.size + name_length].decode("utf-8")
+
+            return turn_result(bool(hit), sunk_ship, GAME_STATUSES[status])
+
+        if message_type == FLEET:
+            ship_count = COUNT.unpack_from(payload, 1)[0]
+            offset = 1 + COUNT.size
+            fleet = []
+
+            for _ in range(ship_count):
+                name_length = NAME_LENGTH.unpack_from(payload, offset)[0]
+                offset += NAME_LENGTH.size
+                name = payload[offset:offset + name_length].decode("utf-8")
+                offset += name_length
+
+                coord_count = COUNT.unpack_from(payload, offset)[0]
+                coords, offset = _unpack_coords(payload, offset + COUNT.size, coord_count)
+                fleet.append([name, *coords])
+
+            return fleet
+
+        if message_type == INVALID_FLEET:
+            reason = INVALID_FLEET_REASONS[payload[1]]
+            description_length = TEXT_LENGTH.unpack_from(payload, 2)[0]
+            offset = 2 + TEXT_LENGTH.size
+
+            return invalid_fleet(reason, payload[offset:offset + description_length].decode("utf-8"))
+
+        if message_type == ENDGAME_BOARD:
+            hit_count, miss_count, ship_count = BOARD_COUNTS.unpack_from(payload, 1)
+            hits, offset = _unpack_coords(payload, 1 + BOARD_COUNTS.size, hit_count)
+            misses, offset = _unpack_coords(payload, offset, miss_count)
+            ships = []
+
+            for _ in range(ship_count):
+                coord_count = COUNT.unpack_from(payload, offset)[0]
+                coords, offset = _unpack_coords(payload, offset + COUNT.size, coord_count)
+                ships.append(coords)
+
+            return {"hits": hits, "misses": misses, "ships": ships}
+
+        return JsonCodec.decode(payload[1:])
+
+
+CODECS = {
+    BINARY: BinaryCodec(),
+    JSON: JsonCodec()
+}
@@ -0,0 +1,8 @@
+from typing import NamedTuple
+
+
+class ShotResult(NamedTuple):
+    hit: bool
+    ship_name: str  # an empty string if the shot missed
+    sunk: bool  # if the ship that was hit is sunk
+    fleet_destroyed: bool
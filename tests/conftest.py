@@ -0,0 +1,8 @@
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The server runs from its own directory, and the client has modules with the same names, so only the server and
+# the shared package are tested here
+sys.path[:0] = [REPO_DIR, os.path.join(REPO_DIR, "server")]
@@ -0,0 +1,118 @@
+import random
+
+import pytest
+
+import fleet_validator
+from fleet_validator import COMPOSITION, MALFORMED, NOT_CONTIGUOUS, OUT_OF_BOUNDS, OVERLAP
+from shared import fleet
+
+SIZE = 10
+
+
+def standard_fleet() -> list:
+    """
+    :return: Every ship of fleet.SHIPS on its own row, starting at the left edge
+    """
+
+    return [[ship["name"], *[[x, y] for x in range(ship["length"])]] for y, ship in enumerate(fleet.SHIPS)]
+
+
+def reason(ships) -> str:
+    with pytest.raises(fleet_validator.InvalidFleet) as error:
+        fleet_validator.validate(ships, SIZE)
+
+    return error.value.reason
+
+
+@pytest.mark.parametrize("size", [5, 10, 100, 1000])
+def test_random_fleets_are_valid(size):
+    rng = random.Random(size)
+
+    for _ in range(20):
+        fleet_validator.validate(fleet.random_fleet(size, rng=rng), size)
+
+
+def test_tuples_are_coordinates():
+    ships = [[name, *[tuple(coord) for coord in coords]] for name, *coords in standard_fleet()]
+    fleet_validator.validate(ships, SIZE)
+
+
+def test_each_rule():
+    ships = standard_fleet()
+    assert reason({"ships": ships}) == MALFORMED
+    assert reason(ships[:-1]) == COMPOSITION
+    assert reason(ships[:-1] + [ships[0]]) == COMPOSITION
+
+    ships = standard_fleet()
+    ships[0].append([5, 0])
+    assert reason(ships) == COMPOSITION
+
+    ships = standard_fleet()
+    ships[1][1] = [True, 1]
+    assert reason(ships) == MALFORMED
+
+    ships = standard_fleet()
+    ships[2] = [ships[2][0], *[[x + SIZE - 2, 2] for x in range(len(ships[2]) - 1)]]
+    assert reason(ships) == OUT_OF_BOUNDS
+
+    ships = standard_fleet()
+    ships[3] = [ships[3][0], *[[x, 0] for x in range(len(ships[3]) - 1)]]
+    assert reason(ships) == OVERLAP
+
+    ships = standard_fleet()
+    ships[4][2] = [5, 4]
+    assert reason(ships) == NOT_CONTIGUOUS
+
+    ships = standard_fleet()
+    ships[4][2] = [1, 5]
+    assert reason(ships) == NOT_CONTIGUOUS
+
+
+def test_the_size_of_the_fleet_is_checked_before_its_ships():
+    ships = standard_fleet()[:-1]
+    ships[0][1] = "not a coordinate"
+
+    assert reason(ships) == COMPOSITION
+
+
+def test_a_malformed_ship_is_reported_before_later_ships():
+    ships = standard_fleet()
+    ships[0] = "not a ship"
+    ships[1][1] = [-1, 1]
+
+    assert reason(ships) == MALFORMED
+
+
+def test_the_name_is_checked_before_the_cells():
+    ships = standard_fleet()
+    ships[0] = ["Rowboat", [-1, -1], [50, 50]]
+
+    assert reason(ships) == COMPOSITION
+
+
+def test_a_malformed_cell_is_reported_before_an_off_board_one():
+    ships = standard_fleet()
+    ships[0][1] = [-1, 0]
+    ships[0][2] = [0.5, 0]
+
+    assert reason(ships) == OUT_OF_BOUNDS
+
+    ships = standard_fleet()
+    ships[0][1] = [0.5, 0]
+    ships[0][2] = [-1, 0]
+
+    assert reason(ships) == MALFORMED
+
+
+def test_a_repeated_cell_is_an_overlap_not_a_gap():
+    ships = standard_fleet()
+    ships[4][2] = ships[4][1]
+
+    assert reason(ships) == OVERLAP
+
+
+def test_a_ship_off_the_board_is_not_reported_as_bent():
+    ships = standard_fleet()
+    ships[0] = [ships[0][0], [SIZE - 1, 0], [SIZE, 1]]
+
+    assert reason(ships) == OUT_OF_BOUNDS
@@ -0,0 +1,110 @@
+import socket
+
+import pytest
+
+from shared.framing import BINARY_HEADER, HEADERSIZE, MAX_FRAME_SIZE, FrameReader, encode_frame
+
+
+def test_oversized_binary_length_is_rejected():
+    reader = FrameReader()
+    reader.binary_header = True
+    reader.feed(BINARY_HEADER.pack(MAX_FRAME_SIZE + 1))
+
+    with pytest.raises(ValueError):
+        reader.next_frame()
+
+
+def test_oversized_ascii_length_is_rejected():
+    reader = FrameReader()
+    reader.feed(f"{MAX_FRAME_SIZE + 1:<{HEADERSIZE}}".encode("utf-8"))
+
+    with pytest.raises(ValueError):
+        reader.next_frame()
+
+
+def test_negative_ascii_length_is_rejected():
+    reader = FrameReader()
+    reader.feed(b"-5".ljust(HEADERSIZE) + b"abcde")
+
+    with pytest.raises(ValueError):
+        reader.next_frame()
+
+
+def test_largest_frame_is_accepted():
+    reader = FrameReader()
+    reader.binary_header = True
+    payload = bytes(MAX_FRAME_SIZE)
+    reader.feed(encode_frame(payload, binary_header=True))
+
+    assert reader.next_frame() == payload
+
+
+def test_frames_split_over_several_feeds():
+    reader = FrameReader()
+    data = encode_frame(b'["hello"]')
+
+    for i in range(len(data) - 1):
+        reader.feed(data[i:i + 1])
+        assert reader.next_frame() is None
+
+    reader.feed(data[-1:])
+    assert reader.next_frame() == b'["hello"]'
+    assert reader.pending() == 0
+
+
+def test_several_frames_in_one_feed():
+    reader = FrameReader()
+    reader.feed(encode_frame(b"1") + encode_frame(b"") + encode_frame(b"333"))
+
+    assert [reader.next_frame() for _ in range(4)] == [b"1", b"", b"333", None]
+
+
+def test_switching_to_binary_headers_applies_to_the_next_frame():
+    reader = FrameReader()
+    reader.feed(encode_frame(b"json") + encode_frame(b"binary", binary_header=True))
+
+    assert reader.next_frame() == b"json"
+    reader.binary_header = True
+    assert reader.next_frame() == b"binary"
+
+
+def test_buffer_grows_for_frames_larger_than_it():
+    reader = FrameReader(buffer_size=16)
+    payload = bytes(range(256)) * 4
+    data = encode_frame(payload)
+
+    reader.feed(data[:100])
+    assert reader.next_frame() is None
+
+    reader.feed(data[100:])
+    assert reader.next_frame() == payload
+
+
+def test_unread_keeps_the_bytes_after_the_last_frame():
+    reader = FrameReader()
+    second = encode_frame(b"second")
+    reader.feed(encode_frame(b"first") + second[:4])
+
+    assert reader.next_frame() == b"first"
+    assert reader.unread() == second[:4]
+
+
+def test_recv_into_reads_a_whole_frame():
+    first, second = socket.socketpair()
+    reader = FrameReader(buffer_size=8)
+
+    try:
+        payload = b"x" * 1000
+        first.sendall(encode_frame(payload))
+
+        while (frame := reader.next_frame()) is None:
+            assert reader.recv_into(second) > 0
+
+        assert frame == payload
+
+        first.close()
+        assert reader.recv_into(second) == 0
+
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+import fleet_validator
+import game
+from shared import fleet, protocol
+
+
+class FakePlayer:
+    def __init__(self, *messages):
+        self.messages = list(messages)
+        self.sent = []
+        self.token = None
+        self.ships = None
+
+    async def receive(self, timeout: float = None):
+        return self.messages.pop(0)
+
+    async def send(self, message):
+        self.sent.append(message)
+        return True
+
+    def assign_ships(self, ships: list, board_size: int):
+        self.ships = ships
+
+
+def test_invalid_fleet_aborts_the_match_for_the_opponent():
+    offender = FakePlayer([])
+    opponent = FakePlayer(fleet.random_fleet(10))
+
+    with pytest.raises(fleet_validator.InvalidFleet):
+        asyncio.run(game.Game([opponent, offender], 10).get_ships())
+
+    assert protocol.is_invalid_fleet(offender.sent[0])
+    assert offender.sent[0]["invalid_fleet"]["reason"] == fleet_validator.COMPOSITION
+    assert protocol.is_aborted(opponent.sent[0])
+
+
+def test_valid_fleets_are_assigned():
+    players = [FakePlayer(fleet.random_fleet(10)), FakePlayer(fleet.random_fleet(10))]
+    asyncio.run(game.Game(players, 10).get_ships())
+
+    assert all(not p.sent and len(p.ships) == len(fleet.SHIPS) for p in players)
@@ -0,0 +1,129 @@
+import time
+
+import move_log
+from shared import fleet
+
+TOKENS = ["0123456789abcdef", "fedcba9876543210"]
+
+
+def write_game(log: move_log.MoveLog, moves=()) -> tuple:
+    fleets = [fleet.random_fleet(10), fleet.random_fleet(10)]
+    game_id = log.start_game(10, TOKENS)
+
+    for seat, ships in enumerate(fleets):
+        log.fleet(game_id, seat, ships)
+
+    for seat, x, y in moves:
+        log.move(game_id, seat, x, y)
+
+    return game_id, fleets
+
+
+def test_replay_without_a_log():
+    assert move_log.replay("does not exist") == ({}, 1)
+
+
+def test_replay_recovers_games_in_progress(tmp_path):
+    path = str(tmp_path / "moves.log")
+    log = move_log.MoveLog(path)
+    game_id, fleets = write_game(log, [(0, 1, 2), (1, 3, 4)])
+    ended_id, _ = write_game(log)
+    log.end_game(ended_id)
+    log.sync()
+    log.file.close()
+
+    games, next_game_id = move_log.replay(path)
+
+    assert list(games) == [game_id]
+    assert next_game_id == ended_id + 1
+
+    recovered = games[game_id]
+    assert recovered.board_size == 10
+    assert recovered.tokens == TOKENS
+    assert recovered.fleets == fleets
+    assert recovered.moves == [(0, 1, 2), (1, 3, 4)]
+
+
+def test_replay_ignores_a_torn_record(tmp_path):
+    path = str(tmp_path / "moves.log")
+    log = move_log.MoveLog(path)
+    game_id, _ = write_game(log, [(0, 1, 2)])
+    log.move(game_id, 1, 5, 5)
+    log.sync()
+    log.file.close()
+
+    with open(path, "r+b") as file:
+        file.truncate(len(file.read()) - 1)
+
+    games, _ = move_log.replay(path)
+    assert games[game_id].moves == [(0, 1, 2)]
+
+
+def test_replay_drops_a_game_without_both_fleets(tmp_path):
+    path = str(tmp_path / "moves.log")
+    log = move_log.MoveLog(path)
+    game_id = log.start_game(10, TOKENS)
+    log.fleet(game_id, 0, fleet.random_fleet(10))
+    log.sync()
+    log.file.close()
+
+    assert move_log.replay(path)[0] == {}
+
+
+def test_compact_keeps_when_games_stopped(tmp_path):
+    path = str(tmp_path / "moves.log")
+    log = move_log.MoveLog(path)
+    game_id, _ = write_game(log, [(0, 1, 2)])
+    ended_id, _ = write_game(log)
+    log.end_game(ended_id)
+    log.sync()
+    log.file.close()
+
+    games, _ = move_log.replay(path)
+    stopped_at = games[game_id].stopped_at
+    move_log.compact(path, games)
+
+    # Compacting again doesn't add another stop, so the time to resume doesn't start over
+    compacted, _ = move_log.replay(path)
+    move_log.compact(path, compacted)
+    recompacted, _ = move_log.replay(path)
+
+    assert list(recompacted) == [game_id]
+    assert recompacted[game_id].moves == [(0, 1, 2)]
+    assert recompacted[game_id].stopped_at == stopped_at
+    assert len(recompacted[game_id].records) == len(compacted[game_id].records)
+
+
+def test_replay_drops_games_that_were_not_resumed_in_time(tmp_path):
+    path = str(tmp_path / "moves.log")
+    log = move_log.MoveLog(path)
+    write_game(log)
+    log.sync()
+    log.file.close()
+
+    games, _ = move_log.replay(path)
+    games[1].stopped_at = time.time() - 100
+    move_log.compact(path, games)
+
+    assert move_log.replay(path, resume_timeout=50)[0] == {}
+    assert list(move_log.replay(path, resume_timeout=200)[0]) == [1]
+
+
+def test_a_move_after_a_stop_restarts_the_time_to_resume(tmp_path):
+    path = str(tmp_path / "moves.log")
+    log = move_log.MoveLog(path)
+    game_id, _ = write_game(log)
+    log.sync()
+    log.file.close()
+
+    games, _ = move_log.replay(path)
+    games[game_id].stopped_at = time.time() - 100
+    move_log.compact(path, games)
+
+    log = move_log.MoveLog(path)
+    log.move(game_id, 0, 1, 1)
+    log.sync()
+    log.file.close()
+
+    games, _ = move_log.replay(path, resume_timeout=50)
+    assert games[game_id].stopped_at > time.time() - 50
@@ -0,0 +1,61 @@
+import pytest
+
+from shared import fleet, protocol
+
+MESSAGES = [
+    "start",
+    "hit",
+    "miss",
+    "no ship sank",
+    "starting",
+    "waiting for move",
+    protocol.HEARTBEAT_MESSAGE,
+    "10",
+    "65536",
+    [3, 7],
+    [65535, 0],
+    f"{protocol.SUNK_PREFIX}Battleship",
+    {"game_status": None, "move": [1, 2]},
+    {"game_status": "You won", "move": None},
+    {"game_status": "You lost", "move": [9, 9]},
+    {"shot": [0, 4, 5, True, None]},
+    {"shot": [1, 4, 5, True, "Destroyer"]},
+    protocol.turn_result(False),
+    protocol.turn_result(True, "Cruiser", "You won"),
+    protocol.invalid_fleet("overlap", "The Cruiser overlaps a ship at 1, 2"),
+    {"hits": [[0, 0], [1, 0]], "misses": [], "ships": [[[0, 0], [1, 0]], [[5, 5]]]},
+    fleet.random_fleet(10),
+    # Messages without a layout of their own go as JSON
+    protocol.hello([protocol.BINARY, protocol.JSON], protocol.AI),
+    protocol.aborted("The match was abandoned"),
+    {"resume": {"board_size": 10, "ships": [], "shots": {}, "opponent_shots": {}, "your_turn": True}},
+    [70000, 1],
+    "not a literal",
+]
+
+
+@pytest.mark.parametrize("encoding", [protocol.JSON, protocol.BINARY])
+@pytest.mark.parametrize("message", MESSAGES, ids=repr)
+def test_round_trip(encoding, message):
+    codec = protocol.CODECS[encoding]
+    assert codec.decode(codec.encode(message)) == message
+
+
+def test_binary_layouts_are_compact():
+    codec = protocol.CODECS[protocol.BINARY]
+
+    assert len(codec.encode("start")) == 1
+    assert len(codec.encode([3, 7])) == 1 + protocol.COORD.size
+    assert codec.encode([70000, 1])[0] == protocol.JSON_MESSAGE
+
+
+def test_choose_encoding():
+    assert protocol.choose_encoding(protocol.hello(["unknown", protocol.BINARY])) == protocol.BINARY
+    assert protocol.choose_encoding(protocol.hello(["unknown"])) == protocol.JSON
+    assert protocol.choose_encoding({"hello": {"encodings": "binary"}}) == protocol.JSON
+
+
+def test_choose_version():
+    assert protocol.choose_version(protocol.hello([], version=protocol.VERSION + 1)) == protocol.VERSION
+    assert protocol.choose_version({"hello": {}}) == 1
+    assert protocol.choose_version({"hello": {"version": 0}}) == 1
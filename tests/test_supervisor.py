@@ -0,0 +1,96 @@
+import asyncio
+import json
+import socket
+
+import pytest
+
+pytest.importorskip("numpy")  # the AI opponent needs it
+
+import supervisor
+from shared import fleet, protocol
+from shared.framing import FrameReader, encode_frame
+
+TIMEOUT = 5
+
+
+def frame(message) -> bytes:
+    return encode_frame(json.dumps(message).encode("utf-8"))
+
+
+async def next_message(reader: asyncio.StreamReader, frame_reader: FrameReader):
+    while (payload := frame_reader.next_frame()) is None:
+        data = await reader.read(1024)
+        assert data, "The server closed the connection"
+        frame_reader.feed(data)
+
+    return json.loads(payload)
+
+
+async def messages_until(reader: asyncio.StreamReader, frame_reader: FrameReader, last) -> list:
+    messages = []
+
+    while last not in messages:
+        messages.append(await asyncio.wait_for(next_message(reader, frame_reader), TIMEOUT))
+
+    return messages
+
+
+async def serve(test):
+    """
+    Runs a supervisor with one worker in this process and calls the test with the port it listens on
+    """
+
+    supervisor_sock, worker_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    supervisor_sock.setblocking(False)
+    worker_sock.setblocking(False)
+
+    workers = [supervisor.Worker(0, None, supervisor_sock)]
+    front = supervisor.Supervisor(workers)
+    worker = supervisor.WorkerMatchmaker(worker_sock)
+
+    listener = await asyncio.start_server(front.handle_connection, "127.0.0.1", 0)
+    serving = asyncio.create_task(worker.serve_supervisor())
+
+    try:
+        await test(listener.sockets[0].getsockname()[1])
+
+    finally:
+        serving.cancel()
+        listener.close()
+        supervisor_sock.close()
+        worker_sock.close()
+
+
+def test_hello_and_fleet_in_one_write():
+    async def test(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(frame(protocol.hello([protocol.JSON], protocol.AI)) + frame(fleet.random_fleet(10)))
+
+        messages = await messages_until(reader, FrameReader(), "starting")
+        assert messages[1:] == ["start", "10", "starting"]
+        writer.close()
+
+    asyncio.run(serve(test))
+
+
+def test_fleet_sent_while_waiting_for_an_opponent():
+    async def test(port):
+        first_reader, first_writer = await asyncio.open_connection("127.0.0.1", port)
+        first = FrameReader()
+        first_writer.write(frame(protocol.hello([protocol.JSON])))
+        await asyncio.wait_for(next_message(first_reader, first), TIMEOUT)
+
+        # Nobody reads from the connection until there is an opponent, so the fleet waits in the supervisor's buffer
+        first_writer.write(frame(fleet.random_fleet(10)))
+        await asyncio.sleep(0.1)
+
+        second_reader, second_writer = await asyncio.open_connection("127.0.0.1", port)
+        second_writer.write(frame(protocol.hello([protocol.JSON])) + frame(fleet.random_fleet(10)))
+
+        assert (await messages_until(first_reader, first, "starting"))[-3:] == ["start", "10", "starting"]
+        assert (await messages_until(second_reader, FrameReader(), "starting"))[-3:] == ["start", "10", "starting"]
+
+        first_writer.close()
+        second_writer.close()
+
+    asyncio.run(serve(test))